@@ -0,0 +1,367 @@
+"""
+音频设备注册表
+设备只枚举一次并缓存，超过有效期或检测到声卡插拔时才重新枚举；
+按名称、方向和支持的采样率建立索引，打开音频流前先校验 (采样率, 声道数)
+进程内共享的 PyAudio 实例也在这里管理，本模块只使用标准库，pyaudio 在第一次用到时才导入
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.lazy_imports import require
+
+# 枚举时探测的常用采样率
+COMMON_RATES = (8000, 16000, 22050, 32000, 44100, 48000)
+# Linux 上 ALSA 声卡列表，内容变化说明有声卡插拔
+ALSA_CARDS = "/proc/asound/cards"
+
+INPUT = "input"
+OUTPUT = "output"
+
+# 与 pyaudio.paInt16 相同，不必为一个常量导入 pyaudio
+PA_INT16 = 0x8
+
+_pyaudio = None
+_pyaudio_lock = threading.Lock()
+
+
+def get_pyaudio():
+    """
+    获取进程内共享的 PyAudio 实例
+
+    PyAudio() 初始化时会枚举所有设备（约数百毫秒），只创建一次，进程退出时统一释放；
+    未安装 pyaudio 时抛出 MissingDependencyError
+    """
+    global _pyaudio
+    with _pyaudio_lock:
+        if _pyaudio is None:
+            pyaudio = require("pyaudio", "麦克风和扬声器")
+            _pyaudio = pyaudio.PyAudio()
+        return _pyaudio
+
+
+@atexit.register
+def reset_pyaudio():
+    """
+    释放共享的 PyAudio 实例，下次 get_pyaudio() 时重新初始化
+
+    PortAudio 只在初始化时枚举设备，插拔 USB 声卡后需要调用；调用时不能有打开的音频流
+    """
+    global _pyaudio
+    with _pyaudio_lock:
+        if _pyaudio is not None:
+            _pyaudio.terminate()
+            _pyaudio = None
+
+
+def pyaudio_busy():
+    """共享的 PyAudio 实例上是否还有打开的音频流（AudioEngine、StreamingRecorder 等）"""
+    with _pyaudio_lock:
+        # PyAudio 在 _streams 中记录自己打开且尚未关闭的流，terminate() 会把它们全部关闭
+        return _pyaudio is not None and bool(getattr(_pyaudio, "_streams", ()))
+
+
+@dataclass
+class AudioDevice:
+    """音频设备信息"""
+    index: int
+    name: str
+    host_api: str
+    max_input_channels: int
+    max_output_channels: int
+    default_sample_rate: float
+    # 各方向支持的采样率，枚举时探测常用采样率，之后按需补充
+    rates: Dict[str, List[int]] = field(default_factory=dict)
+    # 已校验通过的 (方向, 采样率, 声道数)
+    checked: Set[Tuple[str, int, int]] = field(default_factory=set, repr=False)
+
+    def channels(self, direction):
+        return self.max_input_channels if direction == INPUT else self.max_output_channels
+
+
+def _hotplug_signature():
+    try:
+        with open(ALSA_CARDS) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class AudioDeviceRegistry:
+    """
+    缓存的音频设备注册表
+
+    devices() 在缓存有效时直接返回；超过 ttl 秒或 /proc/asound/cards 变化时重新枚举，
+    声卡插拔时还会重新初始化 PortAudio（PortAudio 只在初始化时扫描设备）。
+    """
+
+    def __init__(self, ttl=300.0, probe_rates=COMMON_RATES):
+        """
+        Args:
+            ttl: 缓存有效期（秒），None 表示只在检测到插拔时刷新
+            probe_rates: 枚举时探测的采样率
+        """
+        self.ttl = ttl
+        self.probe_rates = tuple(probe_rates)
+        self._devices: List[AudioDevice] = []
+        self._by_name: Dict[str, AudioDevice] = {}
+        self._scanned_at = None
+        self._signature = None
+        # 检测到插拔时仍有打开的音频流，等流全部关闭后再重新初始化 PortAudio
+        self._reset_pending = False
+        self.scan_time = 0.0
+
+    def _stale(self):
+        if self._scanned_at is None:
+            return True
+        if self._reset_pending and not pyaudio_busy():
+            return True
+        if self.ttl is not None and time.monotonic() - self._scanned_at > self.ttl:
+            return True
+        return _hotplug_signature() != self._signature
+
+    def refresh(self):
+        """重新枚举设备"""
+        signature = _hotplug_signature()
+        if self._scanned_at is not None and (signature != self._signature or self._reset_pending):
+            if pyaudio_busy():
+                # 终止 PortAudio 会关掉正在录音或播放的流，先沿用旧的设备列表
+                if not self._reset_pending:
+                    print("检测到声卡变化，音频流关闭后再重新初始化音频系统")
+                self._reset_pending = True
+            else:
+                print("检测到声卡变化，重新初始化音频系统")
+                reset_pyaudio()
+                self._reset_pending = False
+
+        t0 = time.perf_counter()
+        p = get_pyaudio()
+        devices = []
+        for i in range(p.get_device_count()):
+            info = p.get_device_info_by_index(i)
+            device = AudioDevice(
+                index=i,
+                name=info["name"],
+                host_api=p.get_host_api_info_by_index(info["hostApi"])["name"],
+                max_input_channels=int(info["maxInputChannels"]),
+                max_output_channels=int(info["maxOutputChannels"]),
+                default_sample_rate=float(info["defaultSampleRate"]),
+            )
+            for direction in (INPUT, OUTPUT):
+                if device.channels(direction) > 0:
+                    device.rates[direction] = [rate for rate in self.probe_rates
+                                               if self._probe(device, direction, rate, 1)]
+            devices.append(device)
+
+        self._devices = devices
+        self._by_name = {d.name.lower(): d for d in devices}
+        self._scanned_at = time.monotonic()
+        self._signature = signature
+        self.scan_time = time.perf_counter() - t0
+
+    def _probe(self, device, direction, rate, channels):
+        p = get_pyaudio()
+        kwargs = {f"{direction}_device": device.index,
+                  f"{direction}_channels": channels,
+                  f"{direction}_format": PA_INT16}
+        try:
+            return p.is_format_supported(rate, **kwargs)
+        except ValueError:
+            return False
+
+    def devices(self, direction=None):
+        """
+        所有设备，或指定方向的设备
+
+        Args:
+            direction: None、"input" 或 "output"
+        """
+        if self._stale():
+            self.refresh()
+        if direction is None:
+            return list(self._devices)
+        return [d for d in self._devices if d.channels(direction) > 0]
+
+    def find(self, name, direction=None):
+        """
+        按编号或名称查找设备，名称不区分大小写，先精确匹配再按子串匹配
+
+        Args:
+            name: 设备编号或名称（如 "USB"、"default"）
+            direction: 限定方向
+
+        Returns:
+            AudioDevice，找不到时抛出 LookupError
+        """
+        candidates = self.devices(direction)
+        if isinstance(name, int) or str(name).isdigit():
+            for device in candidates:
+                if device.index == int(name):
+                    return device
+            raise LookupError(f"没有编号为 {name} 的音频设备")
+        key = name.lower()
+        exact = self._by_name.get(key)
+        if exact is not None and exact in candidates:
+            return exact
+        for device in candidates:
+            if key in device.name.lower():
+                return device
+        names = ", ".join(d.name for d in candidates)
+        raise LookupError(f"找不到音频设备 '{name}'，可用设备: {names}")
+
+    def with_rate(self, rate, direction):
+        """支持指定采样率的设备"""
+        return [d for d in self.devices(direction) if rate in d.rates.get(direction, [])]
+
+    def validate(self, device, rate, channels, direction):
+        """
+        打开音频流前校验设备是否支持 (采样率, 声道数)
+
+        Args:
+            device: AudioDevice、设备编号、名称，或 None 表示默认设备
+            rate: 采样率
+            channels: 声道数
+            direction: "input" 或 "output"
+
+        Returns:
+            设备编号，可直接传给 PyAudio.open()；默认设备返回 None
+        """
+        # 先按需刷新设备列表，声卡插拔后默认设备的编号可能变化
+        self.devices(direction)
+        if device is None:
+            p = get_pyaudio()
+            try:
+                info = (p.get_default_input_device_info() if direction == INPUT
+                        else p.get_default_output_device_info())
+            except IOError:
+                raise LookupError("没有默认的音频" + ("输入" if direction == INPUT else "输出") + "设备")
+            device = info["index"]
+            default = True
+        else:
+            default = False
+        if not isinstance(device, AudioDevice):
+            device = self.find(device, direction)
+
+        if channels > device.channels(direction):
+            raise ValueError(f"{device.name} 最多支持 {device.channels(direction)} 个"
+                             f"{'输入' if direction == INPUT else '输出'}声道，请求 {channels}")
+        rates = device.rates.setdefault(direction, [])
+        key = (direction, rate, channels)
+        if key not in device.checked:
+            # 枚举时只探测了单声道的常用采样率，其他组合现场探测一次，结果缓存
+            known = channels == 1 and rate in rates
+            if not known and not self._probe(device, direction, rate, channels):
+                raise ValueError(f"{device.name} 不支持 {rate} Hz / {channels} 声道，"
+                                 f"支持的采样率: {rates}")
+            device.checked.add(key)
+            if rate not in rates:
+                rates.append(rate)
+                rates.sort()
+        return None if default else device.index
+
+    def print_devices(self):
+        """打印设备列表"""
+        devices = self.devices()
+        print("可用的音频设备:")
+        print("-" * 80)
+        for d in devices:
+            print(f"设备 {d.index}: {d.name}（{d.host_api}）")
+            print(f"  最大输入通道数: {d.max_input_channels}")
+            print(f"  最大输出通道数: {d.max_output_channels}")
+            print(f"  默认采样率: {d.default_sample_rate}")
+            for direction, label in ((INPUT, "输入"), (OUTPUT, "输出")):
+                if direction in d.rates:
+                    print(f"  支持的{label}采样率: {', '.join(str(r) for r in d.rates[direction])}")
+            print()
+        print(f"枚举耗时 {self.scan_time * 1000:.0f} ms（缓存 {self.ttl:.0f} 秒，插拔声卡时自动刷新）"
+              if self.ttl is not None else f"枚举耗时 {self.scan_time * 1000:.0f} ms")
+
+
+# 进程内共享的注册表
+registry = AudioDeviceRegistry()
+
+
+def measure_startup(repeats=5, sample_rate=16000, channels=1):
+    """
+    测量录音、播放的启动耗时：每次新建 PyAudio 并扫描设备 vs 共享实例和设备缓存
+
+    “启动”指从调用到音频流打开完成，不含录音、播放本身
+
+    Args:
+        repeats: 每种方式重复次数
+        sample_rate: 采样率
+        channels: 声道数
+    """
+    import numpy as np
+
+    pyaudio = require("pyaudio", "麦克风和扬声器")
+
+    def open_close(p, input_device, output_device):
+        for direction, device in ((INPUT, input_device), (OUTPUT, output_device)):
+            stream = p.open(format=PA_INT16, channels=channels, rate=sample_rate,
+                            input=direction == INPUT, output=direction == OUTPUT,
+                            input_device_index=device if direction == INPUT else None,
+                            output_device_index=device if direction == OUTPUT else None,
+                            frames_per_buffer=1024)
+            stream.close()
+
+    def old_way():
+        # 原先 record_audio / play_audio 的做法：每次新建 PyAudio，按名称查找时还要扫描一遍设备
+        p = pyaudio.PyAudio()
+        for i in range(p.get_device_count()):
+            p.get_device_info_by_index(i)
+        open_close(p, None, None)
+        p.terminate()
+
+    def new_way():
+        input_device = registry.validate(None, sample_rate, channels, INPUT)
+        output_device = registry.validate(None, sample_rate, channels, OUTPUT)
+        open_close(get_pyaudio(), input_device, output_device)
+
+    reset_pyaudio()
+    results = {}
+    for label, func in (("每次新建 PyAudio", old_way), ("共享实例 + 设备缓存", new_way)):
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - t0) * 1000)
+        results[label] = times
+        print(f"  {label}: 首次 {times[0]:.0f} ms，之后平均 {np.mean(times[1:]):.0f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python audio_devices.py list  # 列出设备和支持的采样率")
+        print("  python audio_devices.py check <设备名称或编号> <input|output> [采样率] [声道数]  # 校验设备能力")
+        print("  python audio_devices.py startup [次数]  # 对比录音、播放的启动耗时")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "list":
+        registry.print_devices()
+    elif command == "check":
+        name, direction = sys.argv[2], sys.argv[3]
+        rate = int(sys.argv[4]) if len(sys.argv) > 4 else 16000
+        channels = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        try:
+            registry.validate(name, rate, channels, direction)
+            print(f"设备支持 {rate} Hz / {channels} 声道")
+        except (LookupError, ValueError) as e:
+            print(f"错误: {e}")
+    elif command == "startup":
+        repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+        measure_startup(repeats)
+    else:
+        print(f"未知命令: {command}")
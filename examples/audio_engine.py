@@ -0,0 +1,435 @@
+"""
+回调模式全双工音频引擎
+进程内共享一个 PyAudio 实例，录音和播放在同一个回调中完成，
+回调与应用线程之间通过单生产者单消费者环形缓冲区交换数据，回调中不加锁、不分配大块内存。
+内置延迟统计和 xrun（输入溢出、输出欠载）计数，用于低延迟对讲
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.audio_devices import INPUT, OUTPUT, get_pyaudio, registry
+
+# PortAudio 回调状态和返回值，与 pyaudio.paInputOverflow、pyaudio.paOutputUnderflow、pyaudio.paContinue 相同
+INPUT_OVERFLOW = 0x2
+OUTPUT_UNDERFLOW = 0x4
+CONTINUE = 0
+
+
+class RingBuffer:
+    """
+    单生产者单消费者环形缓冲区
+
+    写位置只由生产者修改，读位置只由消费者修改，两者都是累计帧数；
+    先复制数据再推进位置，另一方看到新位置时数据已经就绪，因此不需要锁。
+    """
+
+    def __init__(self, frames, channels=1, dtype=np.int16):
+        """
+        Args:
+            frames: 容量（帧）
+            channels: 声道数
+            dtype: 采样类型
+        """
+        self.capacity = frames
+        self.channels = channels
+        self._buffer = np.zeros((frames, channels), dtype=dtype)
+        self.write_pos = 0
+        self.read_pos = 0
+        # 缓冲区满时丢弃的帧数
+        self.overruns = 0
+
+    @property
+    def available(self):
+        """可读帧数"""
+        return self.write_pos - self.read_pos
+
+    @property
+    def free(self):
+        """可写帧数"""
+        return self.capacity - self.available
+
+    def write(self, data):
+        """
+        写入数据，放不下的部分丢弃并计入 overruns
+
+        Args:
+            data: 形状为 (帧数, 声道数) 的数组
+
+        Returns:
+            实际写入的帧数
+        """
+        count = min(len(data), self.free)
+        self.overruns += len(data) - count
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        self._buffer[:count - first] = data[first:count]
+        self.write_pos += count
+        return count
+
+    def read_into(self, out):
+        """
+        读取数据到 out
+
+        Args:
+            out: 形状为 (帧数, 声道数) 的数组
+
+        Returns:
+            实际读取的帧数，不足时 out 的其余部分保持不变
+        """
+        count = min(len(out), self.available)
+        start = self.read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        out[first:count] = self._buffer[:count - first]
+        self.read_pos += count
+        return count
+
+    def discard(self):
+        """丢弃所有未读数据（由消费者调用）"""
+        self.read_pos = self.write_pos
+
+
+class AudioEngine:
+    """
+    全双工音频引擎
+
+    启动后一个回调同时处理录音和播放:
+        录音数据写入 capture 环形缓冲区，应用用 read() 取出
+        应用用 write() 把数据放入 playback 环形缓冲区，回调按块取出播放，不足时补静音
+        monitor=True 时录音数据在回调内直接送到输出（对讲），延迟只有一个缓冲块加设备延迟
+    """
+
+    def __init__(self, sample_rate=16000, channels=1, frames_per_buffer=256,
+                 input_device=None, output_device=None, buffer_seconds=2.0):
+        """
+        Args:
+            sample_rate: 采样率
+            channels: 声道数（录音和播放相同）
+            frames_per_buffer: 每次回调的帧数，越小延迟越低，回调越频繁
+            input_device: 输入设备编号或名称，None 表示默认设备
+            output_device: 输出设备编号或名称，None 表示默认设备
+            buffer_seconds: 录音、播放环形缓冲区的容量（秒）
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.input_device = input_device
+        self.output_device = output_device
+        capacity = int(buffer_seconds * sample_rate)
+        self.capture = RingBuffer(capacity, channels)
+        self.playback = RingBuffer(capacity, channels)
+        self.monitor = False
+        self.monitor_gain = 1.0
+        self.stream = None
+        self._output = True
+        self._out = np.zeros((frames_per_buffer, channels), dtype=np.int16)
+        self._mix = np.zeros((frames_per_buffer, channels), dtype=np.int32)
+        self._playing = False
+        self._mark_pending = False
+        self.mark_frame = None
+        # 统计
+        self.frames = 0
+        self.callbacks = 0
+        self.input_overflows = 0
+        self.output_underflows = 0
+        self.playback_underruns = 0
+        self.callback_time = 0.0
+        self.max_callback_time = 0.0
+
+    @property
+    def running(self):
+        return self.stream is not None and self.stream.is_active()
+
+    def start(self, capture=True, playback=True):
+        """
+        打开音频流并开始回调
+
+        Args:
+            capture: 是否录音
+            playback: 是否播放
+        """
+        if self.stream is not None:
+            return
+        # 打开前校验设备能力，不支持时给出明确的错误而不是 PortAudio 的错误码
+        input_index = registry.validate(self.input_device, self.sample_rate, self.channels, INPUT) \
+            if capture else None
+        output_index = registry.validate(self.output_device, self.sample_rate, self.channels, OUTPUT) \
+            if playback else None
+        p = get_pyaudio()
+        self._output = playback
+        self._out = np.zeros((self.frames_per_buffer, self.channels), dtype=np.int16)
+        self.stream = p.open(
+            format=p.get_format_from_width(2),
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=capture,
+            output=playback,
+            input_device_index=input_index,
+            output_device_index=output_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+
+    def stop(self):
+        """停止并关闭音频流，共享的 PyAudio 实例保留"""
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        t0 = time.perf_counter()
+        if status & INPUT_OVERFLOW:
+            self.input_overflows += 1
+        if status & OUTPUT_UNDERFLOW:
+            self.output_underflows += 1
+
+        samples = None
+        if in_data is not None:
+            samples = np.frombuffer(in_data, dtype=np.int16).reshape(-1, self.channels)
+            self.capture.write(samples)
+
+        out_data = None
+        if self._output:
+            out = self._out[:frame_count]
+            count = self.playback.read_into(out)
+            out[count:] = 0
+            if count < frame_count and self._playing:
+                self.playback_underruns += 1
+            if count and self._mark_pending:
+                self.mark_frame = self.frames
+                self._mark_pending = False
+            if self.monitor and samples is not None:
+                mix = self._mix[:frame_count]
+                np.multiply(samples, self.monitor_gain, out=mix, casting="unsafe")
+                mix += out
+                np.clip(mix, -32768, 32767, out=mix)
+                out[:] = mix
+            out_data = out.tobytes()
+
+        self.frames += frame_count
+        self.callbacks += 1
+        elapsed = time.perf_counter() - t0
+        self.callback_time += elapsed
+        if elapsed > self.max_callback_time:
+            self.max_callback_time = elapsed
+        return out_data, CONTINUE
+
+    def read(self, frames, timeout=None):
+        """
+        读取录音数据，不足时等待
+
+        Args:
+            frames: 帧数
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            形状为 (帧数, 声道数) 的 int16 数组，超时时返回已读到的部分
+        """
+        out = np.empty((frames, self.channels), dtype=np.int16)
+        filled = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        period = self.frames_per_buffer / self.sample_rate
+        while filled < frames:
+            filled += self.capture.read_into(out[filled:])
+            if filled < frames:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                time.sleep(period / 2)
+        return out[:filled]
+
+    def write(self, samples):
+        """
+        把数据放入播放缓冲区，缓冲区满时等待
+
+        Args:
+            samples: int16 数组，形状为 (帧数,) 或 (帧数, 声道数)
+        """
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1, self.channels)
+        self._playing = True
+        period = self.frames_per_buffer / self.sample_rate
+        while len(samples):
+            count = min(len(samples), self.playback.free)
+            self.playback.write(samples[:count])
+            samples = samples[count:]
+            if len(samples):
+                time.sleep(period / 2)
+
+    def drain(self):
+        """等待播放缓冲区中的数据播放完"""
+        self._playing = False
+        period = self.frames_per_buffer / self.sample_rate
+        while self.playback.available and self.running:
+            time.sleep(period / 2)
+        # 最后一块还在设备缓冲中
+        time.sleep(period + (self.stream.get_output_latency() if self.stream is not None else 0))
+
+    def latency(self):
+        """
+        当前各环节延迟（秒）
+
+        Returns:
+            dict: input / output 为设备报告的延迟，buffer 为一个回调块，
+            capture_queue / playback_queue 为环形缓冲区中排队的数据
+        """
+        result = {
+            "buffer": self.frames_per_buffer / self.sample_rate,
+            "capture_queue": self.capture.available / self.sample_rate,
+            "playback_queue": self.playback.available / self.sample_rate,
+        }
+        if self.stream is not None:
+            result["input"] = self.stream.get_input_latency()
+            result["output"] = self.stream.get_output_latency()
+        return result
+
+    def report(self):
+        """打印统计"""
+        avg = self.callback_time / self.callbacks * 1e6 if self.callbacks else 0.0
+        print(f"回调 {self.callbacks} 次，平均 {avg:.0f} us，最长 {self.max_callback_time * 1e6:.0f} us"
+              f"（每块 {self.frames_per_buffer / self.sample_rate * 1000:.1f} ms）")
+        print(f"xrun: 输入溢出 {self.input_overflows}，输出欠载 {self.output_underflows}；"
+              f"录音缓冲满丢弃 {self.capture.overruns} 帧，播放数据不足 {self.playback_underruns} 次")
+        latency = self.latency()
+        if "input" in latency:
+            total = latency["input"] + latency["output"] + latency["buffer"]
+            print(f"设备延迟: 输入 {latency['input'] * 1000:.1f} ms，输出 {latency['output'] * 1000:.1f} ms，"
+                  f"对讲回环约 {total * 1000:.1f} ms")
+
+
+def talkback(duration=None, sample_rate=16000, frames_per_buffer=128, gain=1.0):
+    """
+    对讲：麦克风声音实时从扬声器播放
+
+    Args:
+        duration: 时长（秒），None 表示直到按 Ctrl+C
+        sample_rate: 采样率
+        frames_per_buffer: 每次回调的帧数
+        gain: 监听增益
+    """
+    engine = AudioEngine(sample_rate, frames_per_buffer=frames_per_buffer)
+    engine.monitor = True
+    engine.monitor_gain = gain
+    engine.start()
+    print("对讲中，按 Ctrl+C 停止")
+    start_time = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - start_time < duration:
+            time.sleep(0.2)
+            # 监听模式不读取录音缓冲，保持为空
+            engine.capture.discard()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        engine.stop()
+    engine.report()
+
+
+def measure_loopback_latency(sample_rate=16000, frames_per_buffer=128, repeats=5):
+    """
+    测量声学回环延迟：扬声器播放短促的提示音，从麦克风录音中找到它的起点
+
+    录音和播放在同一个全双工回调中按相同的帧计数推进，
+    提示音第一帧被送出的帧号与录音中检测到起点的帧号之差即为回环延迟（扬声器和麦克风需靠近）
+
+    Args:
+        sample_rate: 采样率
+        frames_per_buffer: 每次回调的帧数
+        repeats: 测量次数
+
+    Returns:
+        每次测量的延迟（秒）列表，未检测到时为 None
+    """
+    t = np.arange(int(0.02 * sample_rate)) / sample_rate
+    click = (np.sin(2 * np.pi * 1000 * t) * 20000).astype(np.int16)
+    results = []
+
+    with AudioEngine(sample_rate, frames_per_buffer=frames_per_buffer) as engine:
+        time.sleep(0.5)
+        for i in range(repeats):
+            engine.drain()
+            engine.capture.discard()
+            base = engine.capture.read_pos
+            # 先读 0.1 秒作为背景噪声
+            noise = engine.read(int(0.1 * sample_rate), timeout=1.0)
+            threshold = max(np.abs(noise.astype(np.int32)).max() * 4, 2000)
+            engine._mark_pending = True
+            engine.write(click)
+            recorded = engine.read(int(0.5 * sample_rate), timeout=2.0)
+            loud = np.nonzero(np.abs(recorded[:, 0].astype(np.int32)) > threshold)[0]
+            if len(loud) == 0 or engine.mark_frame is None:
+                results.append(None)
+                print(f"  第 {i + 1} 次: 未检测到提示音")
+                continue
+            onset = base + len(noise) + loud[0]
+            latency = (onset - engine.mark_frame) / sample_rate
+            results.append(latency)
+            print(f"  第 {i + 1} 次: {latency * 1000:.1f} ms")
+        engine.report()
+    return results
+
+
+def benchmark(sample_rate=16000, seconds=60.0):
+    """
+    无需声卡：直接调用回调函数，测量不同块大小下的回调耗时
+
+    回调耗时必须远小于一个块的时长，否则会出现 xrun
+
+    Args:
+        sample_rate: 采样率
+        seconds: 每种块大小模拟的音频时长（秒）
+    """
+    print(f"采样率 {sample_rate} Hz，单声道，全双工 + 监听混音，每种块大小模拟 {seconds:.0f} 秒")
+    for frames_per_buffer in (64, 128, 256, 512, 1024):
+        engine = AudioEngine(sample_rate, frames_per_buffer=frames_per_buffer)
+        engine.monitor = True
+        in_data = (np.random.default_rng(0).integers(-3000, 3000, frames_per_buffer)
+                   .astype(np.int16).tobytes())
+        tone = np.zeros(frames_per_buffer * 4, dtype=np.int16)
+        for _ in range(int(seconds * sample_rate / frames_per_buffer)):
+            # 模拟应用线程：取走录音，补充播放数据
+            engine.capture.discard()
+            if engine.playback.free >= len(tone):
+                engine.playback.write(tone.reshape(-1, 1))
+            engine._callback(in_data, frames_per_buffer, None, 0)
+        period = frames_per_buffer / sample_rate * 1e6
+        avg = engine.callback_time / engine.callbacks * 1e6
+        print(f"  {frames_per_buffer:5d} 帧/块（{period / 1000:5.1f} ms）: 回调平均 {avg:5.1f} us，"
+              f"最长 {engine.max_callback_time * 1e6:6.1f} us，占用 {avg / period * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python audio_engine.py talkback [时长] [块大小]  # 对讲：麦克风实时从扬声器播放")
+        print("  python audio_engine.py latency [块大小]  # 测量声学回环延迟（扬声器和麦克风需靠近）")
+        print("  python audio_engine.py bench  # 无需声卡，测量回调耗时")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "talkback":
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else None
+        frames_per_buffer = int(sys.argv[3]) if len(sys.argv) > 3 else 128
+        talkback(duration, frames_per_buffer=frames_per_buffer)
+    elif command == "latency":
+        frames_per_buffer = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+        measure_loopback_latency(frames_per_buffer=frames_per_buffer)
+    elif command == "bench":
+        benchmark()
+    else:
+        print(f"未知命令: {command}")
@@ -2,42 +2,43 @@
 麦克风扬声器基础示例
 使用 pyaudio 进行音频录制和播放
 """
-import pyaudio
+import os
 import wave
 import sys
 
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.audio_devices import INPUT, OUTPUT, PA_INT16, get_pyaudio, registry
+from examples.streaming_wav import StreamingWavWriter
+
 
 def list_audio_devices():
-    """列出所有可用的音频设备"""
-    p = pyaudio.PyAudio()
-    print("可用的音频设备:")
-    print("-" * 80)
-    
-    for i in range(p.get_device_count()):
-        info = p.get_device_info_by_index(i)
-        print(f"设备 {i}: {info['name']}")
-        print(f"  最大输入通道数: {info['maxInputChannels']}")
-        print(f"  最大输出通道数: {info['maxOutputChannels']}")
-        print(f"  默认采样率: {info['defaultSampleRate']}")
-        print()
-    
-    p.terminate()
+    """列出所有可用的音频设备（结果缓存，插拔声卡时自动刷新）"""
+    registry.print_devices()
 
 
-def record_audio(filename="recording.wav", duration=5, sample_rate=16000, channels=1):
+def record_audio(filename="recording.wav", duration=5, sample_rate=16000, channels=1, device=None):
     """
     录制音频
     
+    音频块读取后直接追加写入文件，每秒回写一次文件头，内存占用不随时长增长，
+    中途崩溃时已录制的部分仍可播放
+    
     Args:
         filename: 保存的文件名
         duration: 录制时长（秒）
         sample_rate: 采样率，默认 16000
         channels: 声道数，1=单声道，2=立体声
+        device: 输入设备编号或名称（如 "USB"），None 表示默认设备
     """
     chunk = 1024
-    format = pyaudio.paInt16
+    format = PA_INT16
     
-    p = pyaudio.PyAudio()
+    # 共享 PyAudio 实例，设备信息来自缓存，不再每次初始化和扫描
+    p = get_pyaudio()
+    device_index = registry.validate(device, sample_rate, channels, INPUT)
     
     print(f"开始录制 {duration} 秒...")
     print(f"采样率: {sample_rate} Hz, 声道: {channels}")
@@ -47,50 +48,51 @@ def record_audio(filename="recording.wav", duration=5, sample_rate=16000, channe
         channels=channels,
         rate=sample_rate,
         input=True,
+        input_device_index=device_index,
         frames_per_buffer=chunk
     )
     
-    frames = []
+    # 边录边写 WAV 文件
+    wf = StreamingWavWriter(filename, channels, sample_rate, p.get_sample_size(format))
     
     try:
         for _ in range(0, int(sample_rate / chunk * duration)):
             data = stream.read(chunk)
-            frames.append(data)
+            wf.write(data)
     except KeyboardInterrupt:
         print("\n录制被中断")
     finally:
         stream.stop_stream()
         stream.close()
-        p.terminate()
-        
-        # 保存为 WAV 文件
-        wf = wave.open(filename, 'wb')
-        wf.setnchannels(channels)
-        wf.setsampwidth(p.get_sample_size(format))
-        wf.setframerate(sample_rate)
-        wf.writeframes(b''.join(frames))
         wf.close()
         
         print(f"录制完成，已保存到: {filename}")
 
 
-def play_audio(filename):
+def play_audio(filename, device=None):
     """
     播放音频文件
     
     Args:
         filename: 要播放的音频文件名
+        device: 输出设备编号或名称，None 表示默认设备
     """
     chunk = 1024
     
     wf = wave.open(filename, 'rb')
-    p = pyaudio.PyAudio()
+    p = get_pyaudio()
+    try:
+        device_index = registry.validate(device, wf.getframerate(), wf.getnchannels(), OUTPUT)
+    except (LookupError, ValueError):
+        wf.close()
+        raise
     
     stream = p.open(
         format=p.get_format_from_width(wf.getsampwidth()),
         channels=wf.getnchannels(),
         rate=wf.getframerate(),
-        output=True
+        output=True,
+        output_device_index=device_index
     )
     
     print(f"正在播放: {filename}")
@@ -106,17 +108,26 @@ def play_audio(filename):
     finally:
         stream.stop_stream()
         stream.close()
-        p.terminate()
         wf.close()
         print("播放完成")
 
 
-def record_and_play(duration=5):
-    """录制并立即播放"""
-    filename = "temp_recording.wav"
-    record_audio(filename, duration)
-    print("\n开始播放录制的音频...")
-    play_audio(filename)
+def record_and_play(duration=5, sample_rate=16000):
+    """
+    录制并立即播放
+    
+    录音和播放共用一个全双工音频引擎，数据留在内存中，不经过临时文件
+    """
+    from examples.audio_engine import AudioEngine
+    
+    with AudioEngine(sample_rate) as engine:
+        print(f"开始录制 {duration} 秒...")
+        samples = engine.read(int(duration * sample_rate))
+        print("\n开始播放录制的音频...")
+        engine.write(samples)
+        engine.drain()
+        engine.report()
+    print("播放完成")
 
 
 if __name__ == "__main__":
@@ -128,6 +139,8 @@ if __name__ == "__main__":
         print("  python audio_example.py record [文件名] [时长]  # 录制音频，默认 recording.wav, 5秒")
         print("  python audio_example.py play <文件名>  # 播放音频文件")
         print("  python audio_example.py test [时长]  # 录制并播放，默认5秒")
+        print("  python audio_example.py talkback [时长]  # 对讲：麦克风实时从扬声器播放")
+        print("  长时间或不间断录音请使用 streaming_wav.py（回调模式、按时长轮换文件）")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -146,6 +159,11 @@ if __name__ == "__main__":
     elif command == "test":
         duration = int(sys.argv[2]) if len(sys.argv) > 2 else 5
         record_and_play(duration)
+    elif command == "talkback":
+        from examples.audio_engine import talkback
+        
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else None
+        talkback(duration)
     else:
         print(f"未知命令: {command}")
 
@@ -0,0 +1,458 @@
+"""
+音频处理流水线
+录音数据按块处理：零拷贝转换为 NumPy 数组，计算 RMS / 峰值电平，
+流式多相滤波重采样到目标采样率，按能量做语音活动检测（VAD），只保存有声音的片段
+"""
+import os
+import sys
+import time
+from collections import deque
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.streaming_wav import StreamingWavWriter
+
+FULL_SCALE = 32768.0
+
+
+def as_samples(data, channels=1):
+    """
+    PCM 字节串 -> int16 数组视图（不复制）
+
+    Args:
+        data: PyAudio 回调或 stream.read() 得到的 16 位 PCM 字节串
+        channels: 声道数
+
+    Returns:
+        形状为 (帧数, 声道数) 的只读 int16 数组
+    """
+    return np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+
+
+def block_levels(samples):
+    """
+    计算一块音频的 RMS 和峰值电平
+
+    Args:
+        samples: int16 数组
+
+    Returns:
+        (rms_dbfs, peak_dbfs)，静音时为 -inf
+    """
+    flat = samples.reshape(-1)
+    if len(flat) == 0:
+        return float("-inf"), float("-inf")
+    x = flat.astype(np.float32)
+    rms = np.sqrt(np.dot(x, x) / len(x)) / FULL_SCALE
+    # int16 的最小值 -32768 取绝对值会溢出，分别取最大、最小值
+    peak = max(int(flat.max()), -int(flat.min())) / FULL_SCALE
+    with np.errstate(divide="ignore"):
+        return float(20 * np.log10(rms)), float(20 * np.log10(peak))
+
+
+class StreamingResampler:
+    """
+    流式多相滤波重采样
+
+    采样率比化为 up/down 的最简整数比，Kaiser 窗 sinc 低通滤波器按相位拆分，
+    每个输出采样只计算一个相位的 taps 次乘加；块之间保留滤波器历史和相位，
+    任意切块的结果与整段一次处理相同。
+    """
+
+    def __init__(self, from_rate, to_rate, zero_crossings=16, beta=8.0):
+        """
+        Args:
+            from_rate: 输入采样率
+            to_rate: 输出采样率
+            zero_crossings: sinc 单侧过零点数，越大过渡带越窄、计算量越大
+            beta: Kaiser 窗参数，越大阻带衰减越大
+        """
+        g = gcd(int(from_rate), int(to_rate))
+        self.up = int(to_rate) // g
+        self.down = int(from_rate) // g
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+
+        # 在上采样后的采样率上设计低通滤波器，截止频率取两个采样率中较低者的奈奎斯特频率
+        factor = max(self.up, self.down)
+        length = 2 * zero_crossings * factor + 1
+        n = np.arange(length) - (length - 1) / 2
+        h = np.sinc(n / factor) * np.kaiser(length, beta) * (self.up / factor)
+        # 拆分为 up 个相位，每个相位 taps 个系数；按时间倒序排列，直接与输入窗口点乘
+        self.taps = -(-length // self.up)
+        h = np.concatenate([h, np.zeros(self.taps * self.up - length)])
+        self._phases = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32)
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        # 下一个输出对应的上采样位置（相对当前块起点）
+        self._position = 0
+        # 滤波器群延迟（输出采样数），对齐时使用
+        self.delay = (length - 1) / 2 / self.down if factor > 1 else 0.0
+
+    def process(self, x):
+        """
+        重采样一块单声道数据
+
+        Args:
+            x: 一维数组（int16 或 float）
+
+        Returns:
+            float32 一维数组，幅度与输入相同
+        """
+        buf = np.concatenate([self._history, np.asarray(x, dtype=np.float32)])
+        count = len(x)
+        if self.up == 1 and self.down == 1:
+            return buf[len(self._history):].copy()
+        positions = np.arange(self._position, count * self.up, self.down)
+        if len(positions):
+            phase = positions % self.up
+            index = positions // self.up
+            windows = sliding_window_view(buf, self.taps)
+            if self.up <= 8:
+                # 每隔 up 个输出相位重复一次，对应的输入窗口间隔 down 个采样：
+                # 每个相位用跨步视图做一次矩阵向量乘法，不复制窗口
+                y = np.empty(len(positions), dtype=np.float32)
+                for j in range(min(self.up, len(positions))):
+                    rows = windows[index[j]::self.down][:len(y[j::self.up])]
+                    y[j::self.up] = rows @ self._phases[phase[j]]
+            else:
+                y = np.einsum("nk,nk->n", windows[index], self._phases[phase])
+            self._position = int(positions[-1]) + self.down - count * self.up
+        else:
+            y = np.zeros(0, dtype=np.float32)
+            self._position -= count * self.up
+        self._history = buf[len(buf) - (self.taps - 1):]
+        return y
+
+
+class SegmentWavSink:
+    """把每个有声片段写成单独的 WAV 文件，文件名为片段开始时刻"""
+
+    def __init__(self, output_dir, sample_rate, prefix="voice"):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.prefix = prefix
+        self.files = []
+        self.bytes_written = 0
+        self._writer = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def start(self, timestamp):
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(timestamp))
+        millis = int(timestamp * 1000) % 1000
+        filename = os.path.join(self.output_dir, f"{self.prefix}_{stamp}_{millis:03d}.wav")
+        self._writer = StreamingWavWriter(filename, 1, self.sample_rate)
+        self.files.append(filename)
+
+    def write(self, samples):
+        self._writer.write(samples.tobytes())
+
+    def end(self, timestamp):
+        self.bytes_written += self._writer.data_bytes
+        self._writer.close()
+        self._writer = None
+
+
+class EnergyVAD:
+    """
+    基于能量的语音活动检测
+
+    按 frame_ms 分帧（一块内的所有帧向量化计算能量），噪声底噪跟踪最小能量并缓慢上升，
+    能量高于底噪 margin_db 判为有声；有声后保持 hangover_ms，
+    开始时补上之前 preroll_ms 的音频，避免截掉字头。
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=20, margin_db=12.0, min_db=-55.0,
+                 hangover_ms=400, preroll_ms=200, floor_rise_db=0.5, sink=None):
+        """
+        Args:
+            sample_rate: 采样率
+            frame_ms: 帧长（毫秒）
+            margin_db: 高于底噪多少分贝判为有声
+            min_db: 绝对能量下限（dBFS），低于此值总是判为静音
+            hangover_ms: 声音结束后继续保留的时长
+            preroll_ms: 片段开始前补上的时长
+            floor_rise_db: 底噪每秒最多上升的分贝数
+            sink: 接收片段的对象，需提供 start(timestamp)、write(samples)、end(timestamp)
+        """
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.floor_rise = floor_rise_db * frame_ms / 1000
+        self.sink = sink
+        self.noise_floor = None
+        self.active = False
+        self._hold = 0
+        self._carry = np.zeros(0, dtype=np.int16)
+        self._preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self._frames = 0
+        self._start_time = None
+        # 统计
+        self.total_frames = 0
+        self.active_frames = 0
+        self.segments = 0
+
+    def frame_energy(self, frames):
+        """每帧能量（dBFS），frames 形状为 (帧数, 帧长)"""
+        x = frames.astype(np.float32)
+        power = np.einsum("ij,ij->i", x, x) / (self.frame_len * FULL_SCALE * FULL_SCALE)
+        return 10 * np.log10(power + 1e-12)
+
+    def process(self, samples):
+        """
+        处理一块单声道 int16 音频
+
+        Args:
+            samples: 一维 int16 数组
+        """
+        if self._start_time is None:
+            self._start_time = time.time()
+        if len(self._carry):
+            samples = np.concatenate([self._carry, samples])
+        count = len(samples) // self.frame_len
+        frames = samples[:count * self.frame_len].reshape(count, self.frame_len)
+        self._carry = samples[count * self.frame_len:].copy()
+        if count == 0:
+            return
+
+        energies = self.frame_energy(frames)
+        for frame, energy in zip(frames, energies):
+            if self.noise_floor is None:
+                self.noise_floor = energy
+            self.noise_floor = min(energy, self.noise_floor + self.floor_rise)
+            voiced = energy > self.noise_floor + self.margin_db and energy > self.min_db
+            if voiced:
+                self._hold = self.hangover_frames
+                if not self.active:
+                    self._begin()
+            elif self.active:
+                self._hold -= 1
+                if self._hold <= 0:
+                    self._finish()
+
+            if self.active:
+                self.active_frames += 1
+                if self.sink is not None:
+                    self.sink.write(frame)
+            else:
+                self._preroll.append(frame)
+            self._frames += 1
+        self.total_frames += count
+
+    def _time(self, frame_index):
+        return self._start_time + frame_index * self.frame_len / self.sample_rate
+
+    def _begin(self):
+        self.active = True
+        self.segments += 1
+        if self.sink is not None:
+            self.sink.start(self._time(self._frames - len(self._preroll)))
+            for frame in self._preroll:
+                self.sink.write(frame)
+        self.active_frames += len(self._preroll)
+        self._preroll.clear()
+
+    def _finish(self):
+        self.active = False
+        if self.sink is not None:
+            self.sink.end(self._time(self._frames))
+
+    def close(self):
+        if self.active:
+            self._finish()
+
+
+class AudioPipeline:
+    """
+    录音处理流水线：电平 -> 重采样 -> VAD -> 片段文件
+
+    process() 接受 PyAudio 的字节串或 int16 数组，可直接用于 AudioEngine.read() 的结果
+    """
+
+    def __init__(self, device_rate=48000, target_rate=16000, output_dir="voice", vad=None):
+        """
+        Args:
+            device_rate: 设备采样率
+            target_rate: 保存和后续处理使用的采样率
+            output_dir: 有声片段的保存目录，None 表示只检测不保存
+            vad: EnergyVAD，默认使用默认参数
+        """
+        self.device_rate = device_rate
+        self.target_rate = target_rate
+        self.resampler = StreamingResampler(device_rate, target_rate)
+        self.sink = SegmentWavSink(output_dir, target_rate) if output_dir is not None else None
+        self.vad = vad or EnergyVAD(target_rate)
+        self.vad.sink = self.sink
+        self.rms_db = float("-inf")
+        self.peak_db = float("-inf")
+        self.input_bytes = 0
+
+    def process(self, data):
+        """
+        处理一块单声道音频
+
+        Args:
+            data: 16 位 PCM 字节串或 int16 数组
+        """
+        samples = as_samples(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        samples = samples.reshape(-1)
+        self.input_bytes += samples.nbytes
+        self.rms_db, self.peak_db = block_levels(samples)
+        resampled = self.resampler.process(samples)
+        np.clip(resampled, -32768, 32767, out=resampled)
+        self.vad.process(resampled.astype(np.int16))
+
+    def close(self):
+        self.vad.close()
+
+    def report(self):
+        vad = self.vad
+        ratio = vad.active_frames / vad.total_frames if vad.total_frames else 0.0
+        print(f"处理 {vad.total_frames * vad.frame_len / self.target_rate:.1f} 秒音频，"
+              f"有声 {ratio * 100:.1f}%，{vad.segments} 个片段")
+        if self.sink is not None and self.input_bytes:
+            print(f"输入 {self.input_bytes / 1e6:.1f} MB（{self.device_rate} Hz），"
+                  f"保存 {self.sink.bytes_written / 1e6:.2f} MB（{self.target_rate} Hz），"
+                  f"缩小 {self.input_bytes / max(self.sink.bytes_written, 1):.0f} 倍")
+
+
+def run(duration=None, device_rate=48000, target_rate=16000, output_dir="voice"):
+    """
+    从麦克风录音，只保存有声片段
+
+    Args:
+        duration: 时长（秒），None 表示直到按 Ctrl+C
+        device_rate: 设备采样率
+        target_rate: 保存的采样率
+        output_dir: 片段保存目录
+    """
+    from examples.audio_engine import AudioEngine
+
+    pipeline = AudioPipeline(device_rate, target_rate, output_dir)
+    block = device_rate // 10
+    print(f"开始录音（{device_rate} Hz -> {target_rate} Hz），有声片段保存到 {output_dir}/，按 Ctrl+C 停止")
+    start_time = time.monotonic()
+    engine = AudioEngine(device_rate, frames_per_buffer=1024)
+    try:
+        # 只录音；with 语句的 __enter__ 按默认参数会同时打开播放
+        engine.start(capture=True, playback=False)
+        while duration is None or time.monotonic() - start_time < duration:
+            pipeline.process(engine.read(block))
+            state = "有声" if pipeline.vad.active else "静音"
+            print(f"\r电平 RMS {pipeline.rms_db:6.1f} dBFS，峰值 {pipeline.peak_db:6.1f} dBFS，{state}",
+                  end="", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        pipeline.close()
+    print()
+    pipeline.report()
+
+
+def synthetic_speech(seconds, sample_rate, duty=0.2, seed=0):
+    """
+    生成模拟录音：低电平背景噪声中穿插若干段调幅的谐波“语音”
+
+    Args:
+        seconds: 时长（秒）
+        sample_rate: 采样率
+        duty: 有声时间占比
+        seed: 随机种子
+
+    Returns:
+        int16 一维数组
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    audio = rng.normal(0, 30, n).astype(np.float32)
+    t = np.arange(n, dtype=np.float32) / sample_rate
+    position = 0.0
+    while position < seconds:
+        length = rng.uniform(0.5, 3.0)
+        gap = length * (1 - duty) / duty * rng.uniform(0.5, 1.5)
+        position += gap
+        start, end = int(position * sample_rate), int(min(position + length, seconds) * sample_rate)
+        if start >= n:
+            break
+        seg = t[start:end]
+        f0 = rng.uniform(100, 250)
+        voice = sum(np.sin(2 * np.pi * f0 * k * seg) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * seg)
+        audio[start:end] += 4000 * voice * envelope
+        position += length
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def benchmark(seconds=300.0, device_rate=48000, target_rate=16000, block=4800):
+    """
+    单核吞吐测试：模拟录音按块通过流水线，分别统计各阶段耗时
+
+    Args:
+        seconds: 模拟音频时长（秒）
+        device_rate: 设备采样率
+        target_rate: 目标采样率
+        block: 每块帧数
+    """
+    import shutil
+
+    audio = synthetic_speech(seconds, device_rate)
+    data = audio.tobytes()
+    output_dir = "pipeline_bench"
+    pipeline = AudioPipeline(device_rate, target_rate, output_dir)
+    stage = {"转换+电平": 0.0, "重采样": 0.0, "VAD+写文件": 0.0}
+    step = block * 2
+
+    print(f"模拟录音 {seconds:.0f} 秒，{device_rate} Hz -> {target_rate} Hz，每块 {block} 帧，"
+          f"重采样 {pipeline.resampler.up}/{pipeline.resampler.down}，每个输出 {pipeline.resampler.taps} 次乘加")
+    try:
+        for offset in range(0, len(data), step):
+            t0 = time.perf_counter()
+            samples = as_samples(data[offset:offset + step]).reshape(-1)
+            block_levels(samples)
+            t1 = time.perf_counter()
+            resampled = pipeline.resampler.process(samples)
+            np.clip(resampled, -32768, 32767, out=resampled)
+            t2 = time.perf_counter()
+            pipeline.vad.process(resampled.astype(np.int16))
+            t3 = time.perf_counter()
+            pipeline.input_bytes += len(samples) * 2
+            stage["转换+电平"] += t1 - t0
+            stage["重采样"] += t2 - t1
+            stage["VAD+写文件"] += t3 - t2
+        pipeline.close()
+        total = sum(stage.values())
+        for name, elapsed in stage.items():
+            print(f"  {name}: {elapsed:.2f} 秒，{seconds / elapsed:.0f} 倍实时")
+        print(f"  合计: {total:.2f} 秒，单核 {seconds / total:.0f} 倍实时")
+        pipeline.report()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python audio_pipeline.py run [时长] [设备采样率] [输出目录]  # 录音并只保存有声片段")
+        print("  python audio_pipeline.py bench [秒数]  # 无需麦克风，模拟录音测吞吐和存储缩减")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "run":
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else None
+        device_rate = int(sys.argv[3]) if len(sys.argv) > 3 else 48000
+        output_dir = sys.argv[4] if len(sys.argv) > 4 else "voice"
+        run(duration, device_rate, output_dir=output_dir)
+    elif command == "bench":
+        seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 300.0
+        benchmark(seconds)
+    else:
+        print(f"未知命令: {command}")
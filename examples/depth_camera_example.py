@@ -2,101 +2,180 @@
 深度相机基础示例
 使用 pyrealsense2 进行深度相机操作
 """
-import pyrealsense2 as rs
+import os
+import sys
+import time
+
 import numpy as np
 import cv2
 
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def capture_image():
-    """拍摄一张彩色图像和深度图像"""
-    # 配置深度和彩色流
-    pipeline = rs.pipeline()
-    config = rs.config()
-    
-    # 启用彩色流
-    config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-    # 启用深度流
-    config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-    
+from examples.depth_colormap import DepthColorizer
+from examples.frame_sources import RealSenseSource, open_source
+from examples.preview_server import DEFAULT_ADDRESS, PreviewServer, has_display, parse_address, preview_address
+from examples.video_encoder import open_writer
+
+
+def _open(source):
+    """
+    创建帧源
+
+    Args:
+        source: None 表示 RealSense 深度相机，也可以是帧源对象或 open_source 支持的描述，
+            如 "synthetic"、"depth_raw.rdz"
+    """
+    if source is None:
+        # 单线程处理，帧在下一次取帧前已用完，不需要复制
+        return RealSenseSource(copy=False)
+    return open_source(source)
+
+
+def _filter_chain(filters):
+    """filters 为滤波链描述（如 "decimation=2,spatial,temporal,holes"）、DepthFilterChain 或 None"""
+    if filters is None or not isinstance(filters, str):
+        return filters
+    from examples.depth_filters import DepthFilterChain
+
+    return DepthFilterChain.from_spec(filters)
+
+
+def _fit(image, shape):
+    """降采样后的深度伪彩色图放大回彩色图尺寸，便于并排显示"""
+    if image.shape[:2] == shape[:2]:
+        return image
+    return cv2.resize(image, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+
+
+def _preview_server(preview, title="深度相机"):
+    """preview 为 HTTP 预览地址时启动预览服务器，None 时返回 None"""
+    if preview is None:
+        return None
+    return PreviewServer(*parse_address(preview), title=title).start()
+
+
+def capture_image(session=None, source=None, filters=None):
+    """
+    拍摄一张彩色图像和深度图像
+
+    Args:
+        session: 可选的 DepthCameraSession，传入时直接取会话中的最新帧，
+            不再重新启动相机和预热，适合连续多次拍摄
+        source: 帧源，默认 RealSense 深度相机
+        filters: 深度后处理滤波链描述或 DepthFilterChain，None 表示保存原始深度
+    """
+    if session is not None:
+        from examples.depth_session import save_capture
+
+        save_capture(session)
+        return
+
+    source = _open(source)
+    chain = _filter_chain(filters)
     # 启动流
-    pipeline.start(config)
+    source.start()
     
     try:
         # 等待一帧数据（让相机稳定）
-        for _ in range(30):
-            pipeline.wait_for_frames()
+        if source.live:
+            for _ in range(30):
+                frame = source.read()
+                # 预热帧同时送入滤波链，让时间滤波的状态先收敛
+                if chain is not None and frame is not None:
+                    chain(frame.depth)
         
         # 获取帧
-        frames = pipeline.wait_for_frames()
-        color_frame = frames.get_color_frame()
-        depth_frame = frames.get_depth_frame()
+        frame = source.read()
         
-        if not color_frame or not depth_frame:
+        if frame is None:
             print("无法获取帧数据")
             return
         
-        # 转换为 numpy 数组
-        color_image = np.asanyarray(color_frame.get_data())
-        depth_image = np.asanyarray(depth_frame.get_data())
-        
         # 保存彩色图像
-        cv2.imwrite("color_image.jpg", color_image)
+        cv2.imwrite("color_image.jpg", frame.color)
         print("彩色图像已保存: color_image.jpg")
         
         # 应用颜色映射到深度图像（用于可视化）
-        depth_colormap = cv2.applyColorMap(
-            cv2.convertScaleAbs(depth_image, alpha=0.03), 
-            cv2.COLORMAP_JET
-        )
+        depth_image = chain(frame.depth) if chain is not None else frame.depth
+        depth_colormap = DepthColorizer().apply(depth_image)
         cv2.imwrite("depth_image.jpg", depth_colormap)
         print("深度图像已保存: depth_image.jpg")
         
     finally:
         # 停止流
-        pipeline.stop()
+        source.stop()
 
 
-def record_video(duration=10):
-    """录制视频（彩色和深度）"""
-    pipeline = rs.pipeline()
-    config = rs.config()
-    
-    # 启用彩色流
-    config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-    # 启用深度流
-    config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-    
+def record_video(duration=10, threaded=False, raw=False, source=None, segment_duration=None,
+                 encoder="auto", preview=None, quota_gb=None):
+    """
+    录制视频（彩色和深度）
+
+    Args:
+        duration: 录制时长（秒）
+        threaded: 为 True 时使用多线程录制流水线，编码卡顿只丢帧不阻塞采集
+        raw: 为 True 时把原始 z16 深度、彩色帧和时间戳无损写入 depth_raw.rdz 容器
+        source: 帧源，默认 RealSense 深度相机
+        segment_duration: 指定时按该时长（秒）滚动分段，彩色和深度视频连续录制到 depth_video/ 目录，
+            duration 为 None 时一直录制到按 Ctrl+C
+        encoder: 视频编码描述（见 video_encoder），如 opencv:mp4v、ffmpeg:preset=veryfast,crf=28，
+            默认启动时探测，优先用 ffmpeg 编码 H.264
+        preview: HTTP 预览地址（如 "0.0.0.0:8080"），普通录制时同时在浏览器中预览，按预览帧率限速，
+            只有有人观看时才生成预览画面
+        quota_gb: 分段录制的磁盘配额（GB），见 record_segments
+    """
+    if segment_duration is not None:
+        record_segments(duration, segment_duration, source=source, encoder=encoder, quota_gb=quota_gb)
+        return
+
+    if raw:
+        record_raw(duration, source=source)
+        return
+
+    if threaded:
+        from examples.threaded_recorder import ThreadedRecorder
+
+        # 帧要跨线程排队，RealSense 和帧总线（bus:<名称>）的帧必须复制
+        source = open_source(source) if source is not None else RealSenseSource()
+        if hasattr(source, "copy"):
+            source.copy = True
+        print(f"开始录制 {duration} 秒（多线程）...")
+        ThreadedRecorder(source, encoder=encoder).record(duration).report()
+        print("彩色视频已保存: color_video.mp4")
+        print("深度视频已保存: depth_video.mp4")
+        return
+
+    source = _open(source)
     # 启动流
-    pipeline.start(config)
+    source.start()
     
     # 创建视频写入器
-    # 使用 mp4v 编码（与 MP4 容器格式兼容，避免 XVID 警告）
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    color_writer = cv2.VideoWriter('color_video.mp4', fourcc, 30.0, (640, 480))
-    depth_writer = cv2.VideoWriter('depth_video.mp4', fourcc, 30.0, (640, 480))
+    size = (source.width, source.height)
+    color_writer = open_writer('color_video.mp4', source.fps, size, encoder)
+    depth_writer = open_writer('depth_video.mp4', source.fps, size, encoder)
+    colorizer = DepthColorizer()
+    server = _preview_server(preview)
     
     try:
-        import time
         start_time = time.time()
         
         print(f"开始录制 {duration} 秒...")
         while time.time() - start_time < duration:
-            frames = pipeline.wait_for_frames()
-            color_frame = frames.get_color_frame()
-            depth_frame = frames.get_depth_frame()
+            try:
+                frame = source.read()
+            except EOFError:
+                break
             
-            if color_frame and depth_frame:
-                color_image = np.asanyarray(color_frame.get_data())
-                depth_image = np.asanyarray(depth_frame.get_data())
-                
+            if frame is not None:
                 # 应用颜色映射到深度图像
-                depth_colormap = cv2.applyColorMap(
-                    cv2.convertScaleAbs(depth_image, alpha=0.03),
-                    cv2.COLORMAP_JET
-                )
+                depth_colormap = colorizer.apply(frame.depth)
                 
-                color_writer.write(color_image)
+                color_writer.write(frame.color)
                 depth_writer.write(depth_colormap)
+                if server is not None and server.ready():
+                    server.publish(frame.color, depth_colormap)
         
         print("录制完成")
         print("彩色视频已保存: color_video.mp4")
@@ -105,68 +184,239 @@ def record_video(duration=10):
     finally:
         color_writer.release()
         depth_writer.release()
-        pipeline.stop()
+        source.stop()
+        if server is not None:
+            server.stop()
 
 
-def show_live_stream():
-    """实时显示深度相机画面"""
-    pipeline = rs.pipeline()
-    config = rs.config()
-    
-    config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-    config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-    
-    pipeline.start(config)
+def record_raw(duration=10, output_file="depth_raw.rdz", source=None):
+    """
+    无损录制原始深度和彩色帧到内存映射容器
+
+    Args:
+        duration: 录制时长（秒）
+        output_file: 输出文件名，可用 DepthContainerReader 按帧号随机读取
+        source: 帧源，默认 RealSense 深度相机
+    """
+    from examples.depth_container import DepthContainerWriter
+
+    source = _open(source)
+    source.start()
+
+    # 按录制时长预分配，避免录制过程中扩容
+    writer = DepthContainerWriter(output_file, source.width, source.height,
+                                  capacity=int(duration * source.fps) + 30)
+
+    try:
+        start_time = time.time()
+
+        print(f"开始无损录制 {duration} 秒...")
+        while time.time() - start_time < duration:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+
+            if frame is not None:
+                writer.append(frame.timestamp, frame.depth, frame.color)
+
+        print(f"录制完成，共 {writer.count} 帧")
+        print(f"深度数据已保存: {output_file}")
+
+    finally:
+        writer.close()
+        source.stop()
+
+
+def record_segments(duration=None, segment_duration=300.0, output_dir="depth_video", source=None,
+                    encoder="auto", quota_gb=None):
+    """
+    连续分段录制彩色和深度视频
+
+    Args:
+        duration: 总录制时长（秒），None 表示一直录制到按 Ctrl+C
+        segment_duration: 每个分段的时长（秒）
+        output_dir: 输出目录，彩色和深度分段分别以 color_、depth_ 开头并各有一个索引文件
+        source: 帧源，默认 RealSense 深度相机
+        encoder: 视频编码描述（见 video_encoder），默认自动选择
+        quota_gb: 磁盘配额（GB），彩色和深度两路各占一半，超出时删除各自最旧的分段；None 表示不限制
+    """
+    from examples.segmented_writer import SegmentedVideoWriter
+
+    source = _open(source)
+    source.start()
+    quota_bytes = int(quota_gb * 1024 ** 3 / 2) if quota_gb is not None else None
+    color_writer = SegmentedVideoWriter(output_dir, "color", segment_duration, source.fps, encoder,
+                                        quota_bytes=quota_bytes)
+    depth_writer = SegmentedVideoWriter(output_dir, "depth", segment_duration, source.fps, encoder,
+                                        quota_bytes=quota_bytes)
+    colorizer = DepthColorizer()
+
+    try:
+        start_time = time.time()
+
+        print(f"开始分段录制，每段 {segment_duration:.0f} 秒（按 Ctrl+C 停止）...")
+        while duration is None or time.time() - start_time < duration:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+
+            if frame is not None:
+                # 两路使用同一个帧时间戳，彩色和深度在同一帧切换分段
+                color_writer.write(frame.color, frame.timestamp)
+                depth_writer.write(colorizer.apply(frame.depth), frame.timestamp)
+    except KeyboardInterrupt:
+        print("\n录制被中断")
+    finally:
+        color_writer.close()
+        depth_writer.close()
+        source.stop()
+
+    print(f"录制完成，共 {len(color_writer.segments)} 个分段")
+    print(f"视频已保存到: {output_dir}/")
+
+
+def detect_obstacles(duration=None, address="127.0.0.1:9870", source=None, filters=None):
+    """
+    计算各角度扇区的最近障碍物距离并以 UDP 发布给运动规划
+
+    Args:
+        duration: 运行时长（秒），None 表示直到 Ctrl+C
+        address: 接收方 "主机:端口"
+        source: 帧源，默认 RealSense 深度相机
+        filters: 深度后处理滤波链描述或 DepthFilterChain，先滤波再计算扇区
+    """
+    from examples.depth_obstacles import UdpPublisher, stream_obstacles
+
+    host, _, port = address.partition(":")
+    publisher = UdpPublisher(host, int(port or 9870))
+    chain = _filter_chain(filters)
+    try:
+        stream_obstacles(_open(source), duration=duration, publisher=publisher, filters=chain)
+    finally:
+        publisher.close()
+    if chain is not None:
+        print("深度滤波各级耗时:")
+        chain.report()
+
+
+def show_live_stream(source=None, filters=None, preview=None):
+    """
+    实时显示深度相机画面
+
+    Args:
+        source: 帧源，默认 RealSense 深度相机
+        filters: 深度后处理滤波链描述或 DepthFilterChain，None 表示显示原始深度
+        preview: HTTP 预览地址（如 "0.0.0.0:8080"），指定时在浏览器中查看（MJPEG）而不是 cv2.imshow；
+            没有图形界面（如通过 SSH 登录）时默认使用 HTTP 预览
+    """
+    if preview is None and not has_display():
+        preview = DEFAULT_ADDRESS
+    source = _open(source)
+    chain = _filter_chain(filters)
+    source.start()
+    colorizer = DepthColorizer()
+    server = _preview_server(preview)
     
     try:
-        print("按 'q' 键退出")
+        print("按 Ctrl+C 退出" if server is not None else "按 'q' 键退出")
         while True:
-            frames = pipeline.wait_for_frames()
-            color_frame = frames.get_color_frame()
-            depth_frame = frames.get_depth_frame()
+            try:
+                frame = source.read()
+            except EOFError:
+                break
             
-            if not color_frame or not depth_frame:
+            if frame is None:
                 continue
             
-            color_image = np.asanyarray(color_frame.get_data())
-            depth_image = np.asanyarray(depth_frame.get_data())
-            
-            # 应用颜色映射到深度图像
-            depth_colormap = cv2.applyColorMap(
-                cv2.convertScaleAbs(depth_image, alpha=0.03),
-                cv2.COLORMAP_JET
-            )
+            # 滤波链每帧都要运行（时间滤波依赖连续帧），伪彩色只在需要显示时生成
+            depth_image = chain(frame.depth) if chain is not None else frame.depth
+            if server is not None:
+                if server.ready():
+                    server.publish(frame.color, colorizer.apply(depth_image))
+                continue
+            depth_colormap = _fit(colorizer.apply(depth_image), frame.color.shape)
             
             # 水平堆叠显示
-            images = np.hstack((color_image, depth_colormap))
+            images = np.hstack((frame.color, depth_colormap))
             cv2.imshow('深度相机 - 彩色 | 深度', images)
             
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
                 
+    except KeyboardInterrupt:
+        print("\n退出")
     finally:
-        pipeline.stop()
-        cv2.destroyAllWindows()
+        source.stop()
+        if server is not None:
+            server.stop()
+        else:
+            cv2.destroyAllWindows()
+    if chain is not None:
+        print("深度滤波各级耗时:")
+        chain.report()
 
 
 if __name__ == "__main__":
-    import sys
-    
+    # --source 指定帧源，如 synthetic、depth_raw.rdz，默认 RealSense
+    source = None
+    if "--source" in sys.argv:
+        i = sys.argv.index("--source")
+        source = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+    # --preview [地址] 在浏览器中预览（live、record），默认 0.0.0.0:8080
+    preview = preview_address(sys.argv)
+    # --encoder 指定录制的视频编码（record、segment），默认自动选择
+    encoder = "auto"
+    if "--encoder" in sys.argv:
+        i = sys.argv.index("--encoder")
+        encoder = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+    # --filters 对深度做后处理（capture、live、obstacles），可跟滤波链描述，省略时使用默认滤波链
+    filters = None
+    if "--filters" in sys.argv:
+        from examples.depth_filters import DEFAULT_CHAIN, FILTERS
+
+        i = sys.argv.index("--filters")
+        del sys.argv[i]
+        if i < len(sys.argv) and sys.argv[i].split(",")[0].split("=")[0] in FILTERS:
+            filters = sys.argv.pop(i)
+        else:
+            filters = DEFAULT_CHAIN
+
     if len(sys.argv) > 1:
         mode = sys.argv[1]
         if mode == "capture":
-            capture_image()
+            capture_image(source=source, filters=filters)
         elif mode == "record":
             duration = int(sys.argv[2]) if len(sys.argv) > 2 else 10
-            record_video(duration)
+            option = sys.argv[3] if len(sys.argv) > 3 else ""
+            record_video(duration, threaded=option == "threaded", raw=option == "raw", source=source,
+                         encoder=encoder, preview=preview)
+        elif mode == "segment":
+            segment_duration = float(sys.argv[2]) if len(sys.argv) > 2 else 300.0
+            quota_gb = float(sys.argv[3]) if len(sys.argv) > 3 else None
+            record_segments(None, segment_duration, source=source, encoder=encoder, quota_gb=quota_gb)
         elif mode == "live":
-            show_live_stream()
+            show_live_stream(source, filters, preview)
+        elif mode == "obstacles":
+            address = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1:9870"
+            detect_obstacles(None, address, source, filters)
         else:
             print("用法:")
             print("  python depth_camera_example.py capture  # 拍摄图像")
             print("  python depth_camera_example.py record [时长]  # 录制视频，默认10秒")
-            print("  python depth_camera_example.py live  # 实时显示")
+            print("  python depth_camera_example.py record [时长] threaded  # 多线程录制")
+            print("  python depth_camera_example.py record [时长] raw  # 无损录制原始深度")
+            print("  python depth_camera_example.py segment [分段秒数] [配额GB]  # 连续分段录制，Ctrl+C 停止")
+            print("  python depth_camera_example.py live  # 实时显示（没有图形界面时自动改为浏览器预览）")
+            print("  python depth_camera_example.py live --preview [主机:端口]  # 在浏览器中预览，默认 0.0.0.0:8080")
+            print("  python depth_camera_example.py obstacles [主机:端口]  # 计算障碍物扇区并以 UDP 发布，默认 127.0.0.1:9870")
+            print("  以上命令均可追加 --source <帧源>，如 synthetic、depth_raw.rdz")
+            print("  record 可追加 --preview [主机:端口]，录制的同时在浏览器中预览")
+            print("  record、segment 可追加 --encoder <编码>，如 opencv:mp4v、ffmpeg:preset=veryfast,crf=28")
+            print("  capture、live、obstacles 可追加 --filters [滤波链]，如 --filters decimation=2,spatial=50,temporal=0.4,holes=left")
     else:
         # 默认拍摄图像
-        capture_image()
-
+        capture_image(source=source, filters=filters)
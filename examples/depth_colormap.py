@@ -0,0 +1,187 @@
+"""
+深度图伪彩色转换
+为 (缩放系数/深度范围, 颜色映射) 预先构建 65536 项的 uint16→BGR 查找表，
+每帧只做一次查表写入复用的输出缓冲区，拍照、录制和实时显示共用
+
+纯 alpha 缩放时 OpenCV 的两步转换有 SIMD 优化，实测比 NumPy 查表更快，
+此时仍走两步转换（但复用输出缓冲区）；固定深度范围、百分位自动范围和
+无效深度着色无法用两步转换表达，走查找表
+"""
+import sys
+import time
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2
+
+
+@lru_cache(maxsize=16)
+def build_lut(alpha=0.03, depth_range=None, colormap=cv2.COLORMAP_JET, invalid_color=None):
+    """
+    构建 uint16 深度值到 BGR 颜色的查找表
+
+    每个 BGR 颜色打包成一个 uint32（低 3 字节为 B、G、R），
+    查表时一次取 4 字节比逐通道取值快得多
+
+    Args:
+        alpha: 缩放系数，与 cv2.convertScaleAbs(depth, alpha=alpha) 等价；指定 depth_range 时忽略
+        depth_range: (最近, 最远) 深度值，线性映射到颜色映射的两端
+        colormap: OpenCV 颜色映射，如 cv2.COLORMAP_JET
+        invalid_color: 深度为 0（无效）时的 BGR 颜色，None 表示与普通深度值同样处理
+
+    Returns:
+        形状为 (65536,) 的只读 uint32 数组
+    """
+    values = np.arange(65536, dtype=np.float64)
+    if depth_range is not None:
+        near, far = depth_range
+        # 比最近距离还近的值截断到颜色映射起点
+        scaled = (values - near) * (255.0 / max(far - near, 1))
+    else:
+        scaled = np.abs(values * alpha)
+    index = np.clip(np.round(scaled), 0, 255).astype(np.uint8)
+
+    palette = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), colormap)
+    packed = np.zeros((256, 4), dtype=np.uint8)
+    packed[:, :3] = palette.reshape(256, 3)
+
+    lut = packed.view(np.uint32).ravel()[index]
+    if invalid_color is not None:
+        lut[0] = np.array(list(invalid_color) + [0], dtype=np.uint8).view(np.uint32)[0]
+    lut.flags.writeable = False
+    return lut
+
+
+class DepthColorizer:
+    """
+    深度伪彩色转换器
+
+    默认参数的输出与 cv2.applyColorMap(cv2.convertScaleAbs(depth, alpha=0.03), COLORMAP_JET)
+    逐像素一致。返回的图像是内部复用的缓冲区，下一次 apply() 会覆盖它，需要保留时请 copy()。
+    """
+
+    def __init__(self, alpha=0.03, depth_range: Optional[Tuple[int, int]] = None,
+                 colormap=cv2.COLORMAP_JET, auto_percentiles: Optional[Tuple[float, float]] = None,
+                 auto_step=100, auto_interval=15, invalid_color=None, method="auto"):
+        """
+        Args:
+            alpha: 缩放系数，与原先 convertScaleAbs 的 alpha 相同
+            depth_range: 固定深度范围 (最近, 最远)，单位与 z16 原始值相同
+            colormap: OpenCV 颜色映射
+            auto_percentiles: 按百分位自动确定深度范围，如 (2, 98)；指定后忽略 alpha 和 depth_range
+            auto_step: 自动范围的量化步长，范围变化小于一个步长时不重建查找表
+            auto_interval: 自动范围每隔多少帧重新统计一次
+            invalid_color: 深度为 0 时的 BGR 颜色，如 (0, 0, 0)
+            method: "lut" 始终查表，"opencv" 使用两步转换（仅支持纯 alpha 缩放），
+                "auto" 在纯 alpha 缩放时用两步转换，其余情况查表
+        """
+        self.alpha = alpha
+        self.depth_range = tuple(depth_range) if depth_range is not None else None
+        self.colormap = colormap
+        self.auto_percentiles = auto_percentiles
+        self.auto_step = auto_step
+        self.auto_interval = auto_interval
+        self.invalid_color = tuple(invalid_color) if invalid_color is not None else None
+        linear = depth_range is None and auto_percentiles is None and invalid_color is None
+        if method == "opencv" and not linear:
+            raise ValueError("opencv 转换只支持纯 alpha 缩放")
+        self.use_lut = method == "lut" or not linear
+        self._frame_count = 0
+        self._packed = None
+        self._scaled = None
+        self._out = None
+        self._lut = self._current_lut() if self.use_lut else None
+
+    def _current_lut(self):
+        return build_lut(self.alpha, self.depth_range, self.colormap, self.invalid_color)
+
+    def _update_auto_range(self, depth_image):
+        """按百分位统计当前帧的深度范围（隔行隔列抽样，忽略无效深度）"""
+        sample = depth_image[::8, ::8]
+        valid = sample[sample > 0]
+        if valid.size == 0:
+            return
+        low, high = np.percentile(valid, self.auto_percentiles)
+        step = self.auto_step
+        near = int(low // step) * step
+        far = max(int(-(-high // step)) * step, near + step)
+        if (near, far) != self.depth_range:
+            self.depth_range = (near, far)
+            self._lut = self._current_lut()
+
+    def apply(self, depth_image):
+        """
+        把 uint16 深度图转换为 BGR 伪彩色图
+
+        Args:
+            depth_image: uint16 深度图，形状 (H, W)
+
+        Returns:
+            uint8 BGR 图像，形状 (H, W, 3)
+        """
+        if self.auto_percentiles is not None and self._frame_count % self.auto_interval == 0:
+            self._update_auto_range(depth_image)
+        self._frame_count += 1
+
+        shape = depth_image.shape
+        if self._out is None or self._out.shape[:2] != shape:
+            self._packed = np.empty(shape, dtype=np.uint32)
+            self._scaled = np.empty(shape, dtype=np.uint8)
+            self._out = np.empty(shape + (3,), dtype=np.uint8)
+
+        if self.use_lut:
+            np.take(self._lut, depth_image, out=self._packed)
+            cv2.cvtColor(self._packed.view(np.uint8).reshape(shape + (4,)), cv2.COLOR_BGRA2BGR,
+                         dst=self._out)
+        else:
+            cv2.convertScaleAbs(depth_image, dst=self._scaled, alpha=self.alpha)
+            cv2.applyColorMap(self._scaled, self.colormap, dst=self._out)
+        return self._out
+
+    __call__ = apply
+
+
+def benchmark(repeat=200):
+    """
+    对比原先的两步转换、复用缓冲区的两步转换和查找表转换的耗时
+
+    Args:
+        repeat: 每种分辨率重复次数
+    """
+    def timed(fn, depth):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(depth)
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def original(depth):
+        return cv2.applyColorMap(cv2.convertScaleAbs(depth, alpha=0.03), cv2.COLORMAP_JET)
+
+    rng = np.random.default_rng(0)
+    print(f"{'分辨率':<12}{'原两步(ms)':>12}{'复用缓冲(ms)':>14}{'查找表(ms)':>12}{'范围查表(ms)':>14}")
+    for width, height in ((640, 480), (1280, 720)):
+        depth = rng.integers(0, 8000, (height, width)).astype(np.uint16)
+        reused = DepthColorizer(method="opencv")
+        lut = DepthColorizer(method="lut")
+        ranged = DepthColorizer(depth_range=(300, 6000), invalid_color=(0, 0, 0))
+        reference = original(depth)
+        if not (np.array_equal(reference, reused(depth)) and np.array_equal(reference, lut(depth))):
+            print("警告: 输出与原两步转换不一致")
+
+        print(f"{f'{width}x{height}':<12}{timed(original, depth):>12.3f}{timed(reused, depth):>14.3f}"
+              f"{timed(lut, depth):>12.3f}{timed(ranged, depth):>14.3f}")
+
+    start = time.perf_counter()
+    build_lut.cache_clear()
+    build_lut(0.03)
+    print(f"构建一次查找表: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        benchmark(repeat)
+    else:
+        print("用法:")
+        print("  python depth_colormap.py bench [次数]  # 对比各转换方式的耗时")
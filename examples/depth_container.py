@@ -0,0 +1,242 @@
+"""
+无损深度录制容器
+把原始 uint16 深度帧、彩色帧和时间戳逐帧追加到预分配的内存映射文件，
+读取时按帧号直接返回零拷贝的 NumPy 视图，无需解码视频
+
+文件布局:
+    文件头（64 字节）: 魔数、版本、宽、高、是否含彩色、已写入帧数
+    帧记录（定长，依次排列）: timestamp(float64) | depth(uint16, H×W) | color(uint8, H×W×3)
+"""
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"RDZ16\x00\x00\x00"
+VERSION = 1
+HEADER_SIZE = 64
+# 魔数, 版本, 宽, 高, 是否含彩色, 帧数
+_HEADER_STRUCT = struct.Struct("<8sIIII Q")
+
+
+def record_dtype(width, height, with_color=True):
+    """
+    帧记录的结构化 dtype
+
+    Args:
+        width: 图像宽度
+        height: 图像高度
+        with_color: 是否包含彩色帧
+    """
+    fields = [("timestamp", "<f8"), ("depth", "<u2", (height, width))]
+    if with_color:
+        fields.append(("color", "u1", (height, width, 3)))
+    return np.dtype(fields)
+
+
+def _write_header(f, width, height, with_color, count):
+    f.seek(0)
+    f.write(_HEADER_STRUCT.pack(MAGIC, VERSION, width, height, int(with_color), count)
+            .ljust(HEADER_SIZE, b"\x00"))
+
+
+def _read_header(f):
+    f.seek(0)
+    magic, version, width, height, with_color, count = _HEADER_STRUCT.unpack(
+        f.read(_HEADER_STRUCT.size)
+    )
+    if magic != MAGIC:
+        raise ValueError("不是有效的深度容器文件")
+    if version != VERSION:
+        raise ValueError(f"不支持的容器版本: {version}")
+    return width, height, bool(with_color), count
+
+
+class DepthContainerWriter:
+    """
+    深度容器写入器
+
+    按 capacity 预分配文件空间，写满后按同样大小继续扩容；
+    close() 时把文件截断到实际帧数并写入文件头。
+    """
+
+    def __init__(self, filename, width=640, height=480, with_color=True,
+                 capacity=900, flush_interval=30):
+        """
+        Args:
+            filename: 输出文件名
+            width: 图像宽度
+            height: 图像高度
+            with_color: 是否同时保存彩色帧
+            capacity: 预分配的帧数（默认 900 帧，即 30 fps 下 30 秒）
+            flush_interval: 每写入多少帧更新一次文件头中的帧数，异常退出时也能读出已写入的部分
+        """
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.with_color = with_color
+        self.dtype = record_dtype(width, height, with_color)
+        self.grow_by = capacity
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._file = open(filename, "w+b")
+        _write_header(self._file, width, height, with_color, 0)
+        self._capacity = 0
+        self._records = None
+        self._reserve(capacity)
+
+    def _reserve(self, capacity):
+        """扩展文件并重新映射"""
+        if self._records is not None:
+            self._records.flush()
+            del self._records
+        self._file.truncate(HEADER_SIZE + capacity * self.dtype.itemsize)
+        self._records = np.memmap(self._file, dtype=self.dtype, mode="r+",
+                                  offset=HEADER_SIZE, shape=(capacity,))
+        self._capacity = capacity
+
+    def append(self, timestamp, depth_image, color_image=None):
+        """
+        追加一帧
+
+        Args:
+            timestamp: 帧时间戳（秒）
+            depth_image: uint16 深度图，形状 (height, width)
+            color_image: uint8 彩色图，形状 (height, width, 3)；容器不含彩色时忽略
+        """
+        if self.count >= self._capacity:
+            self._reserve(self._capacity + self.grow_by)
+        record = self._records[self.count]
+        record["timestamp"] = timestamp
+        record["depth"] = depth_image
+        if self.with_color and color_image is not None:
+            record["color"] = color_image
+        self.count += 1
+        if self.count % self.flush_interval == 0:
+            _write_header(self._file, self.width, self.height, self.with_color, self.count)
+
+    def close(self):
+        """刷新数据，截断多余的预分配空间并写入最终帧数"""
+        if self._file is None:
+            return
+        self._records.flush()
+        del self._records
+        self._records = None
+        self._file.truncate(HEADER_SIZE + self.count * self.dtype.itemsize)
+        _write_header(self._file, self.width, self.height, self.with_color, self.count)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DepthContainerReader:
+    """
+    深度容器读取器
+
+    所有返回的数组都是内存映射文件上的只读视图，不会复制数据。
+    """
+
+    def __init__(self, filename):
+        """
+        Args:
+            filename: 容器文件名
+        """
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self.width, self.height, self.with_color, count = _read_header(f)
+        self.dtype = record_dtype(self.width, self.height, self.with_color)
+        # 以文件头记录的帧数为准（预分配但未写入的空间不计入），
+        # 同时不超过文件中实际存在的完整帧数
+        available = (os.path.getsize(filename) - HEADER_SIZE) // self.dtype.itemsize
+        self.count = min(count, available)
+        if self.count:
+            self._records = np.memmap(filename, dtype=self.dtype, mode="r",
+                                      offset=HEADER_SIZE, shape=(self.count,))
+        else:
+            self._records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def timestamps(self):
+        """所有帧的时间戳视图"""
+        return self._records["timestamp"]
+
+    def depth(self, index):
+        """第 index 帧的 uint16 深度视图"""
+        return self._records["depth"][index]
+
+    def color(self, index):
+        """第 index 帧的彩色视图，容器不含彩色时返回 None"""
+        if not self.with_color:
+            return None
+        return self._records["color"][index]
+
+    def __getitem__(self, index):
+        """
+        Returns:
+            (timestamp, depth_image, color_image)
+        """
+        return float(self._records["timestamp"][index]), self.depth(index), self.color(index)
+
+    def index_at(self, timestamp):
+        """返回时间戳不晚于 timestamp 的最后一帧的帧号"""
+        i = int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1
+        return max(i, 0)
+
+    def close(self):
+        self._records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def print_info(filename):
+    """打印容器信息"""
+    with DepthContainerReader(filename) as reader:
+        print(f"文件: {filename}")
+        print(f"分辨率: {reader.width}x{reader.height}, 彩色: {'是' if reader.with_color else '否'}")
+        print(f"帧数: {len(reader)}")
+        if len(reader) > 1:
+            ts = reader.timestamps
+            span = ts[-1] - ts[0]
+            print(f"时长: {span:.2f} 秒, 平均帧率: {(len(reader) - 1) / span:.1f} fps")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法:")
+        print("  python depth_container.py info <文件>  # 查看容器信息")
+        print("  python depth_container.py export <文件> <帧号> [输出前缀]  # 导出一帧为 PNG")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    filename = sys.argv[2]
+
+    if command == "info":
+        print_info(filename)
+    elif command == "export":
+        import cv2
+
+        index = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        prefix = sys.argv[4] if len(sys.argv) > 4 else f"frame_{index}"
+        with DepthContainerReader(filename) as reader:
+            timestamp, depth_image, color_image = reader[index]
+            # 16 位 PNG 无损保存原始深度值
+            cv2.imwrite(f"{prefix}_depth.png", depth_image)
+            print(f"深度图已保存: {prefix}_depth.png")
+            if color_image is not None:
+                cv2.imwrite(f"{prefix}_color.png", color_image)
+                print(f"彩色图已保存: {prefix}_color.png")
+    else:
+        print(f"未知命令: {command}")
@@ -0,0 +1,657 @@
+"""
+深度图后处理滤波链
+直接在 uint16 深度数组上运行，与 librealsense 的后处理滤波器对应：
+降采样（decimation）、保边空间平滑（spatial）、指数时间滤波（temporal）和空洞填充（hole filling），
+不依赖相机即可在录制或合成数据上测试。
+每个滤波器在第一次处理某个尺寸的帧时分配好所有缓冲区，之后每帧只做 NumPy 原地运算，不再分配内存；
+输入帧不会被修改
+"""
+import os
+import sys
+import time
+import tracemalloc
+from typing import List
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 默认滤波链：640x480 先降到 320x240，后面几级的运算量只有原来的四分之一
+DEFAULT_CHAIN = "decimation=2,spatial=50,temporal=0.4,holes=left"
+
+
+class DepthFilter:
+    """
+    滤波器基类
+
+    子类实现 configure() 按输入尺寸分配缓冲区并返回输出尺寸，apply() 返回处理结果。
+    返回的数组是内部缓冲区，下一次 apply() 会覆盖它，需要保留时请 copy()
+    """
+
+    name = "filter"
+
+    def __init__(self):
+        self.shape = None
+
+    def configure(self, shape):
+        self.shape = shape
+        return shape
+
+    def apply(self, depth):
+        raise NotImplementedError
+
+    def reset(self):
+        """清除跨帧状态（切换场景或相机重启后调用）"""
+
+
+class DecimationFilter(DepthFilter):
+    """
+    降采样：factor 为 2 时每个 2x2 块输出其中有效（非 0）深度的中值，更大的 factor 输出有效深度的平均值
+    （与 librealsense 相同）
+
+    块内没有有效深度时输出 0，空洞不会把结果拉向 0；中值不会在物体边缘产生前后景之间的"飞点"。
+    宽高不是 factor 整数倍时丢弃右侧和下方多余的像素
+    """
+
+    name = "decimation"
+
+    # 4 个数的排序网络（比较交换的下标对）
+    _NETWORK = ((0, 1), (2, 3), (0, 2), (1, 3), (1, 2))
+
+    def __init__(self, factor=2):
+        """
+        Args:
+            factor: 降采样倍数，2 表示宽高各缩小一半
+        """
+        super().__init__()
+        if factor < 1:
+            raise ValueError("factor 应不小于 1")
+        self.factor = int(factor)
+
+    def configure(self, shape):
+        self.shape = shape
+        f = self.factor
+        out_shape = (shape[0] // f, shape[1] // f)
+        self._out = np.empty(out_shape, dtype=np.uint16)
+        if f == 2:
+            self._sorted = [np.empty(out_shape, dtype=np.uint16) for _ in range(4)]
+            self._tmp = np.empty(out_shape, dtype=np.uint16)
+            self._select = np.empty(out_shape, dtype=bool)
+            self._mid = np.empty(out_shape, dtype=np.uint32)
+        else:
+            self._mask = np.empty(shape, dtype=bool)
+            self._sum = np.empty(out_shape, dtype=np.uint32)
+            self._count = np.empty(out_shape, dtype=np.uint32)
+            self._half = np.empty(out_shape, dtype=np.uint32)
+        return out_shape
+
+    def apply(self, depth):
+        f = self.factor
+        h, w = self._out.shape[0] * f, self._out.shape[1] * f
+        if f == 2:
+            return self._median2(depth, h, w)
+        np.not_equal(depth, 0, out=self._mask)
+        self._sum.fill(0)
+        self._count.fill(0)
+        # 按块内偏移逐个累加跨步切片，不需要 reshape（裁剪后的视图 reshape 会复制）
+        for i in range(f):
+            for j in range(f):
+                np.add(self._sum, depth[i:h:f, j:w:f], out=self._sum)
+                np.add(self._count, self._mask[i:h:f, j:w:f], out=self._count)
+        # 四舍五入：先加上除数的一半
+        np.maximum(self._count, 1, out=self._count)
+        np.right_shift(self._count, 1, out=self._half)
+        np.add(self._sum, self._half, out=self._sum)
+        np.floor_divide(self._sum, self._count, out=self._sum)
+        np.copyto(self._out, self._sum, casting="unsafe")
+        return self._out
+
+    def _median2(self, depth, h, w):
+        s = self._sorted
+        for k, (i, j) in enumerate(((0, 0), (0, 1), (1, 0), (1, 1))):
+            np.copyto(s[k], depth[i:h:2, j:w:2])
+        # 逐像素排序 4 个值，无效的 0 排在最前面
+        for a, b in self._NETWORK:
+            np.minimum(s[a], s[b], out=self._tmp)
+            np.maximum(s[a], s[b], out=s[b])
+            np.copyto(s[a], self._tmp)
+        # 有效值个数 n 决定中值位置：n=4 取 (s1+s2)/2，n=3 取 s2，n=2 取 (s2+s3)/2，n<=1 取 s3
+        lo, hi, select = self._mid, self._tmp, self._select
+        np.copyto(lo, s[3])
+        np.not_equal(s[2], 0, out=select)
+        np.copyto(lo, s[2], where=select)
+        np.not_equal(s[0], 0, out=select)
+        np.copyto(lo, s[1], where=select)
+        np.copyto(hi, s[3])
+        np.not_equal(s[1], 0, out=select)
+        np.copyto(hi, s[2], where=select)
+        np.add(lo, hi, out=lo)
+        np.add(lo, 1, out=lo)
+        np.right_shift(lo, 1, out=lo)
+        np.copyto(self._out, lo, casting="unsafe")
+        return self._out
+
+
+class SpatialFilter(DepthFilter):
+    """
+    保边空间平滑
+
+    先水平、后垂直，每个像素与相邻像素取平均，只有与中心相差不超过 delta 的有效邻居参与，
+    物体边缘两侧深度差大，不会被抹平；无效像素保持 0，留给空洞填充处理
+    """
+
+    name = "spatial"
+
+    def __init__(self, delta=50, iterations=2):
+        """
+        Args:
+            delta: 边缘阈值，与 z16 原始值单位相同（D4xx 默认 1 mm）；
+                应大于所关注距离上的噪声，小于要保留的物体边缘高差
+            iterations: 水平 + 垂直平滑的轮数
+        """
+        super().__init__()
+        self.delta = int(delta)
+        self.iterations = int(iterations)
+
+    def configure(self, shape):
+        self.shape = shape
+        self._cur = np.empty(shape, dtype=np.int32)
+        self._sum = np.empty(shape, dtype=np.int32)
+        self._count = np.empty(shape, dtype=np.int32)
+        self._diff = np.empty(shape, dtype=np.int32)
+        self._valid = np.empty(shape, dtype=bool)
+        self._accept = np.empty(shape, dtype=bool)
+        self._out = np.empty(shape, dtype=np.uint16)
+        # (中心切片, 邻居切片)：左、右、上、下
+        horizontal = [((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+                      ((slice(None), slice(None, -1)), (slice(None), slice(1, None)))]
+        vertical = [((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+                    ((slice(None, -1), slice(None)), (slice(1, None), slice(None)))]
+        self._passes = (horizontal, vertical)
+        return shape
+
+    def apply(self, depth):
+        cur, total, count, diff, accept = self._cur, self._sum, self._count, self._diff, self._accept
+        np.copyto(cur, depth, casting="unsafe")
+        np.not_equal(depth, 0, out=self._valid)
+        for _ in range(self.iterations):
+            for neighbors in self._passes:
+                np.copyto(total, cur)
+                np.copyto(count, self._valid, casting="unsafe")
+                for center, neighbor in neighbors:
+                    np.subtract(cur[neighbor], cur[center], out=diff[center])
+                    np.abs(diff[center], out=diff[center])
+                    np.less_equal(diff[center], self.delta, out=accept[center])
+                    np.logical_and(accept[center], self._valid[neighbor], out=accept[center])
+                    np.logical_and(accept[center], self._valid[center], out=accept[center])
+                    np.add(total[center], cur[neighbor], out=total[center], where=accept[center])
+                    np.add(count[center], accept[center], out=count[center])
+                # 无效像素 total、count 都是 0，除数取 1 后结果仍为 0
+                np.maximum(count, 1, out=count)
+                np.right_shift(count, 1, out=diff)
+                np.add(total, diff, out=total)
+                np.floor_divide(total, count, out=cur)
+        np.copyto(self._out, cur, casting="unsafe")
+        return self._out
+
+
+class TemporalFilter(DepthFilter):
+    """
+    指数时间滤波
+
+    state += alpha * (当前 - state)，只在两者相差不超过 delta 时平滑；相差更大说明场景发生了变化
+    （物体移动），直接采用当前值，避免拖影。当前帧无效的像素沿用历史值，最多 persistence 帧，
+    之后视为无效。状态缓冲区在 configure() 时分配，每帧原地更新
+    """
+
+    name = "temporal"
+
+    def __init__(self, alpha=0.4, delta=100, persistence=3):
+        """
+        Args:
+            alpha: 平滑系数，越小越平滑、响应越慢
+            delta: 平滑阈值，与 z16 原始值单位相同；相差更大的变化视为运动，不做平滑
+            persistence: 像素无效时沿用历史值的最大帧数，0 表示不沿用
+        """
+        super().__init__()
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha 应在 (0, 1] 之间")
+        self.alpha = float(alpha)
+        self.delta = float(delta)
+        self.persistence = int(persistence)
+
+    def configure(self, shape):
+        self.shape = shape
+        self._state = np.zeros(shape, dtype=np.float32)
+        self._has_state = np.zeros(shape, dtype=bool)
+        self._age = np.zeros(shape, dtype=np.uint8)
+        self._current = np.empty(shape, dtype=np.float32)
+        self._diff = np.empty(shape, dtype=np.float32)
+        self._valid = np.empty(shape, dtype=bool)
+        self._invalid = np.empty(shape, dtype=bool)
+        self._smooth = np.empty(shape, dtype=bool)
+        self._fresh = np.empty(shape, dtype=bool)
+        self._out = np.empty(shape, dtype=np.uint16)
+        return shape
+
+    def reset(self):
+        if self.shape is not None:
+            self._state.fill(0)
+            self._has_state.fill(False)
+            self._age.fill(0)
+
+    def apply(self, depth):
+        state, diff, valid, smooth = self._state, self._diff, self._valid, self._smooth
+        np.copyto(self._current, depth, casting="unsafe")
+        np.not_equal(depth, 0, out=valid)
+
+        np.subtract(self._current, state, out=diff)
+        np.abs(diff, out=self._current)
+        np.less_equal(self._current, self.delta, out=smooth)
+        np.logical_and(smooth, valid, out=smooth)
+        np.logical_and(smooth, self._has_state, out=smooth)
+        # 平滑的像素：state += alpha * diff
+        np.multiply(diff, self.alpha, out=diff)
+        np.add(state, diff, out=state, where=smooth)
+        # 有效但未平滑（首次出现或场景变化）的像素直接采用当前值
+        np.logical_not(smooth, out=smooth)
+        np.logical_and(smooth, valid, out=smooth)
+        np.copyto(state, depth, where=smooth, casting="unsafe")
+
+        # 连续无效的帧数，有效时清零，超过 persistence 后不再沿用历史值（计数封顶，不会溢出）
+        np.logical_not(valid, out=self._invalid)
+        np.add(self._age, 1, out=self._age, where=self._invalid)
+        np.copyto(self._age, 0, where=valid)
+        np.minimum(self._age, self.persistence + 1, out=self._age)
+        np.less_equal(self._age, self.persistence, out=self._fresh)
+        np.logical_or(self._has_state, valid, out=self._has_state)
+        np.logical_and(self._has_state, self._fresh, out=self._has_state)
+
+        np.rint(state, out=self._current)
+        np.copyto(self._out, self._current, casting="unsafe")
+        np.multiply(self._out, self._has_state, out=self._out)
+        return self._out
+
+
+class HoleFillingFilter(DepthFilter):
+    """
+    空洞填充
+
+    mode:
+        "left"      用同一行左侧最近的有效深度填充，一次填满任意宽度的空洞；D4xx 深度以左摄像头为基准，
+                    遮挡阴影出现在近处物体的左侧、属于背景，从左侧填充最接近真实值
+        "farthest"  用上下左右有效邻居中最远的深度填充，每轮向内扩展 1 个像素（librealsense 的默认方式）
+        "nearest"   用上下左右有效邻居中最近的深度填充，障碍物检测时偏保守（空洞按最近的物体处理）
+    """
+
+    name = "holes"
+
+    MODES = ("left", "farthest", "nearest")
+
+    def __init__(self, mode="left", radius=4):
+        """
+        Args:
+            mode: 填充方式，见类说明
+            radius: nearest / farthest 的扩展轮数，宽度不超过 2 * radius 的空洞能被填满
+        """
+        super().__init__()
+        if mode not in self.MODES:
+            raise ValueError(f"mode 应为 {', '.join(self.MODES)} 之一")
+        self.mode = mode
+        self.radius = int(radius)
+
+    def configure(self, shape):
+        self.shape = shape
+        h, w = shape
+        self._out = np.empty(shape, dtype=np.uint16)
+        self._holes = np.empty(shape, dtype=bool)
+        if self.mode == "left":
+            self._index = np.empty(shape, dtype=np.intp)
+            self._columns = np.arange(w, dtype=np.intp)
+            self._row_start = (np.arange(h, dtype=np.intp) * w)[:, np.newaxis]
+        else:
+            # 四周多一圈边框，边框值不会被选中：nearest 时为最大值，farthest 时为 0
+            self._padded = np.empty((h + 2, w + 2), dtype=np.uint16)
+            self._padded.fill(np.iinfo(np.uint16).max if self.mode == "nearest" else 0)
+            self._fill = np.empty(shape, dtype=np.uint16)
+        return shape
+
+    def apply(self, depth):
+        out = self._out
+        if self.mode == "left":
+            # 每个像素取同一行中不晚于它的最后一个有效像素的列号
+            np.not_equal(depth, 0, out=self._holes)
+            np.multiply(self._holes, self._columns, out=self._index)
+            np.maximum.accumulate(self._index, axis=1, out=self._index)
+            np.add(self._index, self._row_start, out=self._index)
+            # mode="clip" 时直接写入 out，默认的 "raise" 会先写入临时数组再复制
+            np.take(np.ascontiguousarray(depth).reshape(-1), self._index, out=out, mode="clip")
+            return out
+
+        np.copyto(out, depth)
+        inner = self._padded[1:-1, 1:-1]
+        fill = self._fill
+        for _ in range(self.radius):
+            np.equal(out, 0, out=self._holes)
+            if self.mode == "nearest":
+                # 减 1 后无效值 0 回绕为最大值，取最小值时不会被选中，加 1 还原
+                np.subtract(out, 1, out=inner)
+                np.minimum(self._padded[:-2, 1:-1], self._padded[2:, 1:-1], out=fill)
+                np.minimum(fill, self._padded[1:-1, :-2], out=fill)
+                np.minimum(fill, self._padded[1:-1, 2:], out=fill)
+                np.add(fill, 1, out=fill)
+            else:
+                np.copyto(inner, out)
+                np.maximum(self._padded[:-2, 1:-1], self._padded[2:, 1:-1], out=fill)
+                np.maximum(fill, self._padded[1:-1, :-2], out=fill)
+                np.maximum(fill, self._padded[1:-1, 2:], out=fill)
+            np.copyto(out, fill, where=self._holes)
+        return out
+
+
+FILTERS = {
+    "decimation": (DecimationFilter, "factor", int),
+    "spatial": (SpatialFilter, "delta", int),
+    "temporal": (TemporalFilter, "alpha", float),
+    "holes": (HoleFillingFilter, "mode", str),
+}
+
+
+class DepthFilterChain:
+    """
+    滤波链：按顺序执行各滤波器，并统计每一级的耗时
+
+    输入尺寸变化时自动重新分配各级缓冲区
+    """
+
+    def __init__(self, filters: List[DepthFilter]):
+        self.filters = list(filters)
+        self.shape = None
+        self.output_shape = None
+        self.frames = 0
+        self.stage_time = [0.0] * len(self.filters)
+
+    @classmethod
+    def from_spec(cls, spec=DEFAULT_CHAIN):
+        """
+        从描述字符串创建，如 "decimation=2,spatial=50,temporal=0.4,holes=left"
+
+        每一级写作 名称 或 名称=主参数：decimation=倍数、spatial=边缘阈值、
+        temporal=平滑系数、holes=填充方式；空字符串或 "none" 表示不滤波
+        """
+        config = []
+        for item in spec.split(","):
+            item = item.strip()
+            if not item or item == "none":
+                continue
+            name, _, value = item.partition("=")
+            if name not in FILTERS:
+                raise ValueError(f"未知滤波器: {name}，可选: {', '.join(FILTERS)}")
+            entry = {"type": name}
+            if value:
+                _, param, convert = FILTERS[name]
+                entry[param] = convert(value)
+            config.append(entry)
+        return cls.from_config(config)
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        从配置列表创建，如 [{"type": "decimation", "factor": 2}, {"type": "temporal", "alpha": 0.3}]
+        """
+        filters = []
+        for entry in config:
+            params = dict(entry)
+            name = params.pop("type")
+            if name not in FILTERS:
+                raise ValueError(f"未知滤波器: {name}，可选: {', '.join(FILTERS)}")
+            filters.append(FILTERS[name][0](**params))
+        return cls(filters)
+
+    def configure(self, shape):
+        self.shape = tuple(shape)
+        for f in self.filters:
+            shape = f.configure(shape)
+        self.output_shape = shape
+        self.reset_stats()
+
+    def apply(self, depth):
+        """
+        处理一帧
+
+        Args:
+            depth: uint16 深度图，形状 (H, W)，不会被修改
+
+        Returns:
+            处理后的 uint16 深度图，内部缓冲区，下次调用会被覆盖
+        """
+        if depth.shape != self.shape:
+            self.configure(depth.shape)
+        for i, f in enumerate(self.filters):
+            t0 = time.perf_counter()
+            depth = f.apply(depth)
+            self.stage_time[i] += time.perf_counter() - t0
+        self.frames += 1
+        return depth
+
+    __call__ = apply
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.stage_time = [0.0] * len(self.filters)
+
+    def stats(self):
+        """各级平均耗时（毫秒/帧）"""
+        n = max(self.frames, 1)
+        return {f.name: t / n * 1000 for f, t in zip(self.filters, self.stage_time)}
+
+    def report(self):
+        stats = self.stats()
+        total = sum(stats.values())
+        for name, ms in stats.items():
+            print(f"  {name:<12} {ms:7.3f} ms/帧  {ms / total * 100 if total else 0:5.1f}%")
+        print(f"  {'合计':<10} {total:7.3f} ms/帧  {self.shape[1]}x{self.shape[0]} → "
+              f"{self.output_shape[1]}x{self.output_shape[0]}")
+        return stats
+
+
+def noisy_depth(width=640, height=480, count=8, seed=0):
+    """
+    生成带噪声和空洞的合成深度帧，用于测试和测速
+
+    场景为由近到远的地面、一面墙和一个箱子，叠加与距离成比例的高斯噪声、
+    随机无效像素、箱子左侧的遮挡阴影（双目深度相机常见的无效带）和若干空洞
+
+    Returns:
+        (真实深度 uint16, [带噪声的深度帧 uint16, ...])
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    # 上半部分为 4 m 处的墙，下半部分为由远到近的地面
+    truth = np.where(yy < height / 2, 4000.0, 4000.0 - (yy - height / 2) / (height / 2) * 3200.0)
+    box = (xx > width * 0.4) & (xx < width * 0.6) & (yy > height * 0.35) & (yy < height * 0.8)
+    truth[box] = 1500.0
+    truth = truth.astype(np.uint16)
+
+    frames = []
+    for _ in range(count):
+        depth = truth + rng.normal(0, 1, truth.shape) * (truth * 0.005 + 2)
+        depth[rng.random(truth.shape) < 0.05] = 0
+        shadow = (xx > width * 0.37) & (xx <= width * 0.4) & (yy > height * 0.35) & (yy < height * 0.8)
+        depth[shadow] = 0
+        for _ in range(6):
+            cy, cx = rng.integers(0, height), rng.integers(0, width)
+            depth[(yy - cy) ** 2 + (xx - cx) ** 2 < rng.integers(9, 64)] = 0
+        frames.append(np.clip(depth, 0, 65535).astype(np.uint16))
+    return truth, frames
+
+
+def _edge_mask(truth, radius=3, step=100):
+    """真实深度中相邻像素相差超过 step 的位置及其周围 radius 个像素"""
+    depth = truth.astype(np.int32)
+    edge = np.zeros(truth.shape, dtype=bool)
+    jump = np.abs(np.diff(depth, axis=1)) > step
+    edge[:, 1:] |= jump
+    edge[:, :-1] |= jump
+    jump = np.abs(np.diff(depth, axis=0)) > step
+    edge[1:, :] |= jump
+    edge[:-1, :] |= jump
+    for _ in range(radius):
+        grown = edge.copy()
+        grown[1:, :] |= edge[:-1, :]
+        grown[:-1, :] |= edge[1:, :]
+        grown[:, 1:] |= edge[:, :-1]
+        grown[:, :-1] |= edge[:, 1:]
+        edge = grown
+    return edge
+
+
+def _quality(chain, result, truth, raw):
+    """
+    评估滤波效果
+
+    Args:
+        chain: 滤波链（用于确定降采样倍数）
+        result: 滤波结果
+        truth: 真实深度
+        raw: 滤波前的最后一帧
+
+    Returns:
+        (无效像素比例, 原本有效像素的噪声（平坦区域均方根误差 mm）, 被填充像素的平均绝对误差 mm)
+    """
+    edge = _edge_mask(truth)
+    raw_valid = raw != 0
+    factor = next((f.factor for f in chain.filters if isinstance(f, DecimationFilter)), 1)
+    if factor > 1:
+        # 参考值也按同样方式降采样，有效性按块内是否有有效像素判断
+        decimation = DecimationFilter(factor)
+        decimation.configure(truth.shape)
+        truth = decimation.apply(truth).copy()
+        raw_valid = decimation.apply(raw) != 0
+        edge = edge[::factor, ::factor][:truth.shape[0], :truth.shape[1]]
+    valid = result > 0
+    error = result.astype(np.float64) - truth
+    measured = valid & raw_valid & ~edge
+    filled = valid & ~raw_valid
+    noise = float(np.sqrt(np.mean(error[measured] ** 2))) if measured.any() else float("nan")
+    fill_error = float(np.mean(np.abs(error[filled]))) if filled.any() else float("nan")
+    return 1 - valid.mean(), noise, fill_error
+
+
+def benchmark(frames=200, width=640, height=480, spec=DEFAULT_CHAIN):
+    """
+    在合成噪声深度帧上测量滤波链各级耗时、每帧内存分配和滤波效果
+
+    Args:
+        frames: 测试帧数
+        width: 图像宽度
+        height: 图像高度
+        spec: 滤波链描述
+    """
+    truth, pool = noisy_depth(width, height)
+    chain = DepthFilterChain.from_spec(spec)
+    for depth in pool:
+        chain(depth)
+    chain.reset_stats()
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for i in range(frames):
+        result = chain(pool[i % len(pool)])
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_frame = elapsed / frames * 1000
+    print(f"合成噪声深度帧 {width}x{height}，{frames} 帧，滤波链: {spec}")
+    chain.report()
+    print(f"  每帧 {per_frame:.2f} ms（{1000 / per_frame:.0f} fps，计时开销在内）")
+    # 峰值来自 NumPy 处理跨步切片和 where 时的固定大小迭代缓冲区，与帧尺寸无关
+    print(f"  {frames} 帧后内存增长 {max(current - base, 0)} 字节，处理中临时内存峰值 "
+          f"{max(peak - base, 0) / 1024:.0f} KB（单帧深度 {pool[0].nbytes / 1024:.0f} KB）")
+
+    raw = DepthFilterChain([])
+    holes, noise, _ = _quality(raw, pool[-1], truth, pool[-1])
+    print(f"  滤波前: 无效像素 {holes:.1%}，噪声 {noise:.1f} mm")
+    holes, noise, fill_error = _quality(chain, result, truth, pool[-1])
+    print(f"  滤波后: 无效像素 {holes:.1%}，噪声 {noise:.1f} mm，填充像素平均误差 {fill_error:.0f} mm")
+
+    print("\n单独去掉每一级后的效果（噪声为平坦区域原本有效像素的均方根误差）:")
+    names = [item.strip() for item in spec.split(",") if item.strip()]
+    for skip in names:
+        partial = DepthFilterChain.from_spec(",".join(n for n in names if n != skip))
+        for depth in pool * 2:
+            result = partial(depth)
+        holes, noise, fill_error = _quality(partial, result, truth, pool[-1])
+        print(f"  去掉 {skip:<16} 无效像素 {holes:6.1%}  噪声 {noise:5.1f} mm  填充误差 {fill_error:6.0f} mm")
+
+
+def show_live(source=None, spec=DEFAULT_CHAIN):
+    """
+    实时显示原始深度和滤波后的深度
+
+    Args:
+        source: 帧源，默认 RealSense 深度相机
+        spec: 滤波链描述
+    """
+    import cv2
+
+    from examples.depth_colormap import DepthColorizer
+    from examples.frame_sources import RealSenseSource, open_source
+
+    source = open_source(source) if source is not None else RealSenseSource(copy=False)
+    chain = DepthFilterChain.from_spec(spec)
+    raw_colorizer = DepthColorizer(invalid_color=(0, 0, 0))
+    filtered_colorizer = DepthColorizer(invalid_color=(0, 0, 0))
+    source.start()
+    try:
+        print("按 'q' 键退出")
+        while True:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            filtered = chain(frame.depth)
+            right = filtered_colorizer.apply(filtered)
+            if right.shape[:2] != frame.depth.shape:
+                right = cv2.resize(right, (frame.depth.shape[1], frame.depth.shape[0]),
+                                   interpolation=cv2.INTER_NEAREST)
+            cv2.imshow('深度滤波 - 原始 | 滤波后', np.hstack((raw_colorizer.apply(frame.depth), right)))
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        source.stop()
+        cv2.destroyAllWindows()
+    chain.report()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python depth_filters.py bench [帧数] [滤波链]  # 合成噪声深度帧测速并评估效果")
+        print("  python depth_filters.py live [帧源] [滤波链]  # 实时对比原始和滤波后的深度，默认 RealSense")
+        print(f"  滤波链默认 {DEFAULT_CHAIN}")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "bench":
+        frames = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        spec = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_CHAIN
+        benchmark(frames, spec=spec)
+    elif command == "live":
+        source = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != "realsense" else None
+        spec = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_CHAIN
+        show_live(source, spec)
+    else:
+        print(f"未知命令: {command}")
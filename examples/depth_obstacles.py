@@ -0,0 +1,429 @@
+"""
+深度图障碍物扇区
+把每帧深度图压缩为水平视场内 N 个角度扇区的最近障碍物距离，供运动规划使用。
+列号到扇区、每行的地面 / 高度阈值和每个像素的水平距离系数都在配置时按相机内参和安装姿态预先计算，
+每帧只做几次整幅的 NumPy 比较、乘法和按列求最小值，结果打包为固定长度的二进制结构发布
+"""
+import math
+import os
+import socket
+import struct
+import sys
+import time
+from typing import List, NamedTuple
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.depth_pointcloud import Intrinsics
+
+# 发布的扇区结构（小端）：帧序号 uint32、时间戳 float64（time.monotonic）、扇区数 uint16、标志 uint16、
+# 第一个扇区的起始角 float32（弧度，向右为正）、扇区角宽 float32（弧度），之后为每个扇区的距离 uint16（毫米）
+HEADER = struct.Struct("<IdHHff")
+# 扇区内没有障碍物（或超出量程）时的距离值
+NO_OBSTACLE = 0xFFFF
+# 标志位：本帧没有有效深度（相机被遮挡或全部超出量程）
+FLAG_BLIND = 0x1
+
+
+def scan_struct(sectors):
+    """sectors 个扇区时的完整结构"""
+    return struct.Struct(HEADER.format + f"{sectors}H")
+
+
+class ObstacleScan(NamedTuple):
+    """解包后的扇区结果"""
+    seq: int
+    timestamp: float
+    flags: int
+    angle_min: float
+    sector_width: float
+    # 各扇区最近障碍物的水平距离（米），没有障碍物时为 None
+    distances: List[float]
+
+    @classmethod
+    def unpack(cls, data):
+        sectors = HEADER.unpack_from(data)[2]
+        values = scan_struct(sectors).unpack_from(data)
+        seq, timestamp, _, flags, angle_min, width = values[:6]
+        distances = [None if d == NO_OBSTACLE else d / 1000.0 for d in values[6:]]
+        return cls(seq, timestamp, flags, angle_min, width, distances)
+
+    def sector_angles(self):
+        """各扇区中心角（度，向右为正）"""
+        return [math.degrees(self.angle_min + (i + 0.5) * self.sector_width) for i in range(len(self.distances))]
+
+
+class ObstacleSectorizer:
+    """
+    障碍物扇区计算
+
+    相机坐标系 x 向右、y 向下、z 向前，相机安装在离地 camera_height 米处、向下俯仰 pitch 度。
+    深度为 z 的像素离地高度为 camera_height - z * (v' * cos(pitch) + sin(pitch))，v' = (v - ppy) / fy，
+    只与行号有关，因此"高度在 [min_height, max_height] 之间"可以换算为每行一个原始深度区间，
+    地面和高于机器人的物体（如桌面下方以外的天花板）每帧只需两次比较即可排除。
+    扇区距离为障碍物点到相机的水平距离，由原始深度乘以预先计算的系数得到
+    """
+
+    def __init__(self, intrinsics: Intrinsics, sectors=16, camera_height=0.45, pitch=0.0,
+                 min_height=0.05, max_height=0.6, min_depth=0.1, max_depth=6.0, require_support=True):
+        """
+        Args:
+            intrinsics: 深度相机内参，输入帧尺寸不同（如降采样后）时按比例换算
+            sectors: 扇区数，平均分配水平视场
+            camera_height: 相机光心离地高度（米）
+            pitch: 相机向下俯仰角（度）
+            min_height: 低于此高度（米）的点视为地面
+            max_height: 高于此高度（米）的点不影响通行（机器人可以从下方通过）
+            min_depth: 有效深度下限（米）
+            max_depth: 有效深度上限（米），更远的点不计入
+            require_support: 为 True 时要求像素正下方的像素也是障碍物点，过滤孤立的噪点
+        """
+        self.intrinsics = intrinsics
+        self.sectors = sectors
+        self.camera_height = camera_height
+        self.pitch = math.radians(pitch)
+        self.min_height = min_height
+        self.max_height = max_height
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.require_support = require_support
+        self.struct = scan_struct(sectors)
+        # 发布用的缓冲区只分配一次，每帧原地打包
+        self.buffer = bytearray(self.struct.size)
+        self.distances = np.empty(sectors, dtype=np.uint16)
+        self.seq = 0
+        self.flags = 0
+        self.shape = None
+        self._subscribers = []
+
+    def configure(self, shape):
+        """按输入深度图尺寸预先计算各种表并分配缓冲区"""
+        h, w = shape
+        intr = self.intrinsics
+        sx, sy = w / intr.width, h / intr.height
+        fx, fy, ppx, ppy = intr.fx * sx, intr.fy * sy, intr.ppx * sx, intr.ppy * sy
+        scale = intr.depth_scale
+
+        u = (np.arange(w, dtype=np.float64) - ppx) / fx
+        v = (np.arange(h, dtype=np.float64) - ppy) / fy
+        # 列号 → 方位角 → 扇区；列按方位角单调排列，同一扇区的列是连续的
+        if self.sectors > w:
+            raise ValueError("扇区数不能大于图像宽度")
+        azimuth = np.arctan(u)
+        self.angle_min = float(azimuth[0])
+        self.sector_width = float((azimuth[-1] - azimuth[0]) / self.sectors)
+        sector_of_column = np.minimum(((azimuth - azimuth[0]) / self.sector_width).astype(np.int64),
+                                      self.sectors - 1)
+        self._starts = np.searchsorted(sector_of_column, np.arange(self.sectors))
+
+        # 障碍物条件 min_height <= camera_height - z * k <= max_height，k = v' cos(pitch) + sin(pitch)，
+        # 即 low <= z * k <= high，对每行解出 z 的区间后与 [min_depth, max_depth] 求交
+        cos_p, sin_p = math.cos(self.pitch), math.sin(self.pitch)
+        k = v * cos_p + sin_p
+        low = self.camera_height - self.max_height
+        high = self.camera_height - self.min_height
+        lo = np.full(h, self.min_depth)
+        hi = np.full(h, self.max_depth)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lo = np.where(k > 0, np.maximum(lo, low / k), np.where(k < 0, np.maximum(lo, high / k), lo))
+            hi = np.where(k > 0, np.minimum(hi, high / k), np.where(k < 0, np.minimum(hi, low / k), hi))
+        # k == 0（光轴水平时的中间行）：高度恒为 camera_height
+        if not low <= 0 <= high:
+            hi[k == 0] = 0
+        lo_raw = np.maximum(np.ceil(lo / scale), 1)
+        hi_raw = np.minimum(np.floor(hi / scale), 65535)
+        empty = lo_raw > hi_raw
+        self.rows = np.flatnonzero(~empty)
+        # 只处理可能出现障碍物的行（例如俯视时地平线以上的行被整体跳过）
+        self._row_range = (int(self.rows[0]), int(self.rows[-1]) + 1) if len(self.rows) else (0, 0)
+        # 区间为空的行用 (65535, 0)，任何深度都不满足
+        lo_raw[empty], hi_raw[empty] = 65535, 0
+        r0, r1 = self._row_range
+        self._lo = lo_raw[r0:r1].astype(np.uint16)[:, np.newaxis]
+        self._hi = hi_raw[r0:r1].astype(np.uint16)[:, np.newaxis]
+
+        # 水平距离 = z * sqrt(u'^2 + (cos(pitch) - v' sin(pitch))^2)，乘入深度单位，结果为毫米
+        forward = cos_p - v * sin_p
+        factor = np.sqrt(u[np.newaxis, :] ** 2 + forward[:, np.newaxis] ** 2) * scale * 1000.0
+        self._factor = factor[r0:r1].astype(np.float32)
+        rows = r1 - r0
+        self._reject = np.empty((rows, w), dtype=bool)
+        self._tmp = np.empty((rows, w), dtype=bool)
+        self._range = np.empty((rows, w), dtype=np.float32)
+        self._column_min = np.empty(w, dtype=np.float32)
+        self._sector_min = np.empty(self.sectors, dtype=np.float32)
+        self.shape = tuple(shape)
+
+    def process(self, depth, timestamp=None):
+        """
+        计算一帧的扇区距离并打包
+
+        Args:
+            depth: uint16 深度图
+            timestamp: 帧时间戳，None 时取当前 time.monotonic()
+
+        Returns:
+            打包后的结构（内部缓冲区的 memoryview，下次调用会被覆盖）
+        """
+        if depth.shape != self.shape:
+            self.configure(depth.shape)
+        r0, r1 = self._row_range
+        rows = depth[r0:r1]
+        reject, tmp, rng = self._reject, self._tmp, self._range
+        # 不在本行障碍物深度区间内的像素（包括无效深度 0）
+        np.less(rows, self._lo, out=reject)
+        np.greater(rows, self._hi, out=tmp)
+        np.logical_or(reject, tmp, out=reject)
+        if self.require_support and len(reject) > 1:
+            # 正下方的像素也必须是障碍物点，孤立噪点被排除（最后一行没有下方像素，保持原样）
+            np.logical_or(reject[:-1], reject[1:], out=tmp[:-1])
+            tmp[-1] = reject[-1]
+            reject = tmp
+        if len(rng):
+            np.multiply(rows, self._factor, out=rng)
+            np.copyto(rng, np.inf, where=reject)
+            np.minimum.reduce(rng, axis=0, out=self._column_min)
+        else:
+            self._column_min.fill(np.inf)
+        self._sector_min[:] = np.minimum.reduceat(self._column_min, self._starts)
+        np.minimum(self._sector_min, NO_OBSTACLE, out=self._sector_min)
+        np.copyto(self.distances, self._sector_min, casting="unsafe")
+
+        self.flags = FLAG_BLIND if not np.any(rows) else 0
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.struct.pack_into(self.buffer, 0, self.seq,
+                              time.monotonic() if timestamp is None else timestamp,
+                              self.sectors, self.flags, self.angle_min, self.sector_width,
+                              *self.distances.tolist())
+        data = memoryview(self.buffer)
+        for callback in self._subscribers:
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"扇区发布出错: {e}")
+        return data
+
+    __call__ = process
+
+    def subscribe(self, callback):
+        """每帧处理完成后以打包的结构（memoryview）调用 callback"""
+        self._subscribers.append(callback)
+
+
+class UdpPublisher:
+    """把扇区结构作为一个 UDP 数据报发送给运动规划进程"""
+
+    def __init__(self, host="127.0.0.1", port=9870):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sent = 0
+
+    def __call__(self, data):
+        try:
+            self.sock.sendto(data, self.address)
+            self.sent += 1
+        except OSError:
+            # 接收方未启动时丢弃，不影响采集
+            pass
+
+    def close(self):
+        self.sock.close()
+
+
+def listen(port=9870, count=None):
+    """
+    接收并打印扇区结果（调试用，相当于运动规划一侧）
+
+    Args:
+        port: UDP 端口
+        count: 收到多少帧后退出，None 表示一直接收
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("0.0.0.0", port))
+    received = 0
+    print(f"等待扇区数据 udp://0.0.0.0:{port}，按 Ctrl+C 停止")
+    try:
+        while count is None or received < count:
+            data, _ = sock.recvfrom(65536)
+            scan = ObstacleScan.unpack(data)
+            received += 1
+            cells = " ".join("  -- " if d is None else f"{d:4.1f}" for d in scan.distances)
+            print(f"#{scan.seq:<6} {cells}" + ("  [无有效深度]" if scan.flags & FLAG_BLIND else ""))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+
+def stream_obstacles(source, sectorizer=None, duration=None, publisher=None, filters=None, show=True):
+    """
+    持续从帧源取深度帧，计算并发布障碍物扇区
+
+    Args:
+        source: 含深度的帧源（FrameSource）
+        sectorizer: ObstacleSectorizer，None 时在帧源启动后按其内参创建
+        duration: 运行时长（秒），None 表示直到 Ctrl+C
+        publisher: 每帧调用的发布函数，如 UdpPublisher
+        filters: 可选的 DepthFilterChain，先滤波再计算扇区（降采样后内参自动换算）
+        show: 是否每秒打印一次最近的结果
+    """
+    source.start()
+    if sectorizer is None and getattr(source, "profile", None) is not None:
+        sectorizer = ObstacleSectorizer(Intrinsics.from_realsense(source.profile))
+    frame_count = 0
+    process_time = 0.0
+    start_time = last_print = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - start_time < duration:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            if sectorizer is None:
+                # 没有内参的帧源（录像、合成数据）按 D435 典型内参
+                height, width = frame.depth.shape
+                sectorizer = ObstacleSectorizer(Intrinsics.default(width, height))
+            if publisher is not None and not sectorizer._subscribers:
+                sectorizer.subscribe(publisher)
+            t0 = time.perf_counter()
+            depth = filters(frame.depth) if filters is not None else frame.depth
+            data = sectorizer(depth, frame.timestamp)
+            process_time += time.perf_counter() - t0
+            frame_count += 1
+            if show and time.monotonic() - last_print >= 1.0:
+                last_print = time.monotonic()
+                scan = ObstacleScan.unpack(data)
+                print(" ".join("  -- " if d is None else f"{d:4.1f}" for d in scan.distances))
+    except KeyboardInterrupt:
+        print("\n障碍物扇区计算被中断")
+    finally:
+        source.stop()
+
+    elapsed = time.monotonic() - start_time
+    if frame_count:
+        print(f"处理 {frame_count} 帧，平均 {frame_count / elapsed:.1f} fps，"
+              f"单帧计算 {process_time / frame_count * 1000:.2f} ms")
+
+
+def synthetic_scene(intrinsics, camera_height=0.45, noise=0.005, seed=0):
+    """
+    按相机内参和安装高度生成合成场景：水平地面、4 m 处的墙、左前方 1.2 m 的箱子和
+    右前方 2.5 m 的一根细柱，叠加与距离成比例的噪声和少量无效像素
+
+    Returns:
+        (深度帧 uint16, {物体名称: (方位角范围（度）, 距离（米）)})
+    """
+    rng = np.random.default_rng(seed)
+    h, w = intrinsics.height, intrinsics.width
+    u = (np.arange(w) - intrinsics.ppx) / intrinsics.fx
+    v = (np.arange(h) - intrinsics.ppy) / intrinsics.fy
+    uu, vv = np.meshgrid(u, v)
+    z = np.full((h, w), 4.0)
+    # 地面：y = camera_height 的平面，z = camera_height / v'
+    with np.errstate(divide="ignore"):
+        ground = np.where(vv > 0, camera_height / vv, np.inf)
+    z = np.minimum(z, ground)
+    objects = {}
+    for name, (x0, x1, distance, top) in {"箱子": (-0.6, -0.2, 1.2, 0.35), "细柱": (0.5, 0.56, 2.5, 1.5)}.items():
+        # 物体正面为 z = distance 的竖直平面，x 在 [x0, x1]，高度从地面到 top
+        x = uu * distance
+        height = camera_height - vv * distance
+        inside = (x >= x0) & (x <= x1) & (height >= 0) & (height <= top)
+        z = np.where(inside & (distance < z), distance, z)
+        objects[name] = ((math.degrees(math.atan(x0 / distance)), math.degrees(math.atan(x1 / distance))),
+                         distance)
+    depth = z * (1 + rng.normal(0, noise, z.shape))
+    depth[rng.random(z.shape) < 0.03] = 0
+    raw = np.clip(np.round(depth / intrinsics.depth_scale), 0, 65535).astype(np.uint16)
+    return raw, objects
+
+
+def benchmark(frames=1000, width=640, height=480, sectors=16):
+    """
+    在合成场景上测量单核每帧耗时（目标 3 ms），并检查扇区结果
+
+    Args:
+        frames: 测试帧数
+        width: 图像宽度
+        height: 图像高度
+        sectors: 扇区数
+    """
+    intrinsics = Intrinsics.default(width, height)
+    depth, objects = synthetic_scene(intrinsics)
+    sectorizer = ObstacleSectorizer(intrinsics, sectors=sectors)
+    sectorizer(depth)
+
+    times = np.empty(frames)
+    for i in range(frames):
+        t0 = time.perf_counter()
+        data = sectorizer(depth, 0.0)
+        times[i] = time.perf_counter() - t0
+    times *= 1000
+    mean, p99, worst = times.mean(), np.percentile(times, 99), times.max()
+    status = "达标" if p99 < 3.0 else "未达标"
+    print(f"合成场景 {width}x{height}，{sectors} 个扇区，{frames} 帧，结构 {sectorizer.struct.size} 字节")
+    print(f"  平均 {mean:.3f} ms  p99 {p99:.3f} ms  最长 {worst:.3f} ms  （目标 < 3 ms：{status}）")
+
+    # 对照：先生成完整点云再逐点求方位角和高度
+    from examples.depth_pointcloud import PointCloudProjector
+
+    projector = PointCloudProjector(intrinsics, max_depth=sectorizer.max_depth)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        points = projector.points(depth)
+        height_above = sectorizer.camera_height - points[:, 1]
+        keep = (height_above > sectorizer.min_height) & (height_above < sectorizer.max_height)
+        points = points[keep]
+        sector = ((np.arctan2(points[:, 0], points[:, 2]) - sectorizer.angle_min)
+                  / sectorizer.sector_width).astype(np.int64).clip(0, sectors - 1)
+        reference = np.full(sectors, np.inf)
+        np.minimum.at(reference, sector, np.hypot(points[:, 0], points[:, 2]))
+    baseline = (time.perf_counter() - t0) / 20 * 1000
+    print(f"  对照（点云 + 逐点分扇区）{baseline:.2f} ms/帧，快 {baseline / mean:.0f} 倍")
+
+    scan = ObstacleScan.unpack(data)
+    print("\n扇区  方位角      距离    点云对照")
+    for angle, d, ref in zip(scan.sector_angles(), scan.distances, reference):
+        print(f"  {angle:+6.1f}°  {'  -- ' if d is None else f'{d:5.2f} m'}   "
+              f"{'  -- ' if not np.isfinite(ref) else f'{ref:5.2f} m'}")
+    measured = np.array([np.inf if d is None else d for d in scan.distances])
+    # 距离按毫米取整，另外 require_support 会去掉障碍物最上一行，允许 2 cm 误差
+    mismatched = int(np.sum(~np.isclose(measured, reference, atol=0.02, rtol=0)))
+    print(f"与点云对照不一致的扇区: {mismatched}/{sectors}")
+    print("场景中的物体:")
+    for name, ((a0, a1), distance) in objects.items():
+        print(f"  {name}: 方位 {a0:+.1f}° ~ {a1:+.1f}°，距离 {distance} m")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python depth_obstacles.py run [主机:端口] [帧源]  # 计算扇区并以 UDP 发布，默认 127.0.0.1:9870、RealSense")
+        print("  python depth_obstacles.py listen [端口]  # 接收并打印扇区结果")
+        print("  python depth_obstacles.py bench [帧数] [扇区数]  # 合成场景单核测速（目标 3 ms/帧）")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "run":
+        host, _, port = (sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1:9870").partition(":")
+        from examples.frame_sources import RealSenseSource, open_source
+
+        source = open_source(sys.argv[3]) if len(sys.argv) > 3 else RealSenseSource(copy=False)
+        publisher = UdpPublisher(host, int(port or 9870))
+        stream_obstacles(source, publisher=publisher)
+        publisher.close()
+    elif command == "listen":
+        listen(int(sys.argv[2]) if len(sys.argv) > 2 else 9870)
+    elif command == "bench":
+        frames = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        sectors = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+        benchmark(frames, sectors=sectors)
+    else:
+        print(f"未知命令: {command}")
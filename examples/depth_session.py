@@ -0,0 +1,206 @@
+"""
+深度相机常驻会话
+相机启动并预热一次后保持取流，后台线程只在环形缓冲区中保留最新的几组帧，
+capture() 直接返回最新帧，不再每次重建 pipeline 并丢弃 30 帧
+"""
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+import cv2
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.depth_colormap import DepthColorizer
+from examples.frame_sources import RealSenseSource, SyntheticDepthSource
+
+
+class DepthCameraSession:
+    """
+    常驻深度相机会话
+
+    用法:
+        with DepthCameraSession() as session:
+            timestamp, color_image, depth_image = session.capture()
+
+    超过 idle_timeout 秒没有调用 capture() 时自动停止取流释放相机，
+    下一次 capture() 会重新启动（此时需要重新预热）。
+    """
+
+    def __init__(self, source=None, ring_size=2, warmup_frames=30, idle_timeout=60.0):
+        """
+        Args:
+            source: 含深度的帧源（FrameSource），默认 RealSenseSource()
+            ring_size: 环形缓冲区保留的帧组数量
+            warmup_frames: 每次启动后丢弃的帧数（让自动曝光稳定）
+            idle_timeout: 空闲多少秒后自动停止取流，None 表示不自动停止
+        """
+        self.source = source or RealSenseSource()
+        self.warmup_frames = warmup_frames
+        self.idle_timeout = idle_timeout
+        self._ring = deque(maxlen=ring_size)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._error = None
+        self._frame_count = 0
+        self._last_used = time.monotonic()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """启动取流（已在运行时什么也不做）"""
+        with self._cond:
+            self._start_locked()
+
+    def _start_locked(self):
+        if self._running:
+            return
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            # 等待上一次退出的取流线程完全停止相机，等待期间释放锁让它完成收尾
+            self._cond.release()
+            try:
+                thread.join()
+            finally:
+                self._cond.acquire()
+            if self._running:
+                return
+        self._ring.clear()
+        self._frame_count = 0
+        self._error = None
+        self._last_used = time.monotonic()
+        self.source.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, name="depth-session", daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        skipped = 0
+        try:
+            while self._running:
+                if self.idle_timeout is not None and \
+                        time.monotonic() - self._last_used > self.idle_timeout:
+                    print(f"深度相机空闲超过 {self.idle_timeout} 秒，停止取流")
+                    break
+                frame = self.source.read()
+                if frame is None:
+                    continue
+                if skipped < self.warmup_frames:
+                    skipped += 1
+                    continue
+                with self._cond:
+                    self._ring.append(frame)
+                    self._frame_count += 1
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+            self.source.stop()
+
+    def capture(self, fresh=False, timeout=5.0):
+        """
+        获取最新一组帧
+
+        Args:
+            fresh: 为 True 时等待调用之后到达的新帧，而不是直接返回缓冲区中的最新帧
+            timeout: 等待帧的超时时间（秒），包含首次启动的预热时间
+
+        Returns:
+            (timestamp, color_image, depth_image)
+        """
+        with self._cond:
+            self._last_used = time.monotonic()
+            self._start_locked()
+            target = self._frame_count + 1 if fresh else 1
+            ready = self._cond.wait_for(
+                lambda: self._frame_count >= target or not self._running, timeout
+            )
+            if self._error is not None:
+                raise RuntimeError(f"深度相机取流失败: {self._error}")
+            if not ready or not self._ring:
+                raise TimeoutError("等待深度帧超时")
+            return self._ring[-1]
+
+    def stop(self):
+        """停止取流并释放相机"""
+        with self._cond:
+            self._running = False
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def save_capture(session, prefix=""):
+    """
+    用会话拍摄一组图像并保存
+
+    Args:
+        session: DepthCameraSession
+        prefix: 文件名前缀
+    """
+    _, color_image, depth_image = session.capture()
+    cv2.imwrite(f"{prefix}color_image.jpg", color_image)
+    cv2.imwrite(f"{prefix}depth_image.jpg", DepthColorizer().apply(depth_image))
+    print(f"图像已保存: {prefix}color_image.jpg, {prefix}depth_image.jpg")
+
+
+def benchmark(count=50):
+    """
+    使用合成帧源测量会话预热后 capture() 的耗时
+
+    Args:
+        count: 拍摄次数
+    """
+    with DepthCameraSession(SyntheticDepthSource()) as session:
+        start = time.perf_counter()
+        session.capture()
+        print(f"首次拍摄（含 {session.warmup_frames} 帧预热）: "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for fresh in (False, True):
+            start = time.perf_counter()
+            for _ in range(count):
+                session.capture(fresh=fresh)
+            elapsed = (time.perf_counter() - start) / count * 1000
+            print(f"{'等待新帧' if fresh else '最新帧'} capture() 平均耗时: {elapsed:.3f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python depth_session.py capture [张数] [间隔秒数]  # 常驻会话连续拍摄")
+        print("  python depth_session.py bench [次数]  # 合成帧源测量 capture() 耗时")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "capture":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+        interval = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        with DepthCameraSession() as session:
+            for i in range(count):
+                save_capture(session, f"{i:03d}_")
+                if i < count - 1:
+                    time.sleep(interval)
+    elif command == "bench":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 50)
+    else:
+        print(f"未知命令: {command}")
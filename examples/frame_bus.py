@@ -0,0 +1,585 @@
+"""
+共享内存帧总线
+一个发布进程独占相机（RealSense 或 RTSP），把每一帧写入 multiprocessing.shared_memory 中的环形槽位；
+录制、预览、分析等多个订阅进程按名称映射同一块共享内存，直接以 NumPy 视图读取帧，不复制、不序列化，
+各自占用独立的核心，不受 GIL 限制。
+
+布局：
+    [头部 4096 字节] 魔数、版本、槽位数、槽位大小、代号、最新帧序号、发布进程 PID、布局描述（JSON）
+    [槽位 0][槽位 1]...  每个槽位: 帧序号 uint64、时间戳 float64、彩色图像、深度图像（各自 64 字节对齐）
+
+写入一帧时先把槽位序号置 0，复制数据和时间戳后再写入新序号，最后更新头部的最新帧序号；
+读取方在读取前后核对槽位序号，序号不符说明槽位正在写入或已被覆盖。
+视图在发布进程绕环一圈（slots - 1 帧）之前有效，需要更久保留帧的订阅方应使用 copy=True
+"""
+import json
+import os
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.frame_sources import Frame, FrameSource, open_source
+
+MAGIC = b"FRAMEBUS"
+VERSION = 1
+HEADER_SIZE = 4096
+ALIGN = 64
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u4"), ("slots", "<u4"), ("slot_size", "<u8"),
+    ("generation", "<u8"), ("write_seq", "<u8"), ("pid", "<u4"), ("closed", "<u4"), ("layout_size", "<u4"),
+])
+SLOT_DTYPE = np.dtype([("seq", "<u8"), ("timestamp", "<f8")])
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _shm_name(name):
+    return f"framebus_{name}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _open_shm(shm_name):
+    """
+    映射已存在的共享内存，不登记到 resource_tracker
+
+    Python 3.13 之前映射已有的共享内存也会登记，订阅进程退出时 resource_tracker 会把发布方的共享内存删除；
+    事后 unregister 也不可行，headless_runner 的各个工作进程共用同一个 resource_tracker，会撤销发布方的登记
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(shm_name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(shm_name)
+    finally:
+        resource_tracker.register = register
+
+
+class _Mapping:
+    """共享内存上的头部、槽位序号和图像视图"""
+
+    def __init__(self, shm):
+        self.shm = shm
+        self.header = np.ndarray((), HEADER_DTYPE, buffer=shm.buf)
+        if bytes(self.header["magic"]) != MAGIC or int(self.header["version"]) != VERSION:
+            raise ValueError(f"{shm.name} 不是版本 {VERSION} 的帧总线")
+        size = int(self.header["layout_size"])
+        self.layout = json.loads(bytes(shm.buf[HEADER_DTYPE.itemsize:HEADER_DTYPE.itemsize + size]))
+        self.slots = int(self.header["slots"])
+        self.generation = int(self.header["generation"])
+        slot_size = int(self.header["slot_size"])
+        self.meta = []
+        self.views = []
+        for i in range(self.slots):
+            base = HEADER_SIZE + i * slot_size
+            self.meta.append(np.ndarray((), SLOT_DTYPE, buffer=shm.buf, offset=base))
+            self.views.append({
+                stream["name"]: np.ndarray(stream["shape"], np.dtype(stream["dtype"]), buffer=shm.buf,
+                                           offset=base + stream["offset"])
+                for stream in self.layout["streams"]
+            })
+
+    def release(self):
+        """丢弃所有视图并关闭映射；订阅方仍持有帧视图时映射留给垃圾回收"""
+        self.header = None
+        self.meta = []
+        self.views = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+
+class FramePublisher:
+    """帧总线发布方，创建共享内存并写入帧"""
+
+    def __init__(self, name, color_shape, depth_shape=None, color_dtype=np.uint8, depth_dtype=np.uint16,
+                 slots=16, fps=30):
+        """
+        Args:
+            name: 总线名称，订阅方按名称连接（共享内存名为 framebus_<name>）
+            color_shape: 彩色图像形状，如 (480, 640, 3)
+            depth_shape: 深度图像形状，None 表示没有深度（热成像）
+            color_dtype: 彩色图像类型
+            depth_dtype: 深度图像类型
+            slots: 槽位数；订阅方处理一帧的时间超过 slots - 1 个帧间隔时，every 模式会丢帧
+            fps: 帧率，供订阅方参考
+        """
+        streams = []
+        offset = _align(SLOT_DTYPE.itemsize)
+        for stream, shape, dtype in (("color", color_shape, color_dtype), ("depth", depth_shape, depth_dtype)):
+            if shape is None:
+                continue
+            dtype = np.dtype(dtype)
+            streams.append({"name": stream, "shape": list(shape), "dtype": dtype.str, "offset": offset})
+            offset = _align(offset + int(np.prod(shape)) * dtype.itemsize)
+        self.slot_size = offset
+        self.layout = {"streams": streams, "fps": fps, "width": int(color_shape[1]), "height": int(color_shape[0])}
+        layout = json.dumps(self.layout).encode("utf-8")
+        if HEADER_DTYPE.itemsize + len(layout) > HEADER_SIZE:
+            raise ValueError("布局描述过长")
+
+        self.name = name
+        self.slots = slots
+        self.shm = self._create(_shm_name(name), HEADER_SIZE + slots * self.slot_size)
+        header = np.ndarray((), HEADER_DTYPE, buffer=self.shm.buf)
+        header["slots"] = slots
+        header["slot_size"] = self.slot_size
+        # 发布进程重启后代号变化，已连接的订阅方据此重新映射
+        header["generation"] = int.from_bytes(os.urandom(8), "little") >> 1
+        header["pid"] = os.getpid()
+        header["layout_size"] = len(layout)
+        self.shm.buf[HEADER_DTYPE.itemsize:HEADER_DTYPE.itemsize + len(layout)] = layout
+        header["version"] = VERSION
+        header["magic"] = MAGIC
+        del header
+        self._map = _Mapping(self.shm)
+        self.seq = 0
+        self.publish_time = 0.0
+
+    @staticmethod
+    def _create(shm_name, size):
+        try:
+            return shared_memory.SharedMemory(shm_name, create=True, size=size)
+        except FileExistsError:
+            pass
+        # 上一个发布进程没有正常退出，留下了同名的共享内存
+        old = shared_memory.SharedMemory(shm_name)
+        try:
+            header = np.ndarray((), HEADER_DTYPE, buffer=old.buf)
+            pid, closed = int(header["pid"]), int(header["closed"])
+            del header
+            if bytes(old.buf[:8]) == MAGIC and not closed and pid != os.getpid() and _pid_alive(pid):
+                raise RuntimeError(f"帧总线 {shm_name} 已由进程 {pid} 发布")
+            old.unlink()
+        finally:
+            old.close()
+        return shared_memory.SharedMemory(shm_name, create=True, size=size)
+
+    @classmethod
+    def from_frame(cls, name, frame: Frame, slots=16, fps=30):
+        """按一帧的图像形状和类型创建"""
+        depth = frame.depth
+        return cls(name, frame.color.shape, None if depth is None else depth.shape,
+                   frame.color.dtype, np.uint16 if depth is None else depth.dtype, slots, fps)
+
+    def publish(self, frame: Frame):
+        """
+        写入一帧
+
+        Returns:
+            帧序号（从 1 开始）
+        """
+        t0 = time.perf_counter()
+        seq = self.seq + 1
+        i = seq % self.slots
+        meta, views = self._map.meta[i], self._map.views[i]
+        # 先作废槽位，读取方看到序号 0 或与期望不符的序号时放弃这个槽位
+        meta["seq"] = 0
+        np.copyto(views["color"], frame.color)
+        if "depth" in views:
+            np.copyto(views["depth"], frame.depth)
+        meta["timestamp"] = frame.timestamp
+        meta["seq"] = seq
+        self._map.header["write_seq"] = seq
+        self.seq = seq
+        self.publish_time += time.perf_counter() - t0
+        return seq
+
+    def close(self):
+        """标记总线已关闭并删除共享内存（已映射的订阅方仍可读取最后的数据）"""
+        if self.shm is None:
+            return
+        self._map.header["closed"] = 1
+        self._map.release()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FrameSubscriber(FrameSource):
+    """
+    帧总线订阅方，本身也是帧源，可以直接交给录制、预览、分析等代码
+
+    read() 返回的 Frame 中的图像是共享内存上的只读视图（copy=False 时）；
+    帧在发布方再写入 slots - 1 帧之前有效，可用 valid() 检查最近读取的帧是否仍未被覆盖
+    """
+
+    live = True
+
+    def __init__(self, name, mode="latest", copy=False, timeout=2.0, poll_interval=0.001):
+        """
+        Args:
+            name: 总线名称
+            mode: "latest" 每次取最新帧（预览、分析），"every" 按顺序取每一帧（录制），
+                落后超过环形缓冲区时跳到较新的帧并计入 dropped
+            copy: 为 True 时返回复制的帧，可以跨线程排队或长期保存
+            timeout: read() 默认的等待超时（秒）
+            poll_interval: 等待新帧时检查的间隔（秒）
+        """
+        if mode not in ("latest", "every"):
+            raise ValueError(f"未知模式: {mode}")
+        self.name = name
+        self.mode = mode
+        self.copy = copy
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._map = None
+        self._last = 0
+        # 统计：读取帧数、every 模式因落后被覆盖而丢失的帧数、latest 模式跳过的帧数、重新连接次数
+        self.received = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.reconnects = 0
+
+    def _open(self):
+        try:
+            shm = _open_shm(_shm_name(self.name))
+        except FileNotFoundError:
+            raise ConnectionError(f"帧总线 {self.name} 不存在（发布进程未启动？）") from None
+        try:
+            return _Mapping(shm)
+        except ValueError:
+            shm.close()
+            raise
+
+    def _attach(self, mapping):
+        layout = mapping.layout
+        self.width, self.height, self.fps = layout["width"], layout["height"], layout["fps"]
+        self._map = mapping
+        # 从连接时的最新帧之后开始读取
+        self._last = int(mapping.header["write_seq"])
+
+    def start(self):
+        self._attach(self._open())
+
+    def _replaced(self):
+        """发布方已重启（同名共享内存被替换，包括上一个发布进程被强制结束的情况）"""
+        try:
+            shm = _open_shm(_shm_name(self.name))
+        except FileNotFoundError:
+            return False
+        try:
+            header = np.ndarray((), HEADER_DTYPE, buffer=shm.buf)
+            replaced = bytes(header["magic"]) == MAGIC and int(header["generation"]) != self._map.generation
+            del header
+        finally:
+            shm.close()
+        return replaced
+
+    def read(self, timeout=None) -> Optional[Frame]:
+        """
+        取下一帧
+
+        Args:
+            timeout: 等待超时（秒），None 使用构造时的 timeout
+
+        Returns:
+            Frame；超时返回 None（发布方暂停、重启中或已退出）
+
+        Raises:
+            EOFError: 未调用 start() 或已调用 stop()
+        """
+        if self._map is None:
+            raise EOFError(f"帧总线 {self.name} 未连接")
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        checked = False
+        while True:
+            latest = int(self._map.header["write_seq"])
+            if latest > self._last:
+                if self.mode == "latest":
+                    target = latest
+                    self.skipped += latest - self._last - 1
+                else:
+                    target = self._last + 1
+                    # 留出半个环的余量，避免刚跳过去的槽位马上又被覆盖
+                    oldest = latest - self._map.slots // 2
+                    if target < oldest and latest - target >= self._map.slots - 1:
+                        self.dropped += oldest - target
+                        target = oldest
+                frame = self._read_slot(target)
+                if frame is not None:
+                    self._last = target
+                    self.received += 1
+                    return frame
+                # 槽位在读取时被覆盖，重新取最新序号
+                if self.mode == "every":
+                    self.dropped += 1
+                    self._last = target
+                continue
+            if time.monotonic() >= deadline:
+                if not checked and self._replaced():
+                    checked = True
+                    if self._reconnect():
+                        continue
+                return None
+            time.sleep(self.poll_interval)
+
+    def _read_slot(self, seq):
+        i = seq % self._map.slots
+        meta = self._map.meta[i]
+        if int(meta["seq"]) != seq:
+            return None
+        views = self._map.views[i]
+        timestamp = float(meta["timestamp"])
+        color, depth = views["color"], views.get("depth")
+        if self.copy:
+            color = color.copy()
+            depth = None if depth is None else depth.copy()
+        # 读取期间槽位被覆盖时放弃这一帧（复制模式下即复制的数据不完整）
+        if int(meta["seq"]) != seq:
+            return None
+        if not self.copy:
+            color = color.view()
+            color.flags.writeable = False
+            if depth is not None:
+                depth = depth.view()
+                depth.flags.writeable = False
+        return Frame(timestamp, color, depth)
+
+    def valid(self):
+        """最近一次 read() 返回的帧视图是否仍未被发布方覆盖"""
+        return self._map is not None and int(self._map.meta[self._last % self._map.slots]["seq"]) == self._last
+
+    def _reconnect(self):
+        """映射新的共享内存，成功后才替换旧映射；新的发布进程尚未就绪时保留旧映射，下次超时再试"""
+        try:
+            mapping = self._open()
+        except (ConnectionError, ValueError):
+            return False
+        self._map.release()
+        self._attach(mapping)
+        self.reconnects += 1
+        print(f"帧总线 {self.name} 的发布进程已重启，重新连接")
+        return True
+
+    def stop(self):
+        if self._map is not None:
+            self._map.release()
+            self._map = None
+
+    def report(self):
+        """打印订阅统计"""
+        print(f"帧总线 {self.name}: 读取 {self.received} 帧，跳过 {self.skipped} 帧，"
+              f"丢失 {self.dropped} 帧，重新连接 {self.reconnects} 次")
+
+
+def publish_source(source=None, name="depth", slots=16, duration=None):
+    """
+    从帧源取帧并发布到帧总线，直到帧源结束、达到 duration 或按 Ctrl+C
+
+    Args:
+        source: 帧源（FrameSource 或 open_source 支持的描述），None 表示 RealSense 深度相机
+        name: 总线名称
+        slots: 槽位数
+        duration: 运行时长（秒），None 表示一直运行
+    """
+    if source is None:
+        from examples.frame_sources import RealSenseSource
+
+        # 帧立即复制到共享内存，不需要 SDK 侧再复制一次
+        source = RealSenseSource(copy=False)
+    source = open_source(source)
+    source.start()
+    publisher = None
+    start_time = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - start_time < duration:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            if publisher is None:
+                publisher = FramePublisher.from_frame(name, frame, slots, source.fps)
+                print(f"帧总线 {name}: {publisher.slots} 个槽位，每个 {publisher.slot_size / 1e6:.2f} MB，"
+                      f"订阅帧源 bus:{name}（按 Ctrl+C 停止）")
+            publisher.publish(frame)
+    except KeyboardInterrupt:
+        print("\n发布已停止")
+    finally:
+        source.stop()
+        if publisher is not None:
+            print(f"发布 {publisher.seq} 帧，平均写入 "
+                  f"{publisher.publish_time / max(publisher.seq, 1) * 1000:.3f} ms/帧")
+            publisher.close()
+
+
+def _consume(kind, name, queue, results, work_ms, duration):
+    """基准测试的订阅进程：kind 为 "bus" 或 "queue"，每帧做 work_ms 毫秒的计算"""
+    latencies = []
+    count = 0
+    dropped = 0
+    read_cpu = 0.0
+    end = time.monotonic() + duration + 5.0
+    if kind == "bus":
+        source = FrameSubscriber(name, mode="every", timeout=1.0)
+        source.start()
+    while time.monotonic() < end:
+        t0 = time.process_time()
+        if kind == "bus":
+            frame = source.read()
+            if frame is None:
+                if count:
+                    break
+                continue
+        else:
+            item = queue.get()
+            if item is None:
+                break
+            frame = Frame(*item)
+        read_cpu += time.process_time() - t0
+        latencies.append(time.monotonic() - frame.timestamp)
+        count += 1
+        # 模拟计算：对深度图求统计量，直到用满 work_ms
+        work_end = time.perf_counter() + work_ms / 1000.0
+        while time.perf_counter() < work_end:
+            float(frame.depth[::4, ::4].mean())
+    if kind == "bus":
+        dropped = source.dropped
+        source.stop()
+    results.put((count, dropped, read_cpu, latencies))
+
+
+def benchmark(consumers=3, duration=5.0, fps=30, work_ms=5.0):
+    """
+    对比两种向多个订阅进程分发帧的方式：共享内存帧总线 vs 每个订阅方一个 multiprocessing.Queue（序列化复制）
+
+    发布方按 fps 输出 640x480 彩色和深度帧，每个订阅进程按顺序处理每一帧并做 work_ms 毫秒的计算
+
+    Args:
+        consumers: 订阅进程数
+        duration: 测试时长（秒）
+        fps: 帧率
+        work_ms: 每帧模拟的计算耗时（毫秒）
+    """
+    import multiprocessing
+
+    from examples.frame_sources import SyntheticDepthSource
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{consumers} 个订阅进程，{fps} fps，640x480 彩色 + 深度，每帧计算 {work_ms:.0f} ms，"
+          f"CPU 核心数 {os.cpu_count()}")
+    for kind in ("bus", "queue"):
+        name = f"bench_{os.getpid()}"
+        results = context.Queue()
+        queues = [context.Queue(maxsize=fps) for _ in range(consumers)] if kind == "queue" else [None] * consumers
+        source = SyntheticDepthSource(fps=fps)
+        source.start()
+        publisher = None
+        if kind == "bus":
+            publisher = FramePublisher.from_frame(name, source.read(), fps=fps)
+        processes = [context.Process(target=_consume, args=(kind, name, q, results, work_ms, duration))
+                     for q in queues]
+        for p in processes:
+            p.start()
+        # 等待订阅进程启动（spawn 需要重新导入模块）
+        time.sleep(2.0)
+        source.start()
+        frames = 0
+        full = 0
+        cpu_start = time.process_time()
+        start_time = time.monotonic()
+        while time.monotonic() - start_time < duration:
+            frame = source.read()
+            if publisher is not None:
+                publisher.publish(Frame(time.monotonic(), frame.color, frame.depth))
+            else:
+                item = (time.monotonic(), frame.color, frame.depth)
+                for q in queues:
+                    try:
+                        q.put_nowait(item)
+                    except Exception:
+                        full += 1
+            frames += 1
+        source.stop()
+        if publisher is None:
+            for q in queues:
+                q.put(None)
+        stats = [results.get() for _ in processes]
+        for p in processes:
+            p.join()
+        # 进程 CPU 时间包含 Queue 后台线程的序列化开销
+        send_cpu = time.process_time() - cpu_start
+        if publisher is not None:
+            publisher.close()
+
+        label = "共享内存帧总线" if kind == "bus" else "multiprocessing.Queue"
+        latencies = np.concatenate([np.array(s[3]) for s in stats]) * 1000
+        received = sum(s[0] for s in stats)
+        dropped = sum(s[1] for s in stats) + full
+        print(f"\n{label}:")
+        print(f"  发布 {frames} 帧，发布进程 CPU {send_cpu / frames * 1000:.3f} ms/帧")
+        print(f"  订阅方共收到 {received}/{frames * consumers} 帧，丢失 {dropped} 帧，"
+              f"取帧 CPU {sum(s[2] for s in stats) / max(received, 1) * 1000:.3f} ms/帧")
+        if len(latencies):
+            print(f"  延迟 中位数 {np.median(latencies):.2f} ms，P99 {np.percentile(latencies, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python frame_bus.py publish [帧源] [名称] [槽位数]  # 发布帧，默认 RealSense、名称 depth")
+        print("  python frame_bus.py watch <名称>  # 订阅并打印帧率和延迟")
+        print("  python frame_bus.py bench [订阅进程数]  # 对比共享内存与 multiprocessing.Queue 的分发开销")
+        print("  帧源可以是 realsense、RTSP 地址、视频文件或 synthetic:thermal；其他程序以 bus:<名称> 作为帧源订阅")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "publish":
+        spec = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != "realsense" else None
+        name = sys.argv[3] if len(sys.argv) > 3 else "depth"
+        slots = int(sys.argv[4]) if len(sys.argv) > 4 else 16
+        publish_source(spec, name, slots)
+    elif command == "watch" and len(sys.argv) > 2:
+        subscriber = FrameSubscriber(sys.argv[2])
+        subscriber.start()
+        latencies = []
+        last_print = time.monotonic()
+        try:
+            while True:
+                frame = subscriber.read()
+                if frame is None:
+                    print("等待发布方...")
+                    continue
+                latencies.append(time.monotonic() - frame.timestamp)
+                if time.monotonic() - last_print >= 1.0:
+                    print(f"{len(latencies) / (time.monotonic() - last_print):5.1f} fps，"
+                          f"延迟 {np.median(latencies) * 1000:.2f} ms，{frame.color.shape}")
+                    latencies = []
+                    last_print = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            subscriber.stop()
+            subscriber.report()
+    elif command == "bench":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    else:
+        print(f"未知命令: {command}")
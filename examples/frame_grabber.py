@@ -0,0 +1,212 @@
+"""
+后台取帧线程
+后台线程持续解码，处理慢时也不会在解码器里积压旧帧:
+    latest 模式只保留最新一帧（实时显示、分析）
+    every 模式按顺序排队每一帧（录制），队列满时丢弃最旧的帧并计数
+"""
+import os
+import sys
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.frame_sources import FrameSource, RTSPSource, open_source
+
+
+class FrameGrabber(FrameSource):
+    """
+    包装另一个帧源，在后台线程中取帧
+
+    本身也是帧源，read() 返回后台线程取到的帧，帧的 timestamp 为原帧源的采集时刻。
+    """
+
+    def __init__(self, source, mode="latest", queue_size=256, stop_timeout=2.0):
+        """
+        Args:
+            source: 被包装的帧源（FrameSource 或 open_source 支持的描述）
+            mode: "latest" 只保留最新帧，"every" 保留每一帧
+            queue_size: every 模式的最大排队帧数
+            stop_timeout: 停止时等待后台线程退出的最长时间（秒）
+        """
+        if mode not in ("latest", "every"):
+            raise ValueError(f"未知模式: {mode}")
+        self.source = open_source(source)
+        self.mode = mode
+        self.stop_timeout = stop_timeout
+        self._frames = deque(maxlen=1 if mode == "latest" else queue_size)
+        self._cond = threading.Condition()
+        self._thread = None
+        # stop() 超时后仍在解码的后台线程，退出时由它自己释放帧源
+        self._lingering = None
+        self._release_on_exit = False
+        self._running = False
+        self._finished = False
+        self._error = None
+        # 统计：后台解码帧数、latest 模式下未被读取就被覆盖的帧数、every 模式下因队列满丢弃的帧数
+        self.decoded = 0
+        self.skipped = 0
+        self.dropped = 0
+
+    @property
+    def live(self):
+        return self.source.live
+
+    def start(self):
+        if self._lingering is not None:
+            # 上次停止时后台线程还没从解码调用中返回，等它释放帧源后再重新启动
+            self._lingering.join()
+            self._lingering = None
+        self._release_on_exit = False
+        self.source.start()
+        self.width = self.source.width
+        self.height = self.source.height
+        self.fps = self.source.fps
+        self._frames.clear()
+        self._finished = False
+        self._error = None
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, name="frame-grabber", daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        try:
+            while self._running:
+                frame = self.source.read()
+                if frame is None:
+                    continue
+                with self._cond:
+                    self.decoded += 1
+                    if len(self._frames) == self._frames.maxlen:
+                        if self.mode == "latest":
+                            self.skipped += 1
+                        else:
+                            self.dropped += 1
+                    self._frames.append(frame)
+                    self._cond.notify_all()
+        except EOFError:
+            pass
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._finished = True
+                release = self._release_on_exit
+                self._cond.notify_all()
+            if release:
+                self.source.stop()
+
+    def read(self, timeout=None):
+        """
+        取下一帧：latest 模式为读取时的最新帧，every 模式为队列中最早的帧
+
+        Args:
+            timeout: 等待超时（秒），None 表示一直等待
+
+        Returns:
+            Frame；超时返回 None。帧源结束且已无帧可读时抛出 EOFError
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames or self._finished, timeout):
+                return None
+            if self._frames:
+                return self._frames.popleft()
+            if self._error is not None:
+                raise EOFError(f"取帧失败: {self._error}")
+            raise EOFError("帧源已结束")
+
+    def stop(self):
+        self._running = False
+        # 被包装的帧源可能在重连退避中等待（ReconnectingSource），先通知它放弃，后台线程才能尽快退出
+        cancel = getattr(self.source, "cancel", None)
+        if cancel is not None:
+            cancel()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            # 后台线程可能阻塞在解码调用中，最多等待 stop_timeout 秒；
+            # 超时时不能在这里释放帧源（如 cap.release()），否则会与仍在进行的解码并发
+            thread.join(self.stop_timeout)
+            with self._cond:
+                if not self._finished:
+                    self._release_on_exit = True
+            if self._release_on_exit:
+                self._lingering = thread
+                print(f"后台取帧线程 {self.stop_timeout} 秒内未退出，帧源将在其返回后释放")
+                return
+        self.source.stop()
+
+    def report(self):
+        """打印取帧统计"""
+        print(f"后台解码 {self.decoded} 帧，覆盖未读 {self.skipped} 帧，队列满丢弃 {self.dropped} 帧")
+
+
+def measure_latency(spec, process_ms=80.0, duration=10.0, grabber=True):
+    """
+    测量端到端延迟：从帧被采集到处理完成的时间
+
+    用 sleep 模拟每帧 process_ms 毫秒的处理耗时。帧的采集时刻来自帧源：
+    回放和合成帧源为模拟相机的理论采集时刻，RTSP 使用流的显示时间戳换算，
+    因此解码器中积压的旧帧会体现为延迟增大。
+
+    Args:
+        spec: 帧源描述，如 "synthetic:thermal"、本地视频文件或本地 RTSP 地址
+        process_ms: 模拟的每帧处理耗时（毫秒）
+        duration: 测量时长（秒）
+        grabber: True 使用后台取帧线程（latest 模式），False 在处理线程中直接读取
+
+    Returns:
+        每帧延迟（秒）的数组
+    """
+    source = open_source(spec, realtime=True, loop=True)
+    if isinstance(source, RTSPSource):
+        source.pts_timestamps = True
+    if grabber:
+        source = FrameGrabber(source, "latest")
+
+    latencies = []
+    source.start()
+    start_time = time.monotonic()
+    try:
+        while time.monotonic() - start_time < duration:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            time.sleep(process_ms / 1000.0)
+            latencies.append(time.monotonic() - frame.timestamp)
+    finally:
+        source.stop()
+    return np.array(latencies)
+
+
+def compare_latency(spec, process_ms=80.0, duration=10.0):
+    """对比直接读取与后台取帧线程的端到端延迟"""
+    print(f"帧源: {spec}，模拟处理耗时 {process_ms:.0f} ms/帧，每种方式 {duration:.0f} 秒")
+    for label, grabber in (("直接读取", False), ("后台取帧", True)):
+        latencies = measure_latency(spec, process_ms, duration, grabber) * 1000
+        if len(latencies) == 0:
+            print(f"  {label}: 没有读到帧")
+            continue
+        print(f"  {label}: 处理 {len(latencies)} 帧，延迟 平均 {latencies.mean():.0f} ms，"
+              f"P95 {np.percentile(latencies, 95):.0f} ms，最大 {latencies.max():.0f} ms，"
+              f"最后一帧 {latencies[-1]:.0f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "latency":
+        print("用法:")
+        print("  python frame_grabber.py latency [帧源] [处理耗时ms] [时长]  # 对比端到端延迟")
+        print("  帧源默认 synthetic:thermal，也可以是本地视频文件或本地 RTSP 地址")
+        sys.exit(1)
+
+    spec = sys.argv[2] if len(sys.argv) > 2 else "synthetic:thermal"
+    process_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 80.0
+    duration = float(sys.argv[4]) if len(sys.argv) > 4 else 10.0
+    compare_latency(spec, process_ms, duration)
@@ -0,0 +1,436 @@
+"""
+帧源抽象
+深度相机和热成像示例统一通过帧源取帧，后端包括 RealSense、RTSP、
+录制文件回放（按原始速度或最快速度）和合成帧生成器，
+没有机器人也能以确定的帧率测量处理代码的吞吐
+"""
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from examples.lazy_imports import require
+
+
+class Frame(NamedTuple):
+    """一帧数据；热成像等单路视频的 depth 为 None"""
+    timestamp: float
+    color: np.ndarray
+    depth: Optional[np.ndarray] = None
+
+
+class FrameSource:
+    """
+    帧源基类
+
+    子类实现 start()/read()/stop()，并在 start() 之后提供 width、height、fps。
+    read() 返回 Frame，暂时取不到帧时返回 None，数据结束时抛出 EOFError。
+    """
+
+    # 实时设备（RealSense、RTSP）为 True，拍照前需要预热
+    live = False
+
+    width = 0
+    height = 0
+    fps = 30
+
+    def start(self):
+        pass
+
+    def read(self) -> Optional[Frame]:
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def __iter__(self):
+        """逐帧迭代直到数据结束"""
+        while True:
+            try:
+                frame = self.read()
+            except EOFError:
+                return
+            if frame is not None:
+                yield frame
+
+
+class _Pacer:
+    """按固定帧率节拍等待，realtime=False 时不等待"""
+
+    def __init__(self, fps, realtime=True):
+        self.interval = 1.0 / fps
+        self.realtime = realtime
+        self._next_time = None
+
+    def reset(self):
+        self._next_time = time.monotonic()
+
+    def wait(self):
+        """
+        等到下一帧的输出时刻
+
+        Returns:
+            这一帧的时间戳：按节拍输出时为模拟相机的理论采集时刻，
+            读取方处理慢导致积压时，积压的帧会带着较早的时间戳返回
+        """
+        if not self.realtime:
+            return time.monotonic()
+        due = self._next_time
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_time += self.interval
+        return due
+
+
+class RealSenseSource(FrameSource):
+    """RealSense 帧源，封装 rs.pipeline 的启动、取帧和停止"""
+
+    live = True
+
+    def __init__(self, width=640, height=480, fps=30, copy=True):
+        """
+        Args:
+            width: 图像宽度
+            height: 图像高度
+            fps: 帧率
+            copy: 是否复制帧数据；帧需要跨线程排队时必须复制，
+                避免 SDK 回收帧缓冲后数据被覆盖
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.copy = copy
+        self._pipeline = None
+        self.profile = None
+
+    def start(self):
+        rs = require("pyrealsense2", "深度相机（RealSense）")
+        self._pipeline = rs.pipeline()
+        config = rs.config()
+        config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+        config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
+        self.profile = self._pipeline.start(config)
+
+    def read(self):
+        frames = self._pipeline.wait_for_frames()
+        color_frame = frames.get_color_frame()
+        depth_frame = frames.get_depth_frame()
+        if not color_frame or not depth_frame:
+            return None
+        color_image = np.asanyarray(color_frame.get_data())
+        depth_image = np.asanyarray(depth_frame.get_data())
+        if self.copy:
+            color_image = color_image.copy()
+            depth_image = depth_image.copy()
+        return Frame(time.monotonic(), color_image, depth_image)
+
+    def stop(self):
+        if self._pipeline is not None:
+            self._pipeline.stop()
+            self._pipeline = None
+
+
+class RTSPSource(FrameSource):
+    """RTSP 视频流帧源（热成像相机）"""
+
+    live = True
+
+    def __init__(self, url, api_preference=None, pts_timestamps=False,
+                 open_timeout=5.0, read_timeout=5.0):
+        """
+        Args:
+            url: RTSP 流地址
+            api_preference: OpenCV 视频后端，默认 cv2.CAP_FFMPEG
+            pts_timestamps: 为 True 时用流的显示时间戳换算帧的采集时刻（以第一帧为基准），
+                解码积压会体现为时间戳落后，用于测量端到端延迟；默认使用读取时刻
+            open_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒），网络断开时 read() 在超时后失败而不是一直阻塞
+        """
+        self.url = url
+        self.api_preference = api_preference
+        self.pts_timestamps = pts_timestamps
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.cap = None
+        self._pts_origin = None
+
+    def start(self):
+        """打开视频流，连接失败时抛出 ConnectionError"""
+        import cv2
+
+        if self.api_preference is None:
+            self.api_preference = cv2.CAP_FFMPEG
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000)]
+        self.cap = cv2.VideoCapture(self.url, self.api_preference, params)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            raise ConnectionError(f"无法连接到 RTSP 流: {self.url}")
+        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS)) or 25
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._pts_origin = None
+
+    def read(self):
+        """读取一帧，读取失败时抛出 EOFError"""
+        ret, frame = self.cap.read()
+        if not ret:
+            raise EOFError("无法读取帧")
+        timestamp = time.monotonic()
+        if self.pts_timestamps:
+            import cv2
+
+            pts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if self._pts_origin is None:
+                self._pts_origin = timestamp - pts
+            timestamp = self._pts_origin + pts
+        return Frame(timestamp, frame)
+
+    def stop(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class VideoFileSource(FrameSource):
+    """视频文件回放帧源，用于回放录制的热成像视频"""
+
+    def __init__(self, filename, realtime=True, loop=False):
+        """
+        Args:
+            filename: 视频文件
+            realtime: True 按文件原始帧率回放，False 尽可能快地回放
+            loop: 播放到结尾后是否从头循环
+        """
+        self.filename = filename
+        self.realtime = realtime
+        self.loop = loop
+        self.cap = None
+        self._pacer = None
+
+    def start(self):
+        import cv2
+
+        self.cap = cv2.VideoCapture(self.filename)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f"无法打开视频文件: {self.filename}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._pacer = _Pacer(self.fps, self.realtime)
+        self._pacer.reset()
+
+    def read(self):
+        timestamp = self._pacer.wait()
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            import cv2
+
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            raise EOFError("视频文件已结束")
+        return Frame(timestamp, frame)
+
+    def stop(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class DepthContainerSource(FrameSource):
+    """
+    无损深度容器（.rdz）回放帧源
+
+    帧数据是内存映射文件上的零拷贝视图；realtime=True 时按录制时的时间间隔回放。
+    """
+
+    def __init__(self, filename, realtime=True, loop=False):
+        """
+        Args:
+            filename: 深度容器文件
+            realtime: True 按原始时间间隔回放，False 尽可能快地回放
+            loop: 播放到结尾后是否从头循环
+        """
+        self.filename = filename
+        self.realtime = realtime
+        self.loop = loop
+        self.reader = None
+        self._index = 0
+        self._start_time = 0.0
+
+    def start(self):
+        from examples.depth_container import DepthContainerReader
+
+        self.reader = DepthContainerReader(self.filename)
+        self.width = self.reader.width
+        self.height = self.reader.height
+        if len(self.reader) > 1:
+            span = self.reader.timestamps[-1] - self.reader.timestamps[0]
+            self.fps = (len(self.reader) - 1) / span if span > 0 else 30
+        self._index = 0
+        self._start_time = time.monotonic()
+
+    def read(self):
+        if self._index >= len(self.reader):
+            if not self.loop or len(self.reader) == 0:
+                raise EOFError("深度容器已结束")
+            self._index = 0
+            self._start_time = time.monotonic()
+        timestamp, depth_image, color_image = self.reader[self._index]
+        due = time.monotonic()
+        if self.realtime:
+            due = self._start_time + (timestamp - self.reader.timestamps[0])
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._index += 1
+        if color_image is None:
+            color_image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        return Frame(due, color_image, depth_image)
+
+    def stop(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class SyntheticDepthSource(FrameSource):
+    """
+    合成深度帧源，按固定帧率输出彩色和深度帧
+    用于在没有 RealSense 的机器上测量持续帧率
+    """
+
+    def __init__(self, width=640, height=480, fps=30, realtime=True, pool_size=8):
+        """
+        Args:
+            width: 图像宽度
+            height: 图像高度
+            fps: 输出帧率
+            realtime: True 时按帧率节拍输出，False 时尽可能快地输出
+            pool_size: 预生成的帧数量，循环使用以免生成开销影响测量
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime
+        rng = np.random.default_rng(0)
+        self._color_pool = [
+            rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            for _ in range(pool_size)
+        ]
+        ramp = np.linspace(300, 6000, width, dtype=np.float32)
+        self._depth_pool = [
+            (np.tile(ramp, (height, 1)) + rng.normal(0, 20, (height, width))).astype(np.uint16)
+            for _ in range(pool_size)
+        ]
+        self._index = 0
+        self._pacer = _Pacer(fps, realtime)
+
+    def start(self):
+        self._index = 0
+        self._pacer.reset()
+
+    def read(self):
+        timestamp = self._pacer.wait()
+        i = self._index % len(self._color_pool)
+        self._index += 1
+        return Frame(timestamp, self._color_pool[i], self._depth_pool[i])
+
+
+class SyntheticThermalSource(FrameSource):
+    """
+    合成热成像帧源
+
+    背景为平滑的温度梯度，叠加若干缓慢移动的热点，输出伪彩色 BGR 图像，
+    与热成像相机 RTSP 流的画面形式一致
+    """
+
+    def __init__(self, width=640, height=512, fps=25, realtime=True, hotspots=3, pool_size=25):
+        """
+        Args:
+            width: 图像宽度
+            height: 图像高度
+            fps: 输出帧率
+            realtime: True 时按帧率节拍输出，False 时尽可能快地输出
+            hotspots: 热点数量
+            pool_size: 预生成的帧数量，循环使用
+        """
+        import cv2
+
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime
+        yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+        background = 60 + 40 * (yy / height)
+        rng = np.random.default_rng(0)
+        centers = rng.uniform(0.2, 0.8, (hotspots, 2)) * (width, height)
+        self._pool = []
+        for i in range(pool_size):
+            image = background.copy()
+            phase = 2 * np.pi * i / pool_size
+            for k, (cx, cy) in enumerate(centers):
+                cx += 20 * np.cos(phase + k)
+                cy += 20 * np.sin(phase + k)
+                image += 150 * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * 15.0 ** 2))
+            gray = np.clip(image, 0, 255).astype(np.uint8)
+            self._pool.append(cv2.applyColorMap(gray, cv2.COLORMAP_INFERNO))
+        self._index = 0
+        self._pacer = _Pacer(fps, realtime)
+
+    def start(self):
+        self._index = 0
+        self._pacer.reset()
+
+    def read(self):
+        timestamp = self._pacer.wait()
+        frame = self._pool[self._index % len(self._pool)]
+        self._index += 1
+        return Frame(timestamp, frame)
+
+
+def open_source(spec, realtime=True, loop=False) -> FrameSource:
+    """
+    按描述字符串创建帧源
+
+    Args:
+        spec: 帧源描述
+            "realsense"                  RealSense 深度相机
+            "rtsp://..."                 RTSP 视频流
+            "synthetic" / "synthetic:depth"  合成深度帧
+            "synthetic:thermal"          合成热成像帧
+            "xxx.rdz"                    无损深度容器回放
+            "bus:<名称>"                 共享内存帧总线，返回复制的帧（零拷贝视图需直接创建 FrameSubscriber）
+            其他路径                     视频文件回放
+        realtime: 回放和合成帧源是否按原始帧率输出
+        loop: 回放帧源是否循环播放
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if spec == "realsense":
+        return RealSenseSource()
+    if spec.startswith(("rtsp://", "rtsps://", "rtmp://", "http://", "https://")):
+        return RTSPSource(spec)
+    if spec in ("synthetic", "synthetic:depth"):
+        return SyntheticDepthSource(realtime=realtime)
+    if spec == "synthetic:thermal":
+        return SyntheticThermalSource(realtime=realtime)
+    if spec.startswith("bus:"):
+        from examples.frame_bus import FrameSubscriber
+
+        # 调用方（FrameGrabber 队列、同步采集的历史、多线程录制）可能长时间持有帧，超过环形缓冲区的寿命
+        return FrameSubscriber(spec[4:], mode="every", copy=True)
+    if spec.endswith(".rdz"):
+        return DepthContainerSource(spec, realtime=realtime, loop=loop)
+    return VideoFileSource(spec, realtime=realtime, loop=loop)
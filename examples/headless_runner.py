@@ -0,0 +1,359 @@
+"""
+无界面运行
+按配置文件启动各传感器的采集任务，每个任务在独立的工作进程中运行，
+进程异常退出后按退避间隔自动重启，并在本机提供一个查询运行状态的 HTTP 接口。
+监控进程本身只导入标准库，cv2、pyrealsense2、pyaudio 等只在启用了对应传感器的工作进程中导入
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 传感器类型和模式对应的入口函数（模块:函数），只在工作进程中导入
+TARGETS = {
+    # record_video / record_resilient 的时长和输出文件名固定，重启后会覆盖之前的文件，无界面录制一律分段
+    ("depth", "record"): "examples.depth_camera_example:record_segments",
+    ("depth", "segment"): "examples.depth_camera_example:record_segments",
+    ("depth", "bus"): "examples.frame_bus:publish_source",
+    ("thermal", "record"): "examples.segmented_writer:record_segments",
+    ("thermal", "segment"): "examples.segmented_writer:record_segments",
+    ("thermal", "analyze"): "examples.thermal_analytics:analyze_stream",
+    ("thermal", "bus"): "examples.frame_bus:publish_source",
+    ("audio", "record"): "examples.streaming_wav:record_stream",
+    ("audio", "voice"): "examples.audio_pipeline:run",
+    ("temp", "store"): "examples.temperature_humidity_store:record",
+}
+
+# 各入口函数在无界面运行时的默认参数，配置中的 args 优先
+DEFAULT_ARGS = {
+    ("thermal", "record"): {"output_dir": "thermal_video", "prefix": "thermal"},
+    # publish_source 默认发布 RealSense 深度相机到 "depth"，热成像任务改用自己的总线名称
+    ("thermal", "bus"): {"name": "thermal"},
+}
+
+# 必须在 args 中给出的参数
+REQUIRED_ARGS = {
+    "thermal": ("source",),
+}
+
+RESTART_POLICIES = ("always", "on-failure", "never")
+
+# 工作进程因缺少依赖库退出时的退出码，重启也无法恢复，不再重启
+EXIT_MISSING_DEPENDENCY = 3
+
+
+def load_config(path):
+    """
+    读取并校验配置文件（JSON）
+
+    {
+        "status": {"host": "127.0.0.1", "port": 8765},
+        "log_dir": "logs",
+        "restart": {"initial_delay": 1, "max_delay": 60, "stable_after": 60},
+        "sensors": [
+            {"name": "thermal", "type": "thermal", "mode": "segment", "enabled": true,
+             "restart": "always", "args": {"source": "rtsp://...", "segment_duration": 300}},
+            ...
+        ]
+    }
+
+    每个传感器用 type + mode 选择 TARGETS 中的入口函数（未给出的参数按 DEFAULT_ARGS 补全），
+    或用 "target": "模块:函数" 直接指定；thermal 任务必须在 args 中给出 source；
+    args 为传给入口函数的参数，字符串中的 {time} 在每次启动时替换为当前时间，
+    避免重启后覆盖之前的输出文件
+
+    Returns:
+        配置字典，缺省项已补全
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    config.setdefault("status", {})
+    config["status"].setdefault("host", "127.0.0.1")
+    config["status"].setdefault("port", 8765)
+    config.setdefault("log_dir", "logs")
+    restart = config.setdefault("restart", {})
+    restart.setdefault("initial_delay", 1.0)
+    restart.setdefault("max_delay", 60.0)
+    restart.setdefault("stable_after", 60.0)
+
+    names = set()
+    for sensor in config.get("sensors", []):
+        name = sensor.get("name") or sensor.get("type")
+        if not name:
+            raise ValueError(f"传感器缺少 name: {sensor}")
+        if name in names:
+            raise ValueError(f"传感器名称重复: {name}")
+        names.add(name)
+        sensor["name"] = name
+        sensor.setdefault("enabled", True)
+        sensor.setdefault("args", {})
+        sensor.setdefault("restart", "always")
+        if sensor["restart"] not in RESTART_POLICIES:
+            raise ValueError(f"{name}: restart 应为 {', '.join(RESTART_POLICIES)} 之一")
+        if "target" not in sensor:
+            key = (sensor.get("type"), sensor.get("mode"))
+            if key not in TARGETS:
+                modes = ", ".join(f"{t}/{m}" for t, m in TARGETS)
+                raise ValueError(f"{name}: 不支持的类型和模式 {key[0]}/{key[1]}，可选: {modes}")
+            sensor["target"] = TARGETS[key]
+            for arg, value in DEFAULT_ARGS.get(key, {}).items():
+                sensor["args"].setdefault(arg, value)
+        for arg in REQUIRED_ARGS.get(sensor.get("type"), ()):
+            if arg not in sensor["args"]:
+                raise ValueError(f"{name}: {sensor.get('type')} 任务的 args 缺少 {arg}")
+        if ":" not in sensor["target"]:
+            raise ValueError(f"{name}: target 应为 \"模块:函数\"")
+    return config
+
+
+def _expand(args, name):
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    return {k: v.format(time=stamp, name=name) if isinstance(v, str) else v for k, v in args.items()}
+
+
+def _worker_main(name, target, args, log_file):
+    """工作进程入口：输出重定向到日志文件，SIGTERM 与 Ctrl+C 一样触发 KeyboardInterrupt 以便收尾"""
+    log = open(log_file, "a", buffering=1, encoding="utf-8")
+    sys.stdout = sys.stderr = log
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] 启动 {name}: {target} {args}")
+    module_name, func_name = target.split(":")
+    try:
+        func = getattr(importlib.import_module(module_name), func_name)
+        func(**args)
+    except KeyboardInterrupt:
+        pass
+    except ModuleNotFoundError as e:
+        from examples.lazy_imports import as_missing_dependency
+
+        error = as_missing_dependency(e)
+        if error is None:
+            raise
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {name} 无法运行: {error}")
+        sys.exit(EXIT_MISSING_DEPENDENCY)
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {name} 退出")
+
+
+class Worker:
+    """一个受监控的工作进程"""
+
+    def __init__(self, sensor, log_dir, restart):
+        self.name = sensor["name"]
+        self.target = sensor["target"]
+        self.args = sensor["args"]
+        self.policy = sensor["restart"]
+        self.log_file = os.path.join(log_dir, f"{self.name}.log")
+        self.initial_delay = restart["initial_delay"]
+        self.max_delay = restart["max_delay"]
+        self.stable_after = restart["stable_after"]
+        self.process = None
+        self.state = "pending"
+        self.restarts = 0
+        self.started_at = None
+        self.last_exit = None
+        self.delay = self.initial_delay
+        self.next_start = 0.0
+
+    def spawn(self, context):
+        self.process = context.Process(target=_worker_main, name=f"worker-{self.name}",
+                                       args=(self.name, self.target, _expand(self.args, self.name),
+                                             self.log_file))
+        self.process.start()
+        self.state = "running"
+        self.started_at = time.monotonic()
+
+    def check(self, context):
+        """检查进程状态，按策略安排重启"""
+        now = time.monotonic()
+        if self.state == "running" and not self.process.is_alive():
+            self.process.join()
+            code = self.process.exitcode
+            self.last_exit = {"code": code, "time": time.time(),
+                              "uptime": now - self.started_at}
+            self.process = None
+            if code == EXIT_MISSING_DEPENDENCY:
+                # 缺少 cv2、pyrealsense2、pyaudio 等库，只停用这一路，其他传感器照常运行
+                self.state = "unavailable"
+                return
+            if self.policy == "never" or (self.policy == "on-failure" and code == 0):
+                self.state = "exited" if code == 0 else "failed"
+                return
+            # 运行足够久才退出，说明之前的故障已恢复，退避间隔从头开始
+            if now - self.started_at >= self.stable_after:
+                self.delay = self.initial_delay
+            self.state = "backoff"
+            self.next_start = now + self.delay
+            self.delay = min(self.delay * 2, self.max_delay)
+        if self.state in ("pending", "backoff") and now >= self.next_start:
+            if self.state == "backoff":
+                self.restarts += 1
+            self.spawn(context)
+
+    def stop(self, grace):
+        """先发送 SIGINT 让任务收尾（写完文件头、关闭分段），超时后强制结束"""
+        if self.process is not None and self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGINT)
+            self.process.join(grace)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(2.0)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.process = None
+        self.state = "stopped"
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            "state": self.state,
+            "pid": self.process.pid if self.process is not None else None,
+            "target": self.target,
+            "uptime": now - self.started_at if self.state == "running" else None,
+            "restarts": self.restarts,
+            "next_start_in": max(0.0, self.next_start - now) if self.state == "backoff" else None,
+            "last_exit": self.last_exit,
+            "log": self.log_file,
+        }
+
+
+class Supervisor:
+    """
+    工作进程监控器
+
+    工作进程使用 spawn 方式创建，不继承监控进程的线程和锁；缺少依赖库的任务标记为 unavailable 且不再重启；
+    GET /status 返回所有任务的状态 JSON，GET /health 在所有启用的任务都在运行时返回 200，否则返回 503
+    """
+
+    def __init__(self, config):
+        """
+        Args:
+            config: load_config() 返回的配置
+        """
+        self.config = config
+        os.makedirs(config["log_dir"], exist_ok=True)
+        self.workers = [Worker(s, config["log_dir"], config["restart"])
+                        for s in config["sensors"] if s["enabled"]]
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = threading.Event()
+        self._server = None
+        self.started_at = time.time()
+
+    def status(self):
+        return {
+            "started_at": self.started_at,
+            "uptime": time.time() - self.started_at,
+            "workers": {w.name: w.status() for w in self.workers},
+        }
+
+    def healthy(self):
+        return all(w.state in ("running", "exited") for w in self.workers)
+
+    def _start_status_server(self):
+        supervisor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") in ("", "/status"):
+                    code, body = 200, supervisor.status()
+                elif self.path.rstrip("/") == "/health":
+                    healthy = supervisor.healthy()
+                    code, body = (200 if healthy else 503), {"healthy": healthy}
+                else:
+                    code, body = 404, {"error": "not found"}
+                payload = json.dumps(body, ensure_ascii=False, indent=2).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        status = self.config["status"]
+        self._server = ThreadingHTTPServer((status["host"], status["port"]), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="status-server", daemon=True).start()
+
+    def run(self, poll_interval=0.5, grace=10.0):
+        """
+        启动所有任务并持续监控，直到收到 SIGINT / SIGTERM 或调用 stop()
+
+        Args:
+            poll_interval: 检查工作进程的间隔（秒）
+            grace: 停止时等待任务收尾的最长时间（秒）
+        """
+        previous = {sig: signal.signal(sig, lambda *_: self._stop.set())
+                    for sig in (signal.SIGINT, signal.SIGTERM)}
+        self._start_status_server()
+        host, port = self._server.server_address[:2]
+        print(f"状态接口: http://{host}:{port}/status")
+        try:
+            while not self._stop.is_set():
+                for worker in self.workers:
+                    state = worker.state
+                    worker.check(self._context)
+                    if worker.state != state:
+                        print(f"[{time.strftime('%H:%M:%S')}] {worker.name}: {state} -> {worker.state}"
+                              + (f"（退出码 {worker.last_exit['code']}）" if state == "running" else ""))
+                self._stop.wait(poll_interval)
+        finally:
+            print("正在停止所有任务...")
+            for worker in self.workers:
+                worker.stop(grace)
+            self._server.shutdown()
+            self._server.server_close()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    def stop(self):
+        self._stop.set()
+
+
+def run_config(path):
+    """按配置文件运行，直到收到 SIGINT / SIGTERM"""
+    config = load_config(path)
+    supervisor = Supervisor(config)
+    if not supervisor.workers:
+        print("配置中没有启用的传感器")
+        return
+    print(f"启用的任务: {', '.join(w.name for w in supervisor.workers)}")
+    supervisor.run()
+
+
+def check_config(path):
+    """校验配置文件并打印将要启动的任务"""
+    config = load_config(path)
+    print(f"状态接口: http://{config['status']['host']}:{config['status']['port']}/status")
+    for sensor in config["sensors"]:
+        flag = "启用" if sensor["enabled"] else "停用"
+        print(f"  [{flag}] {sensor['name']}: {sensor['target']}  重启策略 {sensor['restart']}  参数 {sensor['args']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法:")
+        print("  python headless_runner.py run <配置文件>  # 按配置启动并监控采集任务")
+        print("  python headless_runner.py check <配置文件>  # 校验配置并列出任务")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "run":
+        run_config(sys.argv[2])
+    elif command == "check":
+        check_config(sys.argv[2])
+    else:
+        print(f"未知命令: {command}")
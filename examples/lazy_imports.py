@@ -0,0 +1,91 @@
+"""
+可选依赖的延迟导入
+numpy、cv2、pyrealsense2、pyaudio、requests 导入耗时较长，在机器人的 ARM 板上合计可达数秒，
+且 pyrealsense2、pyaudio 依赖具体硬件的驱动，不一定安装。各示例只在真正用到时才导入它们，
+缺少时抛出带安装提示的 MissingDependencyError，由调用方提示后跳过该功能而不是整个程序崩溃。
+本模块只使用标准库
+"""
+import importlib
+import importlib.util
+
+# 模块名 -> 安装方式
+INSTALL_HINTS = {
+    "numpy": "uv add numpy",
+    "cv2": "uv add opencv-python",
+    "pyrealsense2": "uv add pyrealsense2（ARM 板上需要从源码编译 librealsense 并开启 Python 绑定）",
+    "pyaudio": "sudo apt install portaudio19-dev && uv add pyaudio",
+    "requests": "uv add requests",
+}
+
+
+class MissingDependencyError(ModuleNotFoundError):
+    """缺少可选依赖；feature 为需要该依赖的功能，message 中带有安装提示"""
+
+    def __init__(self, module, feature=None):
+        self.module = module
+        self.feature = feature
+        message = f"未安装 {module}"
+        if feature:
+            message += f"，无法使用{feature}"
+        hint = INSTALL_HINTS.get(module)
+        if hint:
+            message += f"。安装: {hint}"
+        super().__init__(message, name=module)
+
+
+def require(module, feature=None):
+    """
+    导入模块，未安装时抛出 MissingDependencyError
+
+    Args:
+        module: 模块名，如 "pyaudio"
+        feature: 需要该模块的功能，用于错误提示，如 "麦克风和扬声器"
+
+    Returns:
+        导入的模块
+    """
+    try:
+        return importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        # 只处理模块本身不存在的情况，模块内部导入失败（如缺少系统动态库）照常抛出
+        if e.name != module:
+            raise
+        raise MissingDependencyError(module, feature) from None
+
+
+def as_missing_dependency(error):
+    """
+    把第三方库导入失败的 ModuleNotFoundError 转换为带安装提示的 MissingDependencyError
+
+    Args:
+        error: 捕获的 ModuleNotFoundError
+
+    Returns:
+        MissingDependencyError；不是 INSTALL_HINTS 中的库（如项目自身的模块）时返回 None
+    """
+    if isinstance(error, MissingDependencyError):
+        return error
+    if error.name in INSTALL_HINTS:
+        return MissingDependencyError(error.name)
+    return None
+
+
+def available(module):
+    """
+    检查模块是否已安装，只查找不导入，几乎没有耗时
+
+    Args:
+        module: 模块名
+
+    Returns:
+        已安装返回 True
+    """
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def missing(*modules):
+    """返回未安装的模块名列表"""
+    return [m for m in modules if not available(m)]
@@ -0,0 +1,503 @@
+"""
+HTTP 实时预览
+机器人没有显示器，通过 SSH X 转发使用 cv2.imshow 帧率很低。预览服务器把画面以 MJPEG 通过 HTTP 推送，
+浏览器打开 http://<机器人地址>:8080/ 即可查看。
+
+采集线程调用 publish() 只做限速判断和一次复制，缩放和 JPEG 编码在单独的低优先级线程中完成，
+每帧对每个有人观看的画质只编码一次，所有客户端共享同一份 JPEG 数据；
+每个客户端始终取最新的一帧发送，网络慢的客户端跳过中间帧，不会反过来阻塞采集
+"""
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 画质名称 -> JPEG 质量
+DEFAULT_QUALITIES = {"low": 50, "high": 80}
+
+BOUNDARY = "frame"
+
+# 每个流连接的发送缓冲区（字节），约为几帧预览 JPEG 的大小
+SEND_BUFFER = 128 * 1024
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{margin:0;background:#111;color:#ccc;font-family:sans-serif}}img{{max-width:100%}}
+a{{color:#8cf;margin-right:1em}}</style></head>
+<body><div>{links}<a href="/stats">统计</a></div><img src="/stream?quality={default}"></body></html>
+"""
+
+
+DEFAULT_ADDRESS = "0.0.0.0:8080"
+
+
+def has_display():
+    """是否有可用的图形界面（Linux 上没有 DISPLAY / WAYLAND_DISPLAY 时 cv2.imshow 无法使用）"""
+    if not sys.platform.startswith("linux"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def preview_address(argv):
+    """
+    从命令行参数中取出 --preview [地址]
+
+    Returns:
+        地址字符串，未指定时返回 None；省略地址时为 DEFAULT_ADDRESS
+    """
+    if "--preview" not in argv:
+        return None
+    i = argv.index("--preview")
+    del argv[i]
+    if i < len(argv) and re.fullmatch(r"([\w.\-]*:)?\d+", argv[i]):
+        return argv.pop(i)
+    return DEFAULT_ADDRESS
+
+
+def parse_address(address, default_port=8080):
+    """"主机:端口"、":端口" 或 "端口" → (主机, 端口)，主机默认 0.0.0.0"""
+    address = str(address)
+    host, _, port = address.rpartition(":") if ":" in address else ("", "", address)
+    return host or "0.0.0.0", int(port or default_port)
+
+
+class PreviewServer:
+    """
+    MJPEG 预览服务器
+
+    接口:
+        /                       预览页面
+        /stream?quality=low     MJPEG 流（multipart/x-mixed-replace）
+        /snapshot.jpg?quality=  最新一帧 JPEG
+        /stats                  统计（JSON）
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, max_fps=10, max_width=640, qualities=None,
+                 max_clients=8, title="实时预览", nice=10):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            max_fps: 预览最高帧率，publish() 超出该帧率的调用直接返回
+            max_width: 预览图像最大宽度（像素），更宽时等比缩小；None 表示不缩放
+            qualities: {画质名称: JPEG 质量}，默认 low=50、high=80
+            max_clients: 同时观看的最大客户端数
+            title: 页面标题
+            nice: 编码线程的 nice 增量（仅 Linux 按线程生效），让出 CPU 给采集和录制
+        """
+        self.address = (host, port)
+        self.max_fps = max_fps
+        self.max_width = max_width
+        self.qualities = dict(qualities or DEFAULT_QUALITIES)
+        self.max_clients = max_clients
+        self.title = title
+        self.nice = nice
+        self._interval = 1.0 / max_fps if max_fps else 0.0
+        # 下一帧预览的计划时刻，按预览帧间隔递推，采集帧率不是预览帧率的整数倍时平均帧率也不偏低
+        self._next_publish = 0.0
+        self._pending = None
+        self._cond = threading.Condition()
+        # {画质名称: (帧序号, JPEG 数据)}
+        self._jpeg = {}
+        self._seq = 0
+        # {画质名称: 正在观看的客户端数}
+        self._viewers = dict.fromkeys(self.qualities, 0)
+        self._stop = threading.Event()
+        self._server = None
+        self._encoder = None
+        self.published = 0
+        self.skipped_rate = 0
+        self.encoded = dict.fromkeys(self.qualities, 0)
+        self.encode_time = 0.0
+        self.sent = 0
+        self.skipped_slow = 0
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2] if self._server else self.address
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}/"
+
+    @property
+    def clients(self):
+        return sum(self._viewers.values())
+
+    def start(self):
+        """启动 HTTP 服务和编码线程"""
+        self._stop.clear()
+        self._server = ThreadingHTTPServer(self.address, self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="preview-http", daemon=True).start()
+        self._encoder = threading.Thread(target=self._encode_loop, name="preview-encoder", daemon=True)
+        self._encoder.start()
+        print(f"实时预览: {self.url}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._encoder is not None:
+            self._encoder.join(timeout=2.0)
+            self._encoder = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def ready(self):
+        """
+        是否需要新的预览帧（有客户端且距上一帧已超过预览帧间隔）
+
+        生成预览图像本身有开销（如深度伪彩色）时，先调用 ready() 判断，不需要时连图像都不生成
+        """
+        return bool(self.clients) and time.monotonic() >= self._next_publish
+
+    def publish(self, *images):
+        """
+        提交一帧预览画面，立即返回
+
+        没有客户端或超出预览帧率时什么都不做；否则复制图像交给编码线程，
+        多个图像（如彩色和深度伪彩色）在编码线程中缩放到同一高度后横向拼接
+
+        Args:
+            images: 一个或多个 BGR 图像，调用返回后可以继续复用其缓冲区
+        """
+        if not self.clients:
+            return
+        now = time.monotonic()
+        if now < self._next_publish:
+            self.skipped_rate += 1
+            return
+        self._next_publish += self._interval
+        if self._next_publish <= now:
+            # 刚有客户端连上或采集停顿过，从现在重新开始计时，不补发落下的帧
+            self._next_publish = now + self._interval
+        # 采集端的缓冲区可能被复用（如 RealSense 不复制的帧、伪彩色的输出缓冲区），必须复制
+        frame = [image.copy() for image in images]
+        with self._cond:
+            self._pending = frame
+            self.published += 1
+            self._cond.notify_all()
+
+    def _compose(self, images):
+        """缩放并拼接为一个预览图像（编码线程中调用）"""
+        import cv2
+        import numpy as np
+
+        height = min(image.shape[0] for image in images)
+        scaled = []
+        for image in images:
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            if image.shape[0] != height:
+                width = round(image.shape[1] * height / image.shape[0])
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            scaled.append(image)
+        image = scaled[0] if len(scaled) == 1 else np.hstack(scaled)
+        if self.max_width and image.shape[1] > self.max_width:
+            height = round(image.shape[0] * self.max_width / image.shape[1])
+            image = cv2.resize(image, (self.max_width, height), interpolation=cv2.INTER_AREA)
+        return image
+
+    def _encode_loop(self):
+        import cv2
+
+        if self.nice and hasattr(os, "setpriority") and hasattr(threading, "get_native_id"):
+            try:
+                # Linux 上 PRIO_PROCESS 配合线程 ID 只调整本线程的优先级
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(),
+                               os.getpriority(os.PRIO_PROCESS, 0) + self.nice)
+            except OSError:
+                pass
+        while not self._stop.is_set():
+            with self._cond:
+                while self._pending is None and not self._stop.is_set():
+                    self._cond.wait()
+                images, self._pending = self._pending, None
+                watched = [name for name, count in self._viewers.items() if count]
+            if images is None:
+                break
+            t0 = time.perf_counter()
+            image = self._compose(images)
+            # 每个有人观看的画质只编码一次，由所有客户端共享
+            encoded = {}
+            for name in watched:
+                ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.qualities[name]])
+                if ok:
+                    encoded[name] = data.tobytes()
+                    self.encoded[name] += 1
+            self.encode_time += time.perf_counter() - t0
+            with self._cond:
+                self._seq += 1
+                for name, data in encoded.items():
+                    self._jpeg[name] = (self._seq, data)
+                self._cond.notify_all()
+
+    def _wait_frame(self, quality, last_seq, timeout=1.0):
+        """等待比 last_seq 新的一帧，返回 (帧序号, JPEG)；超时或停止时返回 None"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._stop.is_set():
+                seq, data = self._jpeg.get(quality, (0, None))
+                if seq > last_seq:
+                    return seq, data
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        return None
+
+    def _watch(self, quality, delta):
+        with self._cond:
+            self._viewers[quality] += delta
+            if delta < 0 and not self._viewers[quality]:
+                # 没有人观看的画质不再保留旧帧，重新观看时不会先看到过时的画面
+                self._jpeg.pop(quality, None)
+
+    def stats(self):
+        return {
+            "clients": dict(self._viewers),
+            "published": self.published,
+            "skipped_rate_limit": self.skipped_rate,
+            "encoded": dict(self.encoded),
+            "encode_ms": round(self.encode_time / max(sum(self.encoded.values()), 1) * 1000, 2),
+            "sent": self.sent,
+            "skipped_slow_clients": self.skipped_slow,
+            "max_fps": self.max_fps,
+            "max_width": self.max_width,
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                quality = params.get("quality", [next(iter(server.qualities))])[0]
+                if url.path == "/":
+                    self._page()
+                elif url.path == "/stats":
+                    self._send(200, "application/json; charset=utf-8",
+                               json.dumps(server.stats(), ensure_ascii=False, indent=2).encode("utf-8"))
+                elif quality not in server.qualities:
+                    self._send(404, "text/plain; charset=utf-8",
+                               f"画质可选: {', '.join(server.qualities)}".encode("utf-8"))
+                elif url.path in ("/stream", "/snapshot.jpg"):
+                    if server.clients >= server.max_clients:
+                        self._send(503, "text/plain; charset=utf-8", "观看人数已满".encode("utf-8"))
+                        return
+                    server._watch(quality, 1)
+                    try:
+                        if url.path == "/stream":
+                            self._stream(quality)
+                        else:
+                            self._snapshot(quality)
+                    except OSError:
+                        # 客户端断开或写入超时
+                        pass
+                    finally:
+                        server._watch(quality, -1)
+                else:
+                    self._send(404, "text/plain; charset=utf-8", b"not found")
+
+            def _send(self, code, content_type, payload):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _page(self):
+                links = "".join(f'<a href="/stream?quality={q}">{q}</a>' for q in server.qualities)
+                page = PAGE.format(title=server.title, links=links, default=next(iter(server.qualities)))
+                self._send(200, "text/html; charset=utf-8", page.encode("utf-8"))
+
+            def _snapshot(self, quality):
+                frame = server._wait_frame(quality, 0, timeout=3.0)
+                if frame is None:
+                    self._send(503, "text/plain; charset=utf-8", "暂无画面".encode("utf-8"))
+                else:
+                    self._send(200, "image/jpeg", frame[1])
+
+            def _stream(self, quality):
+                # 网络卡住的客户端写入超时后断开，不会一直占用线程
+                self.connection.settimeout(10.0)
+                # 限制发送缓冲区：否则内核缓冲区可以积压数秒的旧帧，慢客户端看到的画面越来越滞后；
+                # 缓冲区满时 write() 阻塞，期间的新帧被跳过，之后直接发送最新一帧
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                last_seq = 0
+                while not server._stop.is_set():
+                    frame = server._wait_frame(quality, last_seq)
+                    if frame is None:
+                        continue
+                    seq, data = frame
+                    if last_seq:
+                        # 发送上一帧期间产生的帧被跳过
+                        server.skipped_slow += seq - last_seq - 1
+                    last_seq = seq
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                     f"Content-Length: {len(data)}\r\n\r\n".encode("ascii"))
+                    self.wfile.write(data)
+                    self.wfile.write(b"\r\n")
+                    server.sent += 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def serve_source(source, address=DEFAULT_ADDRESS, duration=None, **options):
+    """
+    从帧源持续取帧并推送到预览服务器（含深度的帧源同时显示彩色和深度伪彩色）
+
+    Args:
+        source: 帧源（FrameSource 或 open_source 支持的描述）
+        address: 监听地址 "主机:端口"
+        duration: 运行时长（秒），None 表示直到 Ctrl+C
+        options: PreviewServer 的其他参数，如 max_fps、max_width
+    """
+    from examples.depth_colormap import DepthColorizer
+    from examples.frame_sources import open_source
+
+    source = open_source(source)
+    host, port = parse_address(address)
+    colorizer = DepthColorizer()
+    source.start()
+    start_time = time.monotonic()
+    with PreviewServer(host, port, **options) as server:
+        try:
+            while duration is None or time.monotonic() - start_time < duration:
+                try:
+                    frame = source.read()
+                except EOFError:
+                    break
+                if frame is None:
+                    continue
+                if not server.ready():
+                    continue
+                if frame.depth is not None:
+                    server.publish(frame.color, colorizer.apply(frame.depth))
+                else:
+                    server.publish(frame.color)
+        except KeyboardInterrupt:
+            print("\n预览已停止")
+        finally:
+            source.stop()
+        print(json.dumps(server.stats(), ensure_ascii=False))
+
+
+def benchmark(clients=3, slow_clients=1, duration=5.0, fps=30):
+    """
+    测量预览对采集线程的开销：合成帧源按 fps 输出，若干正常客户端和每读一帧停顿 0.5 秒的慢客户端
+
+    Args:
+        clients: 正常客户端数
+        slow_clients: 慢客户端数
+        duration: 测试时长（秒）
+        fps: 帧源帧率
+    """
+    import urllib.request
+
+    from examples.depth_colormap import DepthColorizer
+    from examples.frame_sources import SyntheticDepthSource
+
+    def reader(url, delay, counts, index, stop):
+        # 按 multipart 各部分的 Content-Length 逐帧读取，慢客户端每帧之后停顿 delay 秒
+        with urllib.request.urlopen(url) as response:
+            while not stop.is_set():
+                line = response.readline()
+                if not line:
+                    break
+                if line.lower().startswith(b"content-length"):
+                    length = int(line.split(b":")[1])
+                    response.readline()
+                    response.read(length)
+                    counts[index] += 1
+                    if delay:
+                        time.sleep(delay)
+
+    source = SyntheticDepthSource(fps=fps)
+    colorizer = DepthColorizer()
+    with PreviewServer("127.0.0.1", 0, max_fps=15) as server:
+        stop = threading.Event()
+        counts = [0] * (clients + slow_clients)
+        threads = []
+        for i in range(clients + slow_clients):
+            quality = "high" if i % 2 else "low"
+            delay = 0.5 if i >= clients else 0
+            t = threading.Thread(target=reader, args=(f"{server.url}stream?quality={quality}", delay, counts, i, stop),
+                                 daemon=True)
+            t.start()
+            threads.append(t)
+        time.sleep(0.3)
+
+        source.start()
+        publish_times = []
+        start_time = time.monotonic()
+        frames = 0
+        while time.monotonic() - start_time < duration:
+            frame = source.read()
+            frames += 1
+            if not server.ready():
+                continue
+            depth_colormap = colorizer.apply(frame.depth)
+            t0 = time.perf_counter()
+            server.publish(frame.color, depth_colormap)
+            publish_times.append(time.perf_counter() - t0)
+        elapsed = time.monotonic() - start_time
+        source.stop()
+        stats = server.stats()
+        stop.set()
+
+    publish_times.sort()
+    print(f"采集 {frames} 帧，{frames / elapsed:.1f} fps（帧源 {fps} fps）")
+    print(f"publish() 平均 {sum(publish_times) / len(publish_times) * 1000:.3f} ms，"
+          f"最长 {publish_times[-1] * 1000:.2f} ms")
+    print(f"预览帧 {stats['published']}（限速 {stats['max_fps']} fps），编码 {stats['encoded']}，"
+          f"单次编码 {stats['encode_ms']} ms")
+    for i, count in enumerate(counts):
+        kind = "慢客户端" if i >= clients else "客户端"
+        print(f"  {kind} {i}: 收到 {count} 帧")
+    print(f"慢客户端跳过 {stats['skipped_slow_clients']} 帧")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python preview_server.py serve <帧源> [主机:端口] [最高帧率] [最大宽度]  # 推送帧源画面，默认 0.0.0.0:8080、10 fps、640")
+        print("  python preview_server.py bench  # 测量预览对采集的开销和慢客户端跳帧")
+        print("  帧源可以是 RTSP 地址、视频文件、depth_raw.rdz、synthetic 或 synthetic:thermal")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "serve" and len(sys.argv) > 2:
+        address = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_ADDRESS
+        max_fps = float(sys.argv[4]) if len(sys.argv) > 4 else 10
+        max_width = int(sys.argv[5]) if len(sys.argv) > 5 else 640
+        serve_source(sys.argv[2], address, max_fps=max_fps, max_width=max_width)
+    elif command == "bench":
+        benchmark()
+    else:
+        print(f"未知命令: {command}")
@@ -0,0 +1,381 @@
+"""
+断线自动重连录制
+RTSP 流中断时按指数退避重新打开，继续写入同一个文件或切换到新的分段文件，
+每次中断记录起止时间、时长和重连尝试次数，录制结束后写入 JSON 报告
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+import cv2
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.frame_grabber import FrameGrabber
+from examples.frame_sources import FrameSource, open_source
+from examples.video_encoder import get_encoder
+
+
+@dataclass
+class Gap:
+    """一次中断"""
+    start: float
+    end: float
+    reason: str
+    attempts: int
+    # 停止时仍未恢复的中断为 False，end 为停止时刻
+    resolved: bool = True
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class ReconnectingSource(FrameSource):
+    """
+    自动重连帧源
+
+    包装另一个帧源，读取失败（EOFError、ConnectionError 等）时停止它，
+    按 initial_delay、initial_delay*factor... 的间隔重新 start()，最长间隔 max_delay。
+    重连期间 read() 阻塞，重连成功后继续返回新连接的帧。
+    """
+
+    def __init__(self, source, initial_delay=0.5, max_delay=30.0, factor=2.0,
+                 max_attempts=None, verbose=True):
+        """
+        Args:
+            source: 被包装的帧源（FrameSource 或 open_source 支持的描述）
+            initial_delay: 第一次重连前的等待时间（秒）
+            max_delay: 最长重连间隔（秒）
+            factor: 每次失败后间隔的放大倍数
+            max_attempts: 单次中断的最大重连次数，None 表示一直重试
+            verbose: 是否打印中断和重连日志
+        """
+        self.source = open_source(source)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.max_attempts = max_attempts
+        self.verbose = verbose
+        self.gaps: List[Gap] = []
+        self._stop_event = threading.Event()
+        # 正在进行的中断 [开始时刻, 原因, 已尝试次数]，由重连线程和 cancel() 共同访问
+        self._outage = None
+        self._lock = threading.Lock()
+        # 当前退避间隔，重连后要真正读到帧才恢复为 initial_delay，
+        # 避免“能连上但立即断开”的流以最短间隔反复重连
+        self._delay = initial_delay
+
+    @property
+    def live(self):
+        return self.source.live
+
+    def start(self):
+        """首次连接，失败时直接抛出异常"""
+        self._stop_event.clear()
+        self.source.start()
+        self._sync_properties()
+
+    def _sync_properties(self):
+        self.width = self.source.width
+        self.height = self.source.height
+        self.fps = self.source.fps
+
+    def read(self):
+        try:
+            frame = self.source.read()
+        except (EOFError, ConnectionError, OSError, cv2.error) as e:
+            if self._stop_event.is_set():
+                raise EOFError("帧源已停止")
+            self._reconnect(str(e) or type(e).__name__)
+            return None
+        if frame is not None:
+            self._delay = self.initial_delay
+        return frame
+
+    def _reconnect(self, reason):
+        gap_start = time.monotonic()
+        if self.verbose:
+            print(f"流中断: {reason}，开始重连...")
+        self.source.stop()
+        with self._lock:
+            self._outage = [gap_start, reason, 0]
+
+        delay = self._delay
+        attempts = 0
+        # 用事件等待代替 sleep，cancel() / stop() 时立即结束退避等待
+        while not self._stop_event.wait(delay):
+            attempts += 1
+            with self._lock:
+                self._outage[2] = attempts
+            try:
+                self.source.start()
+                break
+            except (ConnectionError, FileNotFoundError, OSError, cv2.error) as e:
+                if self.verbose:
+                    print(f"  第 {attempts} 次重连失败: {e}，{min(delay * self.factor, self.max_delay):.1f} 秒后重试")
+                if self.max_attempts is not None and attempts >= self.max_attempts:
+                    raise EOFError(f"重连 {attempts} 次均失败") from e
+                delay = min(delay * self.factor, self.max_delay)
+        if self._stop_event.is_set():
+            # 未恢复的中断已由 cancel() 记录
+            raise EOFError("帧源已停止")
+
+        self._delay = min(delay * self.factor, self.max_delay)
+        gap = Gap(gap_start, time.monotonic(), reason, attempts)
+        with self._lock:
+            self._outage = None
+            self.gaps.append(gap)
+        self._sync_properties()
+        if self.verbose:
+            print(f"重连成功，中断 {gap.duration:.2f} 秒，尝试 {attempts} 次")
+
+    def cancel(self):
+        """
+        停止重连：结束退避等待，不再重新 start()，进行中的中断记为未恢复
+
+        只设置标志，不释放内层帧源，可以在其他线程阻塞在 read() 中时调用（FrameGrabber.stop() 会先调用它）
+        """
+        self._stop_event.set()
+        with self._lock:
+            if self._outage is not None:
+                start, reason, attempts = self._outage
+                self.gaps.append(Gap(start, time.monotonic(), reason, attempts, resolved=False))
+                self._outage = None
+
+    def stop(self):
+        self.cancel()
+        self.source.stop()
+
+
+class FlakySource(FrameSource):
+    """
+    按计划断开的帧源，用于无网络环境下测试重连
+
+    每运行 up_time 秒断开一次（read() 抛出 EOFError），随后 down_time 秒内 start() 失败。
+    """
+
+    def __init__(self, source, up_time=3.0, down_time=2.0):
+        """
+        Args:
+            source: 被包装的帧源
+            up_time: 每次连接后正常运行的时长（秒）
+            down_time: 断开后拒绝连接的时长（秒）
+        """
+        self.source = open_source(source)
+        self.up_time = up_time
+        self.down_time = down_time
+        self._connected_at = 0.0
+        self._down_until = 0.0
+
+    def start(self):
+        if time.monotonic() < self._down_until:
+            raise ConnectionError("模拟的服务器不可用")
+        self.source.start()
+        self.width = self.source.width
+        self.height = self.source.height
+        self.fps = self.source.fps
+        self._connected_at = time.monotonic()
+
+    def read(self):
+        now = time.monotonic()
+        if now - self._connected_at > self.up_time:
+            self._down_until = now + self.down_time
+            raise EOFError("模拟的连接断开")
+        return self.source.read()
+
+    def stop(self):
+        self.source.stop()
+
+
+@dataclass
+class RecordingReport:
+    """断线重连录制报告"""
+    segments: List[dict] = field(default_factory=list)
+    gaps: List[dict] = field(default_factory=list)
+    frames: int = 0
+    elapsed: float = 0.0
+
+    def print(self):
+        total_gap = sum(g["duration"] for g in self.gaps)
+        print(f"录制 {self.elapsed:.1f} 秒，共 {self.frames} 帧，{len(self.segments)} 个文件")
+        print(f"中断 {len(self.gaps)} 次，累计 {total_gap:.2f} 秒")
+        for i, gap in enumerate(self.gaps, 1):
+            state = "" if gap["resolved"] else "，录制结束时仍未恢复"
+            print(f"  中断 {i}: {gap['offset']:.1f} 秒处，持续 {gap['duration']:.2f} 秒，"
+                  f"重连 {gap['attempts']} 次，原因: {gap['reason']}{state}")
+        for seg in self.segments:
+            print(f"  {seg['file']}: {seg['frames']} 帧")
+
+
+def _segment_name(output_file, index):
+    if index == 0:
+        return output_file
+    base, ext = os.path.splitext(output_file)
+    return f"{base}_{index:03d}{ext}"
+
+
+def record_resilient(source, output_file="thermal_video.mp4", duration=10, roll_segments=False,
+                     initial_delay=0.5, max_delay=30.0, report_file=None, encoder="auto"):
+    """
+    断线自动重连录制
+
+    Args:
+        source: 帧源（FrameSource 或 open_source 支持的描述，如 RTSP 地址）
+        output_file: 输出文件名；分段时后续文件名为 xxx_001.mp4、xxx_002.mp4...
+        duration: 录制时长（秒），包含中断时间；None 表示一直录制到按 Ctrl+C
+        roll_segments: True 每次重连后切换到新文件；False 继续写入同一文件
+            （重连后分辨率变化时总会切换到新文件）
+        initial_delay: 第一次重连前的等待时间（秒）
+        max_delay: 最长重连间隔（秒）
+        report_file: 中断报告 JSON 文件，默认为输出文件名加 .gaps.json
+        encoder: 视频编码描述（见 video_encoder），默认自动选择
+
+    Returns:
+        RecordingReport；首次连接失败时返回 None
+    """
+    reconnecting = ReconnectingSource(source, initial_delay, max_delay)
+    grabber = FrameGrabber(reconnecting, "every")
+    try:
+        # 首次连接失败直接报错，只有连接建立后的中断才自动重连
+        grabber.start()
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"错误: {e}")
+        return None
+
+    report = RecordingReport()
+    encoder = get_encoder(encoder)
+    writer = None
+    segment = None
+    handled_gaps = 0
+    start_time = time.monotonic()
+
+    def open_segment():
+        seg = {"file": _segment_name(output_file, len(report.segments)),
+               "width": grabber.width, "height": grabber.height, "frames": 0}
+        report.segments.append(seg)
+        return seg, encoder.open(seg["file"], int(grabber.fps) or 25, (seg["width"], seg["height"]))
+
+    if duration is None:
+        print("开始录制（断线自动重连，按 Ctrl+C 停止）...")
+    else:
+        print(f"开始录制 {duration} 秒（断线自动重连）...")
+    try:
+        while duration is None or time.monotonic() - start_time < duration:
+            try:
+                frame = grabber.read(timeout=0.5)
+            except EOFError:
+                print("警告: 帧源已结束")
+                break
+            if frame is None:
+                continue
+
+            # 帧按顺序排队，时间戳晚于某次中断结束的帧才属于重连之后
+            new_gap = False
+            while handled_gaps < len(reconnecting.gaps) and \
+                    frame.timestamp >= reconnecting.gaps[handled_gaps].end:
+                handled_gaps += 1
+                new_gap = True
+            height, width = frame.color.shape[:2]
+            if writer is None or (new_gap and roll_segments) or \
+                    (segment["width"], segment["height"]) != (width, height):
+                if writer is not None:
+                    writer.release()
+                segment, writer = open_segment()
+
+            writer.write(frame.color)
+            segment["frames"] += 1
+            report.frames += 1
+    except KeyboardInterrupt:
+        print("\n录制被中断")
+    finally:
+        grabber.stop()
+        if writer is not None:
+            writer.release()
+
+    report.elapsed = time.monotonic() - start_time
+    report.gaps = [
+        dict(asdict(g), duration=g.duration, offset=g.start - start_time) for g in reconnecting.gaps
+    ]
+    report_file = report_file or os.path.splitext(output_file)[0] + ".gaps.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(asdict(report), f, ensure_ascii=False, indent=2)
+    report.print()
+    print(f"中断报告已保存: {report_file}")
+    return report
+
+
+def chaos_test(video_file, duration=30, kill_every=8.0, down_time=3.0, port=8554):
+    """
+    用本地流服务器测试断线重连：ffmpeg 循环推送视频文件，定期杀掉并重启
+
+    服务器使用 ffmpeg 的 HTTP 监听模式输出 MPEG-TS（不依赖额外的 RTSP 服务器），
+    OpenCV 读取方式与 RTSP 相同，都走 FFmpeg 后端
+
+    Args:
+        video_file: 推送的视频文件
+        duration: 测试时长（秒）
+        kill_every: 每次启动后服务器运行多久被杀掉（秒）
+        down_time: 杀掉后多久重启（秒）
+        port: 本地端口
+    """
+    url = f"http://127.0.0.1:{port}/stream.ts"
+    command = ["ffmpeg", "-loglevel", "error", "-re", "-stream_loop", "-1", "-i", video_file,
+               "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+               "-f", "mpegts", "-listen", "1", url]
+    stop_event = threading.Event()
+
+    def server_loop():
+        while not stop_event.is_set():
+            proc = subprocess.Popen(command)
+            stop_event.wait(kill_every)
+            proc.send_signal(signal.SIGKILL)
+            proc.wait()
+            if not stop_event.is_set():
+                print(f"[测试] 服务器已杀掉，{down_time} 秒后重启")
+                stop_event.wait(down_time)
+
+    server = threading.Thread(target=server_loop, daemon=True)
+    server.start()
+    time.sleep(1.0)
+    try:
+        return record_resilient(url, "chaos_test.mp4", duration, roll_segments=True,
+                                initial_delay=0.25, max_delay=2.0)
+    finally:
+        stop_event.set()
+        server.join()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python resilient_recorder.py record <rtsp_url> [输出文件] [时长] [roll]  # 断线自动重连录制")
+        print("  python resilient_recorder.py flaky [时长]  # 合成帧源模拟周期性断开")
+        print("  python resilient_recorder.py chaos <视频文件> [时长]  # 本地 ffmpeg 流服务器反复杀掉重启")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "record":
+        url = sys.argv[2]
+        output_file = sys.argv[3] if len(sys.argv) > 3 else "thermal_video.mp4"
+        duration = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+        roll = len(sys.argv) > 5 and sys.argv[5] == "roll"
+        record_resilient(url, output_file, duration, roll_segments=roll)
+    elif command == "flaky":
+        duration = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+        record_resilient(FlakySource("synthetic:thermal"), "flaky_test.mp4", duration,
+                         roll_segments=True, initial_delay=0.25, max_delay=2.0)
+    elif command == "chaos":
+        duration = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+        chaos_test(sys.argv[2], duration)
+    else:
+        print(f"未知命令: {command}")
@@ -0,0 +1,334 @@
+"""
+分段滚动录制
+长时间连续录制按固定时长切分为多个视频文件：下一个分段由后台线程提前打开，
+到达时长后在两帧之间切换，旧分段的关闭也在后台完成，分段边界不丢帧。
+每个分段的起止时间写入索引文件，超出磁盘配额时删除最旧的分段。
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.frame_sources import open_source
+from examples.video_encoder import get_encoder
+
+
+class SegmentedVideoWriter:
+    """
+    按时长滚动的视频写入器
+
+    write() 只在当前分段上写帧；分段切换时直接换用后台预先打开好的写入器，
+    旧写入器的 release()（MP4 需要回写文件头，可能耗时数十毫秒）、索引更新和配额清理
+    都交给后台线程。索引文件为 JSON:
+        {"segments": [{"file", "start", "end", "frames", "bytes"}, ...]}
+    start / end 为分段第一帧和最后一帧的时间（Unix 时间戳，秒）。
+    """
+
+    def __init__(self, output_dir, prefix="video", segment_duration=300.0, fps=30,
+                 encoder="auto", ext=".mp4", quota_bytes=None):
+        """
+        Args:
+            output_dir: 分段文件和索引文件所在目录
+            prefix: 文件名前缀，分段为 {prefix}_{日期_时间}_{序号}{ext}，索引为 {prefix}_index.json
+            segment_duration: 每个分段的时长（秒，按帧时间戳计算）
+            fps: 写入视频的帧率
+            encoder: 视频编码描述（见 video_encoder），如 opencv:mp4v、ffmpeg:crf=28，默认自动选择
+            ext: 文件扩展名
+            quota_bytes: 已完成分段的总大小上限（字节），超出时删除最旧的分段；None 表示不限制。
+                正在写入的分段不计入，实际占用最多再多一个分段
+        """
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.segment_duration = segment_duration
+        self.fps = fps
+        self.encoder = get_encoder(encoder)
+        self.ext = ext
+        self.quota_bytes = quota_bytes
+        self.index_file = os.path.join(output_dir, f"{prefix}_index.json")
+
+        os.makedirs(output_dir, exist_ok=True)
+        # 继续使用已有索引，重启录制后配额仍然覆盖之前的分段
+        self.segments = self._load_index()
+        self._seq = len(self.segments)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-writer")
+        self._current = None
+        self._next = None
+        # 后台关闭分段的任务，下次切换和 close() 时检查结果，失败时抛出异常而不是静默丢失
+        self._finishing = []
+        self._frame_size = None
+        # 帧时间戳为 time.monotonic()，换算为 Unix 时间写入索引
+        self._clock_offset = time.time() - time.monotonic()
+        self.deleted = 0
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return []
+        with open(self.index_file, encoding="utf-8") as f:
+            segments = json.load(f)["segments"]
+        return [s for s in segments if os.path.exists(os.path.join(self.output_dir, s["file"]))]
+
+    def _open(self, seq, planned_start):
+        """打开一个新分段（在后台线程中调用）"""
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(planned_start))
+        filename = f"{self.prefix}_{stamp}_{seq:04d}{self.ext}"
+        writer = self.encoder.open(os.path.join(self.output_dir, filename), self.fps, self._frame_size)
+        if not writer.isOpened():
+            raise IOError(f"无法创建视频文件: {filename}")
+        return filename, writer
+
+    def _prepare_next(self, planned_start):
+        self._next = self._executor.submit(self._open, self._seq, planned_start)
+        self._seq += 1
+
+    def write(self, image, timestamp=None):
+        """
+        写入一帧
+
+        Args:
+            image: BGR 图像
+            timestamp: 帧的采集时刻（time.monotonic() 时间），默认当前时间
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        if self._current is None:
+            height, width = image.shape[:2]
+            self._frame_size = (width, height)
+            start = timestamp + self._clock_offset
+            self._current = self._begin(self._open(self._seq, start), timestamp)
+            self._seq += 1
+            self._prepare_next(start + self.segment_duration)
+        elif timestamp - self._current["start"] >= self.segment_duration:
+            self._rotate(timestamp)
+
+        self._current["writer"].write(image)
+        self._current["frames"] += 1
+        self._current["end"] = timestamp
+
+    def _begin(self, opened, timestamp):
+        filename, writer = opened
+        return {"file": filename, "writer": writer, "start": timestamp, "end": timestamp, "frames": 0}
+
+    def _rotate(self, timestamp):
+        # 下一个分段通常早已打开，result() 立即返回
+        self._check_finished()
+        opened = self._next.result()
+        finished = self._current
+        self._current = self._begin(opened, timestamp)
+        self._finishing.append(self._executor.submit(self._finish, finished))
+        self._prepare_next(timestamp + self._clock_offset + self.segment_duration)
+
+    def _check_finished(self, wait=False):
+        """取出已完成的关闭任务的结果，关闭、更新索引或清理时的异常在这里重新抛出"""
+        pending = []
+        error = None
+        for future in self._finishing:
+            if wait or future.done():
+                error = error or future.exception()
+            else:
+                pending.append(future)
+        self._finishing = pending
+        if error is not None:
+            raise error
+
+    def _finish(self, segment):
+        """关闭分段、更新索引并清理超出配额的旧分段（在后台线程中调用）"""
+        try:
+            segment["writer"].release()
+            path = os.path.join(self.output_dir, segment["file"])
+            self.segments.append({
+                "file": segment["file"],
+                "start": round(segment["start"] + self._clock_offset, 3),
+                "end": round(segment["end"] + self._clock_offset, 3),
+                "frames": segment["frames"],
+                "bytes": os.path.getsize(path),
+            })
+            self._prune()
+            self._write_index()
+        except Exception as e:
+            print(f"错误: 关闭分段 {segment['file']} 失败: {e}")
+            raise
+
+    def _prune(self):
+        if self.quota_bytes is None:
+            return
+        total = sum(s["bytes"] for s in self.segments)
+        # 至少保留刚完成的分段
+        while total > self.quota_bytes and len(self.segments) > 1:
+            oldest = self.segments.pop(0)
+            total -= oldest["bytes"]
+            try:
+                os.remove(os.path.join(self.output_dir, oldest["file"]))
+            except FileNotFoundError:
+                pass
+            self.deleted += 1
+            print(f"超出磁盘配额，删除旧分段: {oldest['file']}")
+
+    def _write_index(self):
+        # 先写临时文件再替换，中途断电也不会留下损坏的索引
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"segment_duration": self.segment_duration, "segments": self.segments},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def close(self):
+        """关闭当前分段，丢弃预先打开但未使用的分段"""
+        if self._current is not None:
+            self._finishing.append(self._executor.submit(self._finish, self._current))
+            self._current = None
+        try:
+            if self._next is not None:
+                next_segment, self._next = self._next, None
+                filename, writer = next_segment.result()
+                writer.release()
+                try:
+                    # ffmpeg 在收到第一帧后才创建文件
+                    os.remove(os.path.join(self.output_dir, filename))
+                except FileNotFoundError:
+                    pass
+        finally:
+            self._executor.shutdown(wait=True)
+            self._check_finished(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def record_segments(source, output_dir="recordings", prefix="video", segment_duration=300.0,
+                    duration=None, quota_gb=None, encoder="auto"):
+    """
+    连续分段录制，直到达到 duration 或按 Ctrl+C
+
+    Args:
+        source: 帧源（FrameSource 或 open_source 支持的描述）
+        output_dir: 输出目录
+        prefix: 文件名前缀
+        segment_duration: 每个分段的时长（秒）
+        duration: 总录制时长（秒），None 表示一直录制
+        quota_gb: 磁盘配额（GB），None 表示不限制
+        encoder: 视频编码描述（见 video_encoder），默认自动选择
+
+    Returns:
+        索引中的分段列表；帧源打开失败时返回 None
+    """
+    source = open_source(source)
+    try:
+        source.start()
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"错误: {e}")
+        return None
+    quota_bytes = int(quota_gb * 1024 ** 3) if quota_gb is not None else None
+    writer = SegmentedVideoWriter(output_dir, prefix, segment_duration, source.fps,
+                                  encoder=encoder, quota_bytes=quota_bytes)
+
+    print(f"开始分段录制，每段 {segment_duration:.0f} 秒，保存到 {output_dir}/（按 Ctrl+C 停止）")
+    start_time = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - start_time < duration:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+            if frame is not None:
+                writer.write(frame.color, frame.timestamp)
+    except KeyboardInterrupt:
+        print("\n录制被中断")
+    finally:
+        source.stop()
+        writer.close()
+    print(f"录制完成，共 {len(writer.segments)} 个分段，索引: {writer.index_file}")
+    return writer.segments
+
+
+def benchmark(frames=600, segment_frames=100, output_dir="segment_bench"):
+    """
+    对比分段切换时的写入卡顿：后台预先打开 vs 在写入线程中关闭再打开
+
+    合成热成像帧按 25 fps 的时间戳不限速写入，每 segment_frames 帧切换一次分段
+
+    本机 SSD 上创建和关闭 MP4 只需约 1 ms，两种方式差别不大；
+    在机器人的 eMMC / SD 卡上关闭文件可能阻塞数十到数百毫秒，应在目标存储上运行测试
+
+    Args:
+        frames: 写入的总帧数
+        segment_frames: 每个分段的帧数
+        output_dir: 临时输出目录（放在要测试的存储上），测试结束后删除
+    """
+    import shutil
+
+    source = open_source("synthetic:thermal", realtime=False)
+    source.start()
+    images = [source.read().color for _ in range(25)]
+    source.stop()
+    fps = 25
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    size = (images[0].shape[1], images[0].shape[0])
+
+    def report(label, times):
+        # 新分段的第一帧是关键帧，本身就比普通帧慢
+        times = np.array(times) * 1000
+        boundaries = times[segment_frames::segment_frames]
+        print(f"  {label}: 普通帧 中位数 {np.median(times):.2f} ms，"
+              f"分段切换帧 平均 {boundaries.mean():.2f} ms，最大 {times.max():.2f} ms")
+
+    print(f"{size[0]}x{size[1]}，{frames} 帧，每 {segment_frames} 帧一个分段")
+    try:
+        # 同步切换：在写入线程中 release() 旧文件并创建新文件
+        os.makedirs(output_dir, exist_ok=True)
+        times = []
+        writer = None
+        for i in range(frames):
+            t0 = time.perf_counter()
+            if i % segment_frames == 0:
+                if writer is not None:
+                    writer.release()
+                writer = cv2.VideoWriter(os.path.join(output_dir, f"sync_{i}.mp4"), fourcc, fps, size)
+            writer.write(images[i % len(images)])
+            times.append(time.perf_counter() - t0)
+        writer.release()
+        report("同步切换", times)
+
+        times = []
+        with SegmentedVideoWriter(output_dir, "bench", segment_frames / fps, fps, "opencv:mp4v") as writer:
+            for i in range(frames):
+                t0 = time.perf_counter()
+                writer.write(images[i % len(images)], i / fps)
+                times.append(time.perf_counter() - t0)
+        report("后台切换", times)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python segmented_writer.py record <帧源> [输出目录] [分段秒数] [配额GB]  # 连续分段录制")
+        print("  python segmented_writer.py bench [测试目录]  # 对比分段切换时的写入卡顿")
+        print("  帧源可以是 RTSP 地址、视频文件或 synthetic:thermal")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "record":
+        spec = sys.argv[2]
+        output_dir = sys.argv[3] if len(sys.argv) > 3 else "recordings"
+        segment_duration = float(sys.argv[4]) if len(sys.argv) > 4 else 300.0
+        quota_gb = float(sys.argv[5]) if len(sys.argv) > 5 else None
+        record_segments(spec, output_dir, segment_duration=segment_duration, quota_gb=quota_gb)
+    elif command == "bench":
+        output_dir = sys.argv[2] if len(sys.argv) > 2 else "segment_bench"
+        benchmark(output_dir=output_dir)
+    else:
+        print(f"未知命令: {command}")
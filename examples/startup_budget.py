@@ -0,0 +1,188 @@
+"""
+启动耗时预算
+每个模块在新的 Python 进程中用 -X importtime 测量导入耗时，并检查导入时是否加载了
+不应加载的重量级库（numpy、cv2、pyrealsense2、pyaudio、requests）；
+超出预算文件中的耗时、加载了禁止的库或导入失败（如缺少硬件库时直接崩溃）都视为不通过，退出码为 1
+"""
+import glob
+import json
+from functools import lru_cache
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_FILE = os.path.join(ROOT, "examples", "startup_budget.json")
+
+# 需要关注的重量级库（顶层包名）
+HEAVY = ("numpy", "cv2", "pyrealsense2", "pyaudio", "requests")
+
+
+def discover():
+    """main 和 examples 包中的所有模块"""
+    names = ["main"]
+    for path in sorted(glob.glob(os.path.join(ROOT, "examples", "*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name != "__init__":
+            names.append(f"examples.{name}")
+    return names
+
+
+def _run(code, python):
+    """在新进程中执行代码，返回进程结果和 {顶层包名: 累计导入耗时毫秒}"""
+    result = subprocess.run([python, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        packages[fields[2].strip()] = int(fields[1]) / 1000.0
+    return result, packages
+
+
+@lru_cache(maxsize=None)
+def _startup_modules(python):
+    """解释器启动时（site 及其 .pth 文件）已经导入的模块，不计入被测模块"""
+    return frozenset(_run("pass", python)[1])
+
+
+def _import_once(module, python):
+    """
+    在新进程中导入一次模块
+
+    Returns:
+        (模块导入耗时毫秒, {包名: 累计耗时毫秒}, 错误信息)；导入失败时耗时为 None
+    """
+    result, imported = _run(f"import {module}", python)
+    startup = _startup_modules(python)
+    elapsed = imported.get(module)
+    packages = {name: ms for name, ms in imported.items()
+                if name != module and "." not in name and name not in startup}
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"退出码 {result.returncode}"
+        return None, packages, error
+    return elapsed, packages, None
+
+
+def measure(module, repeat=3, python=sys.executable):
+    """
+    测量模块的导入耗时
+
+    第一次导入的耗时包含读取磁盘（字节码缓存未命中），取多次测量的中位数
+
+    Args:
+        module: 模块名，如 "examples.frame_sources"
+        repeat: 测量次数
+        python: Python 解释器
+
+    Returns:
+        {"module", "ms": 中位数耗时, "heavy": {已加载的重量级库: 累计耗时毫秒}, "error"}
+    """
+    times = []
+    packages = {}
+    for _ in range(repeat):
+        elapsed, packages, error = _import_once(module, python)
+        if error is not None:
+            return {"module": module, "ms": None, "heavy": {}, "error": error}
+        times.append(elapsed)
+    heavy = {name: packages[name] for name in HEAVY if name in packages}
+    return {"module": module, "ms": statistics.median(times), "heavy": heavy, "error": None}
+
+
+def load_budget(path=DEFAULT_BUDGET_FILE):
+    """
+    读取预算文件
+
+    {
+        "repeat": 3,
+        "default_ms": 300,
+        "modules": {
+            "main": {"budget_ms": 40, "forbid": ["numpy", "cv2", ...]},
+            ...
+        }
+    }
+
+    未列出的模块使用 default_ms，不限制加载的库
+    """
+    with open(path, encoding="utf-8") as f:
+        budget = json.load(f)
+    budget.setdefault("repeat", 3)
+    budget.setdefault("default_ms", 300)
+    budget.setdefault("modules", {})
+    for name, rule in budget["modules"].items():
+        unknown = set(rule.get("forbid", ())) - set(HEAVY)
+        if unknown:
+            raise ValueError(f"{name}: forbid 中的 {', '.join(sorted(unknown))} 不在 {', '.join(HEAVY)} 之中")
+    return budget
+
+
+def check(path=DEFAULT_BUDGET_FILE, scale=1.0, modules=None):
+    """
+    测量所有模块并与预算比较，打印结果表
+
+    Args:
+        path: 预算文件
+        scale: 预算倍数；预算按开发机测得，在机器人的 ARM 板上运行时放大（如 6）
+        modules: 只检查这些模块，None 表示 main 和 examples 中的全部模块
+
+    Returns:
+        全部通过返回 True
+    """
+    budget = load_budget(path)
+    names = modules or sorted(set(discover()) | set(budget["modules"]))
+    failures = 0
+    print(f"{'模块':<38}{'耗时':>7}{'预算':>7}  结果")
+    for name in names:
+        rule = budget["modules"].get(name, {})
+        limit = rule.get("budget_ms", budget["default_ms"]) * scale
+        result = measure(name, budget["repeat"])
+        problems = []
+        if result["error"] is not None:
+            problems.append(f"导入失败: {result['error']}")
+        else:
+            if result["ms"] > limit:
+                problems.append("超出预算")
+            loaded = [m for m in rule.get("forbid", ()) if m in result["heavy"]]
+            if loaded:
+                problems.append(f"加载了 {', '.join(loaded)}")
+        failures += bool(problems)
+        elapsed = f"{result['ms']:.1f}" if result["ms"] is not None else "-"
+        heavy = ", ".join(result["heavy"])
+        print(f"{name:<40}{elapsed:>9}{limit:>9.0f}  {'; '.join(problems) or '通过'}"
+              + (f"  （加载 {heavy}）" if heavy and not problems else ""))
+    print(f"\n{len(names) - failures}/{len(names)} 个模块通过（单位毫秒，预算倍数 {scale}）")
+    return failures == 0
+
+
+def profile(module, top=15):
+    """打印模块导入时累计耗时最多的包，用于找出拖慢启动的依赖"""
+    elapsed, packages, error = _import_once(module, sys.executable)
+    if error is not None:
+        print(f"导入失败: {error}")
+        return
+    print(f"{module}: {elapsed:.1f} ms")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<30}{ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python startup_budget.py check [预算文件] [倍数]  # 检查所有模块的导入耗时，不通过时退出码为 1")
+        print("  python startup_budget.py profile <模块>  # 列出导入该模块时耗时最多的包，如 examples.frame_sources")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "check":
+        path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BUDGET_FILE
+        scale = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        sys.exit(0 if check(path, scale) else 1)
+    elif command == "profile" and len(sys.argv) > 2:
+        profile(sys.argv[2])
+    else:
+        print(f"未知命令: {command}")
@@ -0,0 +1,401 @@
+"""
+流式 WAV 录音
+音频块到达后由写入线程直接追加到文件，内存占用与录音时长无关；
+定期回写 WAV 文件头中的长度字段，录音中途崩溃或断电时已写入的部分仍可播放；
+支持按时长轮换文件，用于不间断的长期录音
+"""
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+# WAV 文件头固定 44 字节，RIFF 长度在偏移 4，data 长度在偏移 40
+WAV_HEADER_SIZE = 44
+# data 长度字段为 32 位无符号整数，超过时必须换新文件
+MAX_DATA_BYTES = 0xFFFFFFFF - WAV_HEADER_SIZE
+
+
+class StreamingWavWriter:
+    """
+    边写边更新文件头的 WAV 写入器
+
+    与 wave 模块不同，文件头不是每次写入都回写，而是每隔 header_interval 秒的音频回写一次并刷新到磁盘，
+    兼顾写入开销和崩溃时可恢复的数据量。
+    """
+
+    def __init__(self, filename, channels=1, sample_rate=16000, sample_width=2, header_interval=1.0):
+        """
+        Args:
+            filename: 输出文件名
+            channels: 声道数
+            sample_rate: 采样率
+            sample_width: 每个采样的字节数，2 表示 16 位
+            header_interval: 回写文件头并刷新到磁盘的间隔（秒，按音频时长计算）
+        """
+        self.filename = filename
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.frame_bytes = channels * sample_width
+        self.byte_rate = sample_rate * self.frame_bytes
+        self._patch_bytes = max(int(header_interval * self.byte_rate), self.frame_bytes)
+        self.data_bytes = 0
+        self._unpatched = 0
+        self._file = open(filename, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self._file.write(struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + self.data_bytes, b"WAVE",
+            b"fmt ", 16, 1, self.channels, self.sample_rate, self.byte_rate,
+            self.frame_bytes, self.sample_width * 8,
+            b"data", self.data_bytes,
+        ))
+
+    @property
+    def duration(self):
+        """已写入的音频时长（秒）"""
+        return self.data_bytes / self.byte_rate
+
+    def write(self, data):
+        """
+        追加音频数据
+
+        Args:
+            data: PCM 字节串，长度应为整帧
+        """
+        if self.data_bytes + len(data) > MAX_DATA_BYTES:
+            raise OverflowError("WAV 文件超过 4 GB，请使用轮换写入")
+        self._file.write(data)
+        self.data_bytes += len(data)
+        self._unpatched += len(data)
+        if self._unpatched >= self._patch_bytes:
+            self.patch_header()
+
+    def patch_header(self):
+        """把当前长度写回文件头并刷新到磁盘"""
+        end = self._file.tell()
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", 36 + self.data_bytes))
+        self._file.seek(40)
+        self._file.write(struct.pack("<I", self.data_bytes))
+        self._file.seek(end)
+        self._file.flush()
+        self._unpatched = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.patch_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RotatingWavWriter:
+    """
+    按时长轮换文件的 WAV 写入器
+
+    按采样数精确切分，相邻文件首尾相接，不丢采样。
+    文件名为 {prefix}_{日期_时间}.wav，时间为该文件第一个采样的时刻。
+    """
+
+    def __init__(self, output_dir, prefix="audio", rotate_seconds=3600.0, channels=1,
+                 sample_rate=16000, sample_width=2, header_interval=1.0, on_rotate=None):
+        """
+        Args:
+            output_dir: 输出目录
+            prefix: 文件名前缀
+            rotate_seconds: 每个文件的时长（秒）
+            channels: 声道数
+            sample_rate: 采样率
+            sample_width: 每个采样的字节数
+            header_interval: 回写文件头的间隔（秒）
+            on_rotate: 每个文件写完后调用 on_rotate(filename)，可用于上传或清理
+        """
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.header_interval = header_interval
+        self.on_rotate = on_rotate
+        frame_bytes = channels * sample_width
+        self.rotate_bytes = min(int(rotate_seconds * sample_rate) * frame_bytes,
+                                MAX_DATA_BYTES // frame_bytes * frame_bytes)
+        self.files = []
+        self._writer = None
+        # 按已写入的采样数推算每个文件的开始时刻，不受写入线程调度延迟影响
+        self._start_time = None
+        self._total_bytes = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open(self):
+        if self._start_time is None:
+            self._start_time = time.time()
+        start = self._start_time + self._total_bytes / (self.sample_rate * self.channels * self.sample_width)
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(start))
+        filename = os.path.join(self.output_dir, f"{self.prefix}_{stamp}.wav")
+        if filename in self.files:
+            filename = os.path.join(self.output_dir, f"{self.prefix}_{stamp}_{len(self.files)}.wav")
+        self.files.append(filename)
+        self._writer = StreamingWavWriter(filename, self.channels, self.sample_rate,
+                                          self.sample_width, self.header_interval)
+
+    def _finish(self):
+        self._writer.close()
+        if self.on_rotate is not None:
+            self.on_rotate(self._writer.filename)
+        self._writer = None
+
+    def write(self, data):
+        """追加音频数据，跨越轮换边界时拆分到两个文件"""
+        view = memoryview(data)
+        while len(view):
+            if self._writer is None:
+                self._open()
+            room = self.rotate_bytes - self._writer.data_bytes
+            part = view[:room]
+            self._writer.write(part)
+            self._total_bytes += len(part)
+            view = view[len(part):]
+            if self._writer.data_bytes >= self.rotate_bytes:
+                self._finish()
+
+    def close(self):
+        if self._writer is not None:
+            self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StreamingRecorder:
+    """
+    回调模式流式录音
+
+    PyAudio 回调只把音频块放入有界队列，写入线程取出后写文件；
+    磁盘短暂卡顿时由队列吸收，队列满时丢弃并计数，回调永远不会阻塞。
+    """
+
+    def __init__(self, writer, sample_rate=16000, channels=1, chunk=1024,
+                 device_index=None, queue_chunks=256):
+        """
+        Args:
+            writer: StreamingWavWriter 或 RotatingWavWriter
+            sample_rate: 采样率
+            channels: 声道数
+            chunk: 每个音频块的帧数
+            device_index: 输入设备编号或名称，None 表示默认设备
+            queue_chunks: 队列最多缓存的音频块数（默认 256 块约 16 秒@16kHz）
+        """
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.chunk = chunk
+        self.device_index = device_index
+        self._queue = queue.Queue(maxsize=queue_chunks)
+        self._thread = None
+        self.dropped = 0
+        self.overflows = 0
+        self.error = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # 在 PortAudio 的音频线程中调用，只做计数和入队
+        if status & self._input_overflow:
+            self.overflows += 1
+        try:
+            self._queue.put_nowait(in_data)
+        except queue.Full:
+            self.dropped += 1
+        return None, self._continue
+
+    def _write_loop(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            try:
+                self.writer.write(data)
+            except Exception as e:
+                # 写入失败（如磁盘写满）时只报告一次，继续取出队列直到录音结束
+                if self.error is None:
+                    self.error = e
+                    print(f"错误: 写入音频失败: {e}")
+
+    def record(self, duration=None):
+        """
+        录音直到达到 duration 或按 Ctrl+C
+
+        Args:
+            duration: 录音时长（秒），None 表示一直录音
+        """
+        from examples.audio_devices import INPUT, get_pyaudio, registry
+        from examples.lazy_imports import require
+
+        pyaudio = require("pyaudio", "麦克风录音")
+        self._input_overflow = pyaudio.paInputOverflow
+        self._continue = pyaudio.paContinue
+        p = get_pyaudio()
+        device_index = registry.validate(self.device_index, self.sample_rate, self.channels, INPUT)
+        self._thread = threading.Thread(target=self._write_loop, name="wav-writer", daemon=True)
+        self._thread.start()
+        stream = p.open(
+            format=p.get_format_from_width(self.writer.sample_width),
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=self.chunk,
+            stream_callback=self._callback,
+        )
+
+        try:
+            start_time = time.monotonic()
+            while stream.is_active():
+                if duration is not None and time.monotonic() - start_time >= duration:
+                    break
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print("\n录制被中断")
+        finally:
+            stream.stop_stream()
+            stream.close()
+            self._queue.put(None)
+            self._thread.join()
+            self.writer.close()
+
+        if self.dropped or self.overflows:
+            print(f"警告: 写入跟不上丢弃 {self.dropped} 块，输入缓冲溢出 {self.overflows} 次")
+
+
+def record_stream(filename="recording.wav", duration=None, sample_rate=16000, channels=1,
+                  rotate_seconds=None, device_index=None):
+    """
+    流式录音到文件
+
+    Args:
+        filename: 输出文件名；轮换时为输出目录
+        duration: 录音时长（秒），None 表示一直录音到按 Ctrl+C
+        sample_rate: 采样率
+        channels: 声道数
+        rotate_seconds: 指定时每隔该时长换一个文件
+        device_index: 输入设备编号或名称
+    """
+    if rotate_seconds is not None:
+        writer = RotatingWavWriter(filename, "audio", rotate_seconds, channels, sample_rate)
+    else:
+        writer = StreamingWavWriter(filename, channels, sample_rate)
+
+    print(f"采样率: {sample_rate} Hz, 声道: {channels}")
+    StreamingRecorder(writer, sample_rate, channels, device_index=device_index).record(duration)
+    if rotate_seconds is not None:
+        print(f"录制完成，共 {len(writer.files)} 个文件，保存在: {filename}")
+    else:
+        print(f"录制完成，时长 {writer.duration:.1f} 秒，已保存到: {filename}")
+
+
+def benchmark(hours=24.0, sample_rate=16000, channels=1, chunk=1024, output_dir="wav_bench"):
+    """
+    模拟长时间录音，验证内存占用不随时长增长
+
+    不需要麦克风：按录音的块大小不限速生成音频数据，经队列和写入线程写入每小时轮换的文件，
+    每个文件写完后先用 wave 模块校验再删除，避免占满磁盘。
+    写入过程中还会检查正在写入的文件可以被读取（模拟崩溃后恢复）。
+
+    Args:
+        hours: 模拟的录音时长（小时）
+        sample_rate: 采样率
+        channels: 声道数
+        chunk: 每个音频块的帧数
+        output_dir: 临时输出目录，测试结束后删除
+    """
+    import resource
+    import shutil
+    import wave
+
+    import numpy as np
+
+    def rss_mb():
+        # Linux 上 ru_maxrss 单位为 KB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def verify(filename):
+        with wave.open(filename, "rb") as wf:
+            frames = wf.getnframes()
+        os.remove(filename)
+        checked.append(frames)
+
+    checked = []
+    t = np.arange(chunk * 16) / sample_rate
+    tone = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+    tone = np.repeat(tone[:, None], channels, axis=1).tobytes()
+    block = chunk * channels * 2
+    blocks = [tone[i:i + block] for i in range(0, len(tone), block)]
+
+    writer = RotatingWavWriter(output_dir, "bench", 3600, channels, sample_rate, on_rotate=verify)
+    recorder = StreamingRecorder(writer, sample_rate, channels, chunk)
+    thread = threading.Thread(target=recorder._write_loop, daemon=True)
+    thread.start()
+
+    total_chunks = int(hours * 3600 * sample_rate / chunk)
+    print(f"模拟录音 {hours:g} 小时（{sample_rate} Hz，{channels} 声道，{total_chunks} 块）")
+    start_rss = rss_mb()
+    samples = []
+    start_time = time.perf_counter()
+    try:
+        for i in range(total_chunks):
+            # 不限速生成时写入线程可能暂时跟不上，这里阻塞等待而不是丢弃
+            recorder._queue.put(blocks[i % len(blocks)])
+            if i % (total_chunks // 24 or 1) == 0:
+                samples.append(rss_mb())
+                current = writer._writer
+                if current is not None and current.data_bytes:
+                    # 正在写入的文件头已回写到最近一次，可直接打开
+                    with wave.open(current.filename, "rb") as wf:
+                        wf.getnframes()
+        recorder._queue.put(None)
+        thread.join()
+        writer.close()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"耗时 {elapsed:.1f} 秒，{len(checked)} 个文件校验通过，共 {sum(checked) / sample_rate / 3600:.2f} 小时音频")
+    print(f"内存峰值: 开始 {start_rss:.1f} MB，过程中 {min(samples):.1f} - {max(samples):.1f} MB，"
+          f"结束 {rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python streaming_wav.py record [文件名] [时长]  # 流式录音，不指定时长则按 Ctrl+C 停止")
+        print("  python streaming_wav.py rotate [输出目录] [每个文件秒数]  # 不间断录音，按时长轮换文件")
+        print("  python streaming_wav.py bench [小时]  # 无需麦克风，模拟长时间录音检查内存占用")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "record":
+        filename = sys.argv[2] if len(sys.argv) > 2 else "recording.wav"
+        duration = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        record_stream(filename, duration)
+    elif command == "rotate":
+        output_dir = sys.argv[2] if len(sys.argv) > 2 else "recordings"
+        rotate_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3600.0
+        record_stream(output_dir, rotate_seconds=rotate_seconds)
+    elif command == "bench":
+        hours = float(sys.argv[2]) if len(sys.argv) > 2 else 24.0
+        benchmark(hours)
+    else:
+        print(f"未知命令: {command}")
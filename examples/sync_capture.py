@@ -0,0 +1,569 @@
+"""
+多传感器同步采集
+深度相机、热成像、麦克风和温湿度各自在独立线程中采集，所有样本统一使用 time.monotonic() 时间戳，
+按最近时间戳在各路数据之间对齐，用于事件回溯时保存同一时刻的深度 + 热成像 + 音频快照，
+并统计每一路的实际速率和时间间隔抖动
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.frame_sources import Frame, open_source
+from examples.streaming_wav import StreamingWavWriter
+
+
+class Sample(NamedTuple):
+    """一个样本；timestamp 为 time.monotonic() 时间"""
+    timestamp: float
+    data: Any
+
+
+class SensorStream:
+    """
+    传感器数据流基类
+
+    子类实现 capture()，返回 (时间戳, 数据)，暂时没有数据时返回 None，数据结束时抛出 EOFError；
+    可选实现 open() / close()。start() 之后在独立线程中循环采集，最近 history 秒的样本保存在内存中
+    """
+
+    # 连续数据流（相机、音频）为 True；定时查询的数据流为 False，不参与确定公共时刻
+    continuous = True
+
+    def __init__(self, name, history=2.0):
+        """
+        Args:
+            name: 数据流名称
+            history: 内存中保留的时长（秒）
+        """
+        self.name = name
+        self.history = history
+        self._samples = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # 统计：样本数、首末时间戳、相邻样本间隔的均值和方差（Welford 算法）、最长间隔
+        self.count = 0
+        self.errors = 0
+        self.last_error = None
+        self._first = None
+        self._last = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.max_interval = 0.0
+
+    def open(self):
+        pass
+
+    def capture(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def start(self):
+        self.open()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"capture-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.close()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                item = self.capture()
+            except EOFError:
+                break
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                self._stop.wait(0.1)
+                continue
+            if item is not None:
+                self._record(*item)
+
+    def _record(self, timestamp, data):
+        with self._lock:
+            self._samples.append(Sample(timestamp, data))
+            while self._samples[0].timestamp < timestamp - self.history:
+                self._samples.popleft()
+            if self._last is not None:
+                interval = timestamp - self._last
+                n = self.count
+                delta = interval - self._mean
+                self._mean += delta / n
+                self._m2 += delta * (interval - self._mean)
+                self.max_interval = max(self.max_interval, interval)
+            else:
+                self._first = timestamp
+            self._last = timestamp
+            self.count += 1
+
+    def latest(self) -> Optional[Sample]:
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def nearest(self, t, tolerance=None) -> Optional[Sample]:
+        """
+        时间戳最接近 t 的样本
+
+        Args:
+            t: time.monotonic() 时间
+            tolerance: 最大允许时间差（秒），超出时返回 None；None 表示不限制
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return None
+        times = np.fromiter((s.timestamp for s in samples), dtype=np.float64, count=len(samples))
+        i = int(np.searchsorted(times, t))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(samples)]
+        best = min(candidates, key=lambda j: abs(times[j] - t))
+        if tolerance is not None and abs(times[best] - t) > tolerance:
+            return None
+        return samples[best]
+
+    def window(self, t0, t1) -> List[Sample]:
+        """时间戳在 [t0, t1] 内的样本"""
+        with self._lock:
+            return [s for s in self._samples if t0 <= s.timestamp <= t1]
+
+    def stats(self):
+        """
+        Returns:
+            dict: count 样本数，rate 平均速率（Hz），interval 平均间隔（ms），
+            jitter 间隔标准差（ms），max_interval 最长间隔（ms），errors 出错次数
+        """
+        with self._lock:
+            span = (self._last - self._first) if self.count > 1 else 0.0
+            jitter = math.sqrt(self._m2 / (self.count - 2)) if self.count > 2 else 0.0
+            return {
+                "count": self.count,
+                "rate": (self.count - 1) / span if span > 0 else 0.0,
+                "interval": self._mean * 1000,
+                "jitter": jitter * 1000,
+                "max_interval": self.max_interval * 1000,
+                "errors": self.errors,
+            }
+
+    def save(self, sample, directory):
+        """
+        保存一个样本，返回写入的文件名列表
+
+        Args:
+            sample: 要保存的样本
+            directory: 输出目录
+        """
+        filename = f"{self.name}.json"
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+            json.dump(sample.data, f, ensure_ascii=False, indent=2, default=str)
+        return [filename]
+
+
+class FrameStream(SensorStream):
+    """相机数据流，样本数据为 Frame，时间戳为帧源给出的采集时刻"""
+
+    def __init__(self, name, source, history=2.0):
+        """
+        Args:
+            name: 数据流名称
+            source: 帧源（FrameSource 或 open_source 支持的描述）
+            history: 内存中保留的时长（秒）
+        """
+        super().__init__(name, history)
+        self.source = open_source(source)
+
+    def open(self):
+        self.source.start()
+
+    def capture(self):
+        frame = self.source.read()
+        if frame is None:
+            return None
+        return frame.timestamp, frame
+
+    def close(self):
+        self.source.stop()
+
+    def save(self, sample, directory):
+        import cv2
+
+        frame: Frame = sample.data
+        files = [f"{self.name}_color.jpg"]
+        cv2.imwrite(os.path.join(directory, files[0]), frame.color)
+        if frame.depth is not None:
+            # 深度图保存为 16 位 PNG，保留原始毫米值
+            files.append(f"{self.name}_depth.png")
+            cv2.imwrite(os.path.join(directory, files[1]), frame.depth)
+        return files
+
+
+class AudioStream(SensorStream):
+    """
+    麦克风数据流，每个样本为一个音频块（int16 数组），时间戳为块中第一个采样的时刻
+
+    时间戳由读取时刻倒推：减去本块和录音缓冲区中尚未读取的数据时长，再减去设备报告的输入延迟
+    """
+
+    def __init__(self, name="audio", sample_rate=16000, channels=1, block_ms=100, history=30.0,
+                 device=None):
+        """
+        Args:
+            name: 数据流名称
+            sample_rate: 采样率
+            channels: 声道数
+            block_ms: 每个样本的时长（毫秒）
+            history: 内存中保留的时长（秒）
+            device: 输入设备编号或名称，None 表示默认设备
+        """
+        super().__init__(name, history)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block = int(sample_rate * block_ms / 1000)
+        self.device = device
+        self.engine = None
+
+    def open(self):
+        from examples.audio_engine import AudioEngine
+
+        self.engine = AudioEngine(self.sample_rate, self.channels, input_device=self.device)
+        self.engine.start(capture=True, playback=False)
+
+    def capture(self):
+        samples = self.engine.read(self.block, timeout=1.0)
+        if len(samples) == 0:
+            return None
+        now = time.monotonic()
+        queued = len(samples) + self.engine.capture.available
+        timestamp = now - queued / self.sample_rate - self.engine.latency().get("input", 0.0)
+        return timestamp, samples
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
+
+    def clip(self, t0, t1):
+        """
+        截取 [t0, t1] 时间段的音频
+
+        Returns:
+            (第一个采样的时间戳, int16 数组)，没有数据时返回 (None, 空数组)
+        """
+        block_time = self.block / self.sample_rate
+        blocks = self.window(t0 - block_time, t1)
+        if not blocks:
+            return None, np.empty((0, self.channels), dtype=np.int16)
+        start = blocks[0].timestamp
+        audio = np.concatenate([s.data for s in blocks])
+        lo = max(0, int(round((t0 - start) * self.sample_rate)))
+        hi = max(lo, int(round((t1 - start) * self.sample_rate)))
+        return start + lo / self.sample_rate, audio[lo:hi]
+
+    def save(self, sample, directory, before=2.0, after=1.0):
+        """保存样本时刻之前 before 秒到之后 after 秒的音频"""
+        start, audio = self.clip(sample.timestamp - before, sample.timestamp + after)
+        filename = f"{self.name}.wav"
+        with StreamingWavWriter(os.path.join(directory, filename), self.channels, self.sample_rate) as writer:
+            writer.write(audio.tobytes())
+        return [filename]
+
+
+class SyntheticAudioStream(AudioStream):
+    """合成音频数据流：按实时节拍输出 440 Hz 正弦波加噪声，用于没有声卡时测试"""
+
+    def open(self):
+        self._rng = np.random.default_rng(0)
+        self._phase = 0
+        self._next = time.monotonic()
+
+    def capture(self):
+        self._next += self.block / self.sample_rate
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            self._stop.wait(delay)
+        n = np.arange(self._phase, self._phase + self.block)
+        self._phase += self.block
+        tone = 8000 * np.sin(2 * np.pi * 440 * n / self.sample_rate) + self._rng.normal(0, 300, self.block)
+        samples = np.repeat(tone.astype(np.int16)[:, None], self.channels, axis=1)
+        # 本块最后一个采样在 _next 时刻到达
+        return self._next - self.block / self.sample_rate, samples
+
+    def close(self):
+        pass
+
+
+class PollStream(SensorStream):
+    """
+    定时查询数据流（如温湿度），每 interval 秒调用一次 func，
+    时间戳取请求发出和收到响应的中点
+    """
+
+    continuous = False
+
+    def __init__(self, name, func, interval=5.0, history=600.0):
+        """
+        Args:
+            name: 数据流名称
+            func: 无参数的查询函数，返回值作为样本数据
+            interval: 查询间隔（秒）
+            history: 内存中保留的时长（秒）
+        """
+        super().__init__(name, history)
+        self.func = func
+        self.interval = interval
+        self._next = None
+
+    def open(self):
+        self._next = time.monotonic()
+
+    def capture(self):
+        delay = self._next - time.monotonic()
+        if delay > 0 and self._stop.wait(delay):
+            return None
+        self._next += self.interval
+        t0 = time.monotonic()
+        data = self.func()
+        return (t0 + time.monotonic()) / 2, data
+
+    def nearest(self, t, tolerance=None):
+        # 查询结果代表查询之前的状态，取 t 之前最近的一次
+        with self._lock:
+            before = [s for s in self._samples if s.timestamp <= t]
+        if before and (tolerance is None or t - before[-1].timestamp <= tolerance):
+            return before[-1]
+        # t 之前没有足够新的结果时，按时间差最小且不超过 tolerance 的样本处理
+        return super().nearest(t, tolerance)
+
+
+class CaptureOrchestrator:
+    """
+    同步采集调度器
+
+    启动所有数据流的采集线程，提供按最近时间戳的对齐查询、每路速率和抖动统计，以及快照保存
+    """
+
+    def __init__(self, streams: List[SensorStream]):
+        """
+        Args:
+            streams: 数据流列表，名称不能重复
+        """
+        self.streams: Dict[str, SensorStream] = {}
+        for stream in streams:
+            if stream.name in self.streams:
+                raise ValueError(f"数据流名称重复: {stream.name}")
+            self.streams[stream.name] = stream
+        # monotonic 时间换算为 Unix 时间的偏移，用于快照中的时间记录
+        self.clock_offset = time.time() - time.monotonic()
+
+    def start(self):
+        started = []
+        try:
+            for stream in self.streams.values():
+                stream.start()
+                started.append(stream)
+        except Exception:
+            for stream in started:
+                stream.stop()
+            raise
+
+    def stop(self):
+        for stream in self.streams.values():
+            stream.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def common_time(self) -> Optional[float]:
+        """所有连续数据流都已有样本的最近时刻（各路最新样本时间戳的最小值）"""
+        latest = [s.latest() for s in self.streams.values() if s.continuous]
+        if not latest or any(sample is None for sample in latest):
+            return None
+        return min(sample.timestamp for sample in latest)
+
+    def snapshot(self, t=None, tolerance=None) -> Dict[str, Optional[Sample]]:
+        """
+        各路数据流中时间戳最接近 t 的样本
+
+        Args:
+            t: time.monotonic() 时间，None 表示 common_time()
+            tolerance: 最大允许时间差（秒），超出时该路为 None
+
+        Returns:
+            {数据流名称: Sample 或 None}
+        """
+        if t is None:
+            t = self.common_time()
+            if t is None:
+                return {name: None for name in self.streams}
+        return {name: stream.nearest(t, tolerance) for name, stream in self.streams.items()}
+
+    def join(self, reference, tolerance=None) -> List[Dict[str, Optional[Sample]]]:
+        """
+        以一路数据流为基准，为其内存中的每个样本找出其他各路时间戳最近的样本
+
+        Args:
+            reference: 基准数据流名称
+            tolerance: 最大允许时间差（秒）
+
+        Returns:
+            按时间排序的 {数据流名称: Sample 或 None} 列表
+        """
+        base = self.streams[reference]
+        with base._lock:
+            samples = list(base._samples)
+        rows = []
+        for sample in samples:
+            row = {name: stream.nearest(sample.timestamp, tolerance)
+                   for name, stream in self.streams.items() if name != reference}
+            row[reference] = sample
+            rows.append(row)
+        return rows
+
+    def save_snapshot(self, directory, t=None, tolerance=None):
+        """
+        保存 t 时刻的对齐快照：各路最近样本的数据文件，以及记录时间戳和偏差的 snapshot.json
+
+        Args:
+            directory: 输出目录
+            t: time.monotonic() 时间，None 表示 common_time()
+            tolerance: 最大允许时间差（秒）
+
+        Returns:
+            snapshot.json 的内容
+        """
+        if t is None:
+            t = self.common_time()
+        if t is None:
+            raise RuntimeError("还没有采集到数据")
+        os.makedirs(directory, exist_ok=True)
+        samples = self.snapshot(t, tolerance)
+        meta = {"time": t + self.clock_offset,
+                "time_text": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t + self.clock_offset)),
+                "streams": {}}
+        for name, sample in samples.items():
+            if sample is None:
+                meta["streams"][name] = None
+                continue
+            files = self.streams[name].save(sample, directory)
+            meta["streams"][name] = {"time": sample.timestamp + self.clock_offset,
+                                     "offset_ms": (sample.timestamp - t) * 1000,
+                                     "files": files}
+        with open(os.path.join(directory, "snapshot.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return meta
+
+    def report(self):
+        """打印每路数据流的速率和抖动，返回 {名称: stats()}"""
+        result = {}
+        print(f"{'数据流':<12}{'样本数':>8}{'速率 Hz':>10}{'平均间隔 ms':>13}{'抖动 ms':>10}{'最长间隔 ms':>13}{'出错':>6}")
+        for name, stream in self.streams.items():
+            s = stream.stats()
+            result[name] = s
+            print(f"{name:<12}{s['count']:>8}{s['rate']:>10.2f}{s['interval']:>13.1f}{s['jitter']:>10.2f}"
+                  f"{s['max_interval']:>13.1f}{s['errors']:>6}")
+        return result
+
+
+def build_streams(depth="realsense", thermal=None, audio=True, api=None, poll_interval=5.0):
+    """
+    按机器人上的传感器创建数据流
+
+    Args:
+        depth: 深度相机帧源描述，None 表示不采集
+        thermal: 热成像帧源描述（如 RTSP 地址），None 表示不采集
+        audio: 是否采集麦克风；"synthetic" 表示使用合成音频
+        api: 已获取 Token 的 TemperatureHumidityAPI，None 表示不采集温湿度
+        poll_interval: 温湿度查询间隔（秒）
+    """
+    streams = []
+    if depth:
+        streams.append(FrameStream("depth", depth))
+    if thermal:
+        streams.append(FrameStream("thermal", thermal))
+    if audio == "synthetic":
+        streams.append(SyntheticAudioStream())
+    elif audio:
+        streams.append(AudioStream())
+    if api is not None:
+        streams.append(PollStream("climate", api.get_real_time_data, poll_interval))
+    return streams
+
+
+def run(duration=10.0, streams=None, output_dir="snapshot"):
+    """
+    同时采集各路数据，结束时保存一组对齐快照并打印统计
+
+    Args:
+        duration: 采集时长（秒）
+        streams: 数据流列表，None 表示深度相机 + 麦克风
+        output_dir: 快照目录
+    """
+    streams = streams if streams is not None else build_streams()
+    with CaptureOrchestrator(streams) as orchestrator:
+        print(f"同步采集 {', '.join(orchestrator.streams)}，{duration} 秒...")
+        time.sleep(duration)
+        # 快照时刻比最新数据早 1 秒，保证其后 1 秒的音频也已采集到（相机保留最近 2 秒的帧）
+        t = orchestrator.common_time()
+        if t is not None:
+            meta = orchestrator.save_snapshot(output_dir, t - 1.0)
+            print(f"快照已保存到 {output_dir}/（{meta['time_text']}）:")
+            for name, info in meta["streams"].items():
+                if info is None:
+                    print(f"  {name}: 无数据")
+                else:
+                    print(f"  {name}: 偏差 {info['offset_ms']:+.1f} ms，{', '.join(info['files'])}")
+        orchestrator.report()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python sync_capture.py run [秒数] [热成像RTSP地址] [temp]  # 深度相机 + 麦克风（+ 热成像、温湿度）同步采集")
+        print("  python sync_capture.py sim [秒数]  # 无需硬件：合成深度、热成像、音频和本地模拟的温湿度服务")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+
+    if command == "run":
+        thermal = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != "temp" else None
+        api = None
+        if "temp" in sys.argv[3:]:
+            from examples.temperature_humidity_api import TemperatureHumidityAPI
+
+            api = TemperatureHumidityAPI()
+            api.get_token("h251225krt", "h251225krt")
+        run(duration, build_streams("realsense", thermal, True, api))
+    elif command == "sim":
+        from examples.temperature_humidity_api import TemperatureHumidityAPI
+        from examples.temperature_humidity_stub import StubCloudServer
+
+        with StubCloudServer(latency=0.05) as stub:
+            api = TemperatureHumidityAPI(stub.base_url)
+            api.get_token(stub.login_name, stub.password)
+            streams = build_streams("synthetic:depth", "synthetic:thermal", "synthetic", api, poll_interval=1.0)
+            run(duration, streams)
+            api.close()
+    else:
+        print(f"未知命令: {command}")
@@ -2,31 +2,78 @@
 温湿度云平台 API 客户端示例
 基于 Postman 集合中的接口实现
 """
+import asyncio
+import functools
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 云平台约定的成功状态码
+CODE_OK = 1000
+# 表示 Token 无效或过期的状态码。Postman 集合中没有给出错误码，
+# 这里按模拟服务和常见约定取值，收到后重新登录并重试一次
+AUTH_ERROR_CODES = (1001, 401, 403)
+AUTH_ERROR_STATUS = (401, 403)
 
 
 class TemperatureHumidityAPI:
-    """温湿度云平台 API 客户端"""
-    
-    def __init__(self, base_url: str = "https://www.0531yun.com/"):
+    """
+    温湿度云平台 API 客户端
+
+    所有请求共用一个 requests.Session 连接池，连接保持复用，不必每次重新握手；
+    Token 与过期时间一起缓存，过期前自动续期，收到 Token 失效的响应时自动重新登录并重试一次。
+    客户端可以在多个线程中同时使用
+    """
+
+    def __init__(self, base_url: str = "https://www.0531yun.com/", pool_size: int = 8,
+                 timeout: float = 10.0, refresh_margin: float = 60.0, verify=True):
         """
         初始化 API 客户端
-        
+
         Args:
             base_url: API 基础地址，默认为 https://www.0531yun.com/
+            pool_size: 连接池大小，即同时保持的最大连接数
+            timeout: 单个请求超时（秒）
+            refresh_margin: Token 过期前多少秒开始续期
+            verify: 是否校验服务器证书，或信任的 CA 证书文件路径
         """
         self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.verify = verify
+        self.refresh_margin = refresh_margin
         self.token: Optional[str] = None
-    
+        self.expiration: Optional[float] = None
+        self._renew_at: Optional[float] = None
+        self._credentials = None
+        self._token_lock = threading.Lock()
+        # 统计：发出的请求数和收到的响应体字节数
+        self.requests_sent = 0
+        self.bytes_received = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
     def get_token(self, login_name: str, password: str) -> Dict[str, Any]:
         """
-        根据用户名和密码获取 Token
-        
+        根据用户名和密码获取 Token，用户名和密码会被记住，用于之后自动续期
+
         Args:
             login_name: 用户名
             password: 密码
-            
+
         Returns:
             包含 token 和 expiration 的字典
         """
@@ -35,103 +82,397 @@ class TemperatureHumidityAPI:
             "loginName": login_name,
             "password": password
         }
-        
-        response = requests.get(url, params=params)
+
+        response = self.session.get(url, params=params, timeout=self.timeout, verify=self.verify)
+        self._count(response)
         response.raise_for_status()  # 如果状态码不是 200，抛出异常
-        
+
         data = response.json()
-        if data.get("code") == 1000:
+        if data.get("code") == CODE_OK:
             self.token = data["data"]["token"]
+            self.expiration = data["data"].get("expiration")
+            if self.expiration is not None:
+                # 有效期比续期提前量还短时改为在有效期过半时续期，避免每个请求都重新登录
+                now = time.time()
+                margin = min(self.refresh_margin, (self.expiration - now) / 2)
+                self._renew_at = self.expiration - margin
+            else:
+                self._renew_at = None
+            self._credentials = (login_name, password)
             return data["data"]
         else:
             raise Exception(f"获取 Token 失败: {data.get('message')}")
-    
+
+    def _count(self, response):
+        self.requests_sent += 1
+        self.bytes_received += len(response.content)
+
+    def _current_token(self) -> str:
+        """返回可用的 Token，快过期时先续期"""
+        token = self.token
+        if not token:
+            raise Exception("请先调用 get_token() 获取 Token")
+        if self._credentials and self._renew_at is not None and time.time() >= self._renew_at:
+            token = self._renew(token)
+        return token
+
+    def _renew(self, stale: str) -> str:
+        """
+        用记住的用户名和密码重新获取 Token
+
+        多个线程同时发现 Token 失效时只登录一次，其余线程直接使用新 Token
+        """
+        with self._token_lock:
+            if self.token == stale:
+                self.get_token(*self._credentials)
+            return self.token
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]], action: str) -> Any:
+        """
+        发送需要 Token 的 GET 请求，Token 失效时重新登录并重试一次
+
+        Args:
+            path: 接口路径
+            params: 查询参数
+            action: 出错时提示的操作名称
+        """
+        url = f"{self.base_url}{path}"
+        token = self._current_token()
+        for attempt in range(2):
+            response = self.session.get(url, headers={"Authorization": token}, params=params,
+                                        timeout=self.timeout, verify=self.verify)
+            self._count(response)
+            retry = attempt == 0 and self._credentials is not None
+            if response.status_code in AUTH_ERROR_STATUS and retry:
+                token = self._renew(token)
+                continue
+            response.raise_for_status()
+
+            data = response.json()
+            if data.get("code") == CODE_OK:
+                return data["data"]
+            if data.get("code") in AUTH_ERROR_CODES and retry:
+                token = self._renew(token)
+                continue
+            raise Exception(f"{action}失败: {data.get('message')}")
+
     def get_group_list(self) -> list:
         """
         获取设备分组列表
-        
+
         Returns:
             分组列表
         """
-        if not self.token:
-            raise Exception("请先调用 get_token() 获取 Token")
-        
-        url = f"{self.base_url}/api/device/getGroupList"
-        headers = {
-            "Authorization": self.token
-        }
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("code") == 1000:
-            return data["data"]
-        else:
-            raise Exception(f"获取分组列表失败: {data.get('message')}")
-    
+        return self._get("/api/device/getGroupList", None, "获取分组列表")
+
     def get_real_time_data(self, group_id: Optional[str] = None) -> list:
         """
         查询实时数据
-        
+
         Args:
             group_id: 分组ID，可选
-            
+
         Returns:
             实时数据列表
         """
-        if not self.token:
-            raise Exception("请先调用 get_token() 获取 Token")
-        
-        url = f"{self.base_url}/api/data/getRealTimeData"
-        headers = {
-            "Authorization": self.token
-        }
         params = {}
         if group_id:
             params["groupId"] = group_id
-        
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
-        if data.get("code") == 1000:
-            return data["data"]
-        else:
-            raise Exception(f"获取实时数据失败: {data.get('message')}")
+        return self._get("/api/data/getRealTimeData", params, "获取实时数据")
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncTemperatureHumidityAPI:
+    """
+    asyncio 版本的温湿度云平台客户端
+
+    请求在专用线程池中执行，所有线程共用同一个 TemperatureHumidityAPI 的连接池和 Token，
+    线程数与连接池大小相同，并发请求不会超出连接池而新建连接
+    """
+
+    def __init__(self, base_url: str = "https://www.0531yun.com/", pool_size: int = 8,
+                 timeout: float = 10.0, refresh_margin: float = 60.0, verify=True):
+        """
+        Args:
+            base_url: API 基础地址
+            pool_size: 连接池大小，也是最大并发请求数
+            timeout: 单个请求超时（秒）
+            refresh_margin: Token 过期前多少秒开始续期
+            verify: 是否校验服务器证书，或信任的 CA 证书文件路径
+        """
+        self.api = TemperatureHumidityAPI(base_url, pool_size=pool_size, timeout=timeout,
+                                          refresh_margin=refresh_margin, verify=verify)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="th-api")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def get_token(self, login_name: str, password: str) -> Dict[str, Any]:
+        return await self._run(self.api.get_token, login_name, password)
+
+    async def get_group_list(self) -> list:
+        return await self._run(self.api.get_group_list)
+
+    async def get_real_time_data(self, group_id: Optional[str] = None) -> list:
+        return await self._run(self.api.get_real_time_data, group_id)
+
+    async def get_real_time_data_many(self, group_ids: List[str],
+                                      return_exceptions: bool = False) -> Dict[str, Any]:
+        """
+        同时查询多个分组的实时数据
+
+        Args:
+            group_ids: 分组ID列表
+            return_exceptions: True 时某个分组出错不影响其他分组，错误作为该分组的结果返回
+
+        Returns:
+            {分组ID: 实时数据列表}
+        """
+        results = await asyncio.gather(*(self.get_real_time_data(g) for g in group_ids),
+                                       return_exceptions=return_exceptions)
+        return dict(zip(group_ids, results))
+
+    async def poll(self, group_ids: List[str], interval: float, rounds: Optional[int] = None):
+        """
+        按固定间隔轮询多个分组的实时数据
+
+        Args:
+            group_ids: 分组ID列表
+            interval: 轮询间隔（秒），从每轮开始时计算
+            rounds: 轮询次数，None 表示一直轮询
+
+        Yields:
+            (时间戳, {分组ID: 实时数据列表或异常})
+        """
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        count = 0
+        while rounds is None or count < rounds:
+            timestamp = time.time()
+            yield timestamp, await self.get_real_time_data_many(group_ids, return_exceptions=True)
+            count += 1
+            next_time += interval
+            await asyncio.sleep(max(0.0, next_time - loop.time()))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.api.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def print_real_time_data(real_time_data):
+    """打印实时数据"""
+    print(f"找到 {len(real_time_data)} 个设备的数据:")
+    for device in real_time_data:
+        print(f"\n设备: {device['deviceName']} (地址: {device['deviceAddr']})")
+        print(f"状态: {device['deviceStatus']}")
+        if device.get('dataItem'):
+            for node in device['dataItem']:
+                for register in node.get('registerItem', []):
+                    print(f"  {register['registerName']}: {register['data']} {register['unit']}")
+
+
+def check_against_stub():
+    """
+    在本地模拟服务上检查连接复用、Token 续期、失效重登录和并发查询
+
+    Returns:
+        全部通过返回 True
+    """
+    from examples.temperature_humidity_stub import StubCloudServer
+
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"  [{'通过' if ok else '失败'}] {name}" + (f"（{detail}）" if detail else ""))
+
+    with StubCloudServer(token_ttl=3, groups=8) as stub:
+        with TemperatureHumidityAPI(stub.base_url, refresh_margin=1.0) as api:
+            api.get_token(stub.login_name, stub.password)
+            groups = api.get_group_list()
+            for group in groups:
+                api.get_real_time_data(group["groupId"])
+            check("顺序请求复用同一个连接", stub.connections == 1,
+                  f"{stub.requests} 个请求，{stub.connections} 个连接")
+
+            data = api.get_real_time_data(groups[0]["groupId"])
+            check("按分组查询", len(data) == 2 and all(d["groupId"] == groups[0]["groupId"] for d in data))
+
+            logins = stub.logins
+            time.sleep(2.2)
+            api.get_group_list()
+            check("Token 过期前自动续期", stub.logins == logins + 1 and stub.rejected == 0,
+                  f"登录 {stub.logins - logins} 次，被拒绝 {stub.rejected} 次")
+
+            stub.revoke_tokens()
+            api.get_group_list()
+            check("Token 失效后重新登录并重试", stub.logins == logins + 2 and stub.rejected == 1,
+                  f"被拒绝 {stub.rejected} 次后重新登录")
+
+            bare = TemperatureHumidityAPI(stub.base_url)
+            bare.token = "invalid"
+            try:
+                bare.get_group_list()
+                check("没有用户名密码时不自动重试", False)
+            except Exception as e:
+                check("没有用户名密码时不自动重试", "失败" in str(e), str(e))
+            bare.close()
+
+        stub.reset_stats()
+
+        async def concurrent():
+            async with AsyncTemperatureHumidityAPI(stub.base_url, pool_size=4) as client:
+                await client.get_token(stub.login_name, stub.password)
+                group_ids = [g["groupId"] for g in await client.get_group_list()]
+                stub.revoke_tokens()
+                return group_ids, await client.get_real_time_data_many(group_ids)
+
+        group_ids, many = asyncio.run(concurrent())
+        check("并发查询所有分组", all(len(many[g]) == 2 for g in group_ids), f"{len(group_ids)} 个分组")
+        check("并发请求同时遇到 Token 失效只重新登录一次", stub.logins == 2,
+              f"登录 {stub.logins} 次（含首次）")
+        check("并发连接数不超过连接池大小", stub.connections <= 4, f"{stub.connections} 个连接")
+
+    passed = all(results)
+    print(f"\n{sum(results)}/{len(results)} 项通过")
+    return passed
+
+
+def benchmark(groups=16, rounds=5, latency=0.02, pool_size=8, tls=False):
+    """
+    在本地模拟服务上比较三种查询方式轮询所有分组的耗时和连接数：
+    每次 requests.get（原实现）、共用连接池顺序查询、asyncio 并发查询
+
+    Args:
+        groups: 分组数量
+        rounds: 轮询轮数
+        latency: 模拟服务每个请求的处理延迟（秒）
+        pool_size: 连接池大小
+        tls: 使用 HTTPS（需要 openssl 命令生成自签名证书），与云平台一样每个新连接都要 TLS 握手
+    """
+    from examples.temperature_humidity_stub import StubCloudServer, make_self_signed_cert
+
+    certfile = make_self_signed_cert() if tls else None
+    # 自签名证书只用于本地测试，客户端用它作为信任的 CA
+    verify = certfile or True
+    with StubCloudServer(groups=groups, latency=latency, certfile=certfile) as stub:
+        api = TemperatureHumidityAPI(stub.base_url, pool_size=pool_size, verify=verify)
+        api.get_token(stub.login_name, stub.password)
+        group_ids = [g["groupId"] for g in api.get_group_list()]
+        url = f"{api.base_url}/api/data/getRealTimeData"
+        print(f"{groups} 个分组 x {rounds} 轮，{'HTTPS' if tls else 'HTTP'}，"
+              f"模拟服务处理延迟 {latency * 1000:.0f} ms")
+
+        def bare_get():
+            for group_id in group_ids:
+                requests.get(url, headers={"Authorization": api.token}, params={"groupId": group_id},
+                             verify=verify).json()
+
+        def pooled():
+            for group_id in group_ids:
+                api.get_real_time_data(group_id)
+
+        async def concurrent():
+            async with AsyncTemperatureHumidityAPI(stub.base_url, pool_size=pool_size,
+                                                   verify=verify) as client:
+                await client.get_token(stub.login_name, stub.password)
+                stub.reset_stats()
+                t0 = time.perf_counter()
+                for _ in range(rounds):
+                    await client.get_real_time_data_many(group_ids)
+                return time.perf_counter() - t0
+
+        for label, func in (("每次 requests.get", bare_get), ("连接池顺序查询", pooled)):
+            stub.reset_stats()
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                func()
+            elapsed = time.perf_counter() - t0
+            print(f"  {label}: 每轮 {elapsed / rounds * 1000:.0f} ms，新建连接 {stub.connections} 个")
+        api.close()
+
+        elapsed = asyncio.run(concurrent())
+        print(f"  asyncio 并发查询: 每轮 {elapsed / rounds * 1000:.0f} ms，新建连接 {stub.connections} 个")
+
+    if certfile:
+        shutil.rmtree(os.path.dirname(certfile), ignore_errors=True)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        command = sys.argv[1]
+        if command == "check":
+            sys.exit(0 if check_against_stub() else 1)
+        elif command == "bench":
+            groups = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+            benchmark(groups, tls="tls" in sys.argv[3:])
+        elif command == "poll":
+            interval = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+            base_url = sys.argv[3] if len(sys.argv) > 3 else "https://www.0531yun.com/"
+
+            async def poll():
+                async with AsyncTemperatureHumidityAPI(base_url) as client:
+                    await client.get_token("h251225krt", "h251225krt")
+                    group_ids = [g["groupId"] for g in await client.get_group_list()]
+                    print(f"轮询 {len(group_ids)} 个分组，间隔 {interval} 秒，按 Ctrl+C 停止")
+                    async for timestamp, results in client.poll(group_ids, interval):
+                        print(f"\n{time.strftime('%H:%M:%S', time.localtime(timestamp))}")
+                        for group_id, data in results.items():
+                            if isinstance(data, Exception):
+                                print(f"  分组 {group_id}: 错误 {data}")
+                            else:
+                                print_real_time_data(data)
+
+            try:
+                asyncio.run(poll())
+            except KeyboardInterrupt:
+                pass
+        else:
+            print("用法:")
+            print("  python temperature_humidity_api.py  # 运行使用示例")
+            print("  python temperature_humidity_api.py poll [间隔秒] [API地址]  # 并发轮询所有分组")
+            print("  python temperature_humidity_api.py check  # 在本地模拟服务上检查续期、重登录和连接复用")
+            print("  python temperature_humidity_api.py bench [分组数] [tls]  # 比较三种查询方式的耗时和连接数")
+        sys.exit(0)
+
     # 使用示例
     api = TemperatureHumidityAPI()
-    
+
     try:
         # 1. 获取 Token
         print("正在获取 Token...")
         token_data = api.get_token("h251225krt", "h251225krt")
         print(f"Token 获取成功，过期时间: {token_data['expiration']}")
-        
+
         # 2. 获取设备分组列表
         print("\n正在获取设备分组列表...")
         groups = api.get_group_list()
         print(f"找到 {len(groups)} 个分组:")
         for group in groups:
             print(f"  - {group['groupName']} (ID: {group['groupId']})")
-        
+
         # 3. 查询实时数据
         print("\n正在查询实时数据...")
         real_time_data = api.get_real_time_data()
-        print(f"找到 {len(real_time_data)} 个设备的数据:")
-        for device in real_time_data:
-            print(f"\n设备: {device['deviceName']} (地址: {device['deviceAddr']})")
-            print(f"状态: {device['deviceStatus']}")
-            if device.get('dataItem'):
-                for node in device['dataItem']:
-                    for register in node.get('registerItem', []):
-                        print(f"  {register['registerName']}: {register['data']} {register['unit']}")
-        
+        print_real_time_data(real_time_data)
+
     except requests.exceptions.RequestException as e:
         print(f"请求错误: {e}")
     except Exception as e:
         print(f"错误: {e}")
-
@@ -0,0 +1,318 @@
+"""
+温湿度变化检测轮询
+大部分查询返回的数据与上一次相同。轮询器记录每个设备、寄存器的上一次数值，
+设备时间戳没有变化时直接跳过该设备，只把变化的数值、越过阈值和报警等级变化发布给订阅者；
+轮询间隔按设备实际上报的频率自动调整，并统计节省的请求数和字节数
+"""
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.temperature_humidity_api import TemperatureHumidityAPI
+
+
+@dataclass
+class Change:
+    """一个寄存器的数值变化"""
+    device: int
+    node: int
+    register: int
+    name: str
+    unit: str
+    value: float
+    # 上一次发布的数值，首次出现时为 None
+    previous: Optional[float]
+    # 设备上报时间（毫秒时间戳）
+    timestamp: int
+    # 越过的阈值和方向，如 (30.0, "up")
+    crossed: Optional[Tuple[float, str]] = None
+    alarm_level: int = 0
+
+    def to_json(self):
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+class ChangePoller:
+    """
+    变化检测轮询器
+
+    每次查询后逐个设备比较 timeStamp，没有新上报的设备不再解析；有新上报时逐个寄存器比较，
+    变化量达到死区、越过阈值或报警等级变化时生成 Change，按订阅条件分发。
+    轮询间隔取最快设备上报周期（指数平均）的一半，连续查询没有新数据时逐步放宽，限制在
+    [min_interval, max_interval] 之间
+    """
+
+    def __init__(self, api: TemperatureHumidityAPI, interval=5.0, min_interval=1.0, max_interval=60.0,
+                 group_id=None, deadband: Optional[Dict[str, float]] = None,
+                 thresholds: Optional[Dict[str, List[float]]] = None):
+        """
+        Args:
+            api: 已获取 Token 的 API 客户端
+            interval: 初始轮询间隔（秒），也作为统计节省请求数时的固定间隔基准
+            min_interval: 最短轮询间隔（秒）
+            max_interval: 最长轮询间隔（秒）
+            group_id: 只查询指定分组，None 表示所有设备
+            deadband: {寄存器名称: 最小变化量}，如 {"温度": 0.1}；未列出的寄存器任何变化都发布
+            thresholds: {寄存器名称: [阈值, ...]}，数值越过阈值时即使在死区内也发布
+        """
+        self.api = api
+        self.base_interval = interval
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.group_id = group_id
+        self.deadband = deadband or {}
+        self.thresholds = thresholds or {}
+
+        self._device_time: Dict[int, int] = {}
+        # 设备上报周期（秒）的指数平均
+        self._period: Dict[int, float] = {}
+        self._published: Dict[Tuple[int, int, int], float] = {}
+        self._raw: Dict[Tuple[int, int, int], float] = {}
+        self._alarm: Dict[Tuple[int, int, int], int] = {}
+        self._subscribers = []
+        self._stop = threading.Event()
+
+        self.polls = 0
+        self.polls_unchanged = 0
+        self.devices_seen = 0
+        self.devices_skipped = 0
+        self.changes = 0
+        self.payload_bytes = 0
+        self.published_bytes = 0
+        self.started = None
+
+    def subscribe(self, callback, devices=None, registers=None):
+        """
+        订阅变化
+
+        Args:
+            callback: 回调函数，参数为本次查询中符合条件的 Change 列表（没有变化时不调用）
+            devices: 只接收这些设备地址的变化，None 表示全部
+            registers: 只接收这些寄存器名称的变化，None 表示全部
+        """
+        devices = None if devices is None else {int(d) for d in devices}
+        registers = None if registers is None else set(registers)
+        self._subscribers.append((callback, devices, registers))
+
+    def _check(self, addr, timestamp, node_id, register) -> Optional[Change]:
+        value = register.get("value")
+        if value is None:
+            return None
+        key = (addr, node_id, int(register["registerId"]))
+        name = register.get("registerName", "")
+        level = int(register.get("alarmLevel") or 0)
+        previous = self._published.get(key)
+        raw = self._raw.get(key)
+
+        crossed = None
+        if raw is not None:
+            for threshold in self.thresholds.get(name, ()):
+                if (raw < threshold) != (value < threshold):
+                    crossed = (threshold, "up" if value >= threshold else "down")
+                    break
+        changed = previous is None or (value != previous and abs(value - previous) >= self.deadband.get(name, 0.0))
+        alarm_changed = level != self._alarm.get(key, 0)
+        self._raw[key] = value
+        self._alarm[key] = level
+        if not (changed or crossed or alarm_changed):
+            return None
+        self._published[key] = value
+        return Change(device=addr, node=node_id, register=key[2], name=name, unit=register.get("unit", ""),
+                      value=value, previous=previous, timestamp=timestamp, crossed=crossed, alarm_level=level)
+
+    def poll_once(self) -> List[Change]:
+        """
+        查询一次并发布变化
+
+        Returns:
+            本次查询得到的所有 Change
+        """
+        before = self.api.bytes_received
+        data = self.api.get_real_time_data(self.group_id)
+        self.payload_bytes += self.api.bytes_received - before
+        self.polls += 1
+
+        changes = []
+        fresh = False
+        for device in data:
+            addr = int(device["deviceAddr"])
+            timestamp = device.get("timeStamp")
+            last = self._device_time.get(addr)
+            self.devices_seen += 1
+            if timestamp is not None and timestamp == last:
+                # 设备没有新上报，数值不可能变化，不再解析
+                self.devices_skipped += 1
+                continue
+            fresh = True
+            if timestamp is not None and last is not None and timestamp > last:
+                period = (timestamp - last) / 1000.0
+                average = self._period.get(addr)
+                self._period[addr] = period if average is None else 0.7 * average + 0.3 * period
+            self._device_time[addr] = timestamp
+            for node in device.get("dataItem") or []:
+                for register in node.get("registerItem") or []:
+                    change = self._check(addr, timestamp, int(node["nodeId"]), register)
+                    if change is not None:
+                        changes.append(change)
+
+        if not fresh:
+            self.polls_unchanged += 1
+        self.changes += len(changes)
+        if changes:
+            self.published_bytes += sum(len(c.to_json().encode("utf-8")) for c in changes)
+            self._publish(changes)
+        self._adapt(fresh)
+        return changes
+
+    def _publish(self, changes):
+        for callback, devices, registers in self._subscribers:
+            selected = [c for c in changes
+                        if (devices is None or c.device in devices)
+                        and (registers is None or c.name in registers)]
+            if selected:
+                try:
+                    callback(selected)
+                except Exception as e:
+                    print(f"订阅回调出错: {e}")
+
+    def _adapt(self, fresh):
+        """按设备上报周期调整轮询间隔"""
+        if fresh and self._period:
+            # 以上报周期的一半轮询，新数据最多延迟半个周期被发现
+            interval = min(self._period.values()) / 2
+        elif not fresh:
+            interval = self.interval * 1.25
+        else:
+            return
+        self.interval = min(self.max_interval, max(self.min_interval, interval))
+
+    def run(self, duration=None):
+        """
+        持续轮询，直到 stop() 或达到时长
+
+        Args:
+            duration: 轮询时长（秒），None 表示一直轮询
+        """
+        self._stop.clear()
+        self.started = time.monotonic()
+        deadline = None if duration is None else self.started + duration
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"查询失败: {e}")
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    break
+            self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()
+
+    def report(self):
+        """
+        打印并返回统计：与按固定间隔轮询相比节省的请求数和字节数，
+        以及订阅者收到的数据量与完整响应的比较
+        """
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        baseline = max(self.polls, int(elapsed / self.base_interval) + 1)
+        saved_requests = baseline - self.polls
+        per_poll = self.payload_bytes / self.polls if self.polls else 0.0
+        stats = {
+            "elapsed": elapsed,
+            "polls": self.polls,
+            "baseline_polls": baseline,
+            "saved_requests": saved_requests,
+            "saved_bytes": int(saved_requests * per_poll),
+            "payload_bytes": self.payload_bytes,
+            "published_bytes": self.published_bytes,
+            "devices_skipped": self.devices_skipped,
+            "devices_seen": self.devices_seen,
+            "changes": self.changes,
+            "interval": self.interval,
+        }
+        print(f"运行 {elapsed:.0f} 秒，查询 {self.polls} 次（固定 {self.base_interval} 秒间隔需要 {baseline} 次），"
+              f"节省 {saved_requests} 次请求、约 {stats['saved_bytes'] / 1024:.1f} KB")
+        print(f"其中 {self.polls_unchanged} 次没有新数据；{self.devices_skipped}/{self.devices_seen} 个设备读数"
+              f"因时间戳未变跳过解析")
+        if self.payload_bytes:
+            print(f"订阅者收到 {self.changes} 个变化共 {self.published_bytes / 1024:.1f} KB，"
+                  f"完整响应 {self.payload_bytes / 1024:.1f} KB（{self.published_bytes / self.payload_bytes:.1%}）")
+        print(f"当前轮询间隔 {self.interval:.1f} 秒")
+        return stats
+
+
+def print_changes(changes):
+    for c in changes:
+        stamp = time.strftime("%H:%M:%S", time.localtime(c.timestamp / 1000)) if c.timestamp else "--"
+        line = f"{stamp} 设备 {c.device} {c.name}: {c.previous} → {c.value} {c.unit}"
+        if c.crossed:
+            line += f"  {'超过' if c.crossed[1] == 'up' else '低于'}阈值 {c.crossed[0]}"
+        if c.alarm_level:
+            line += f"  报警等级 {c.alarm_level}"
+        print(line)
+
+
+def simulate(duration=60.0, update_period=10.0, interval=1.0):
+    """
+    在本地模拟服务上运行：设备每 update_period 秒上报一次，比较自适应轮询与固定间隔轮询
+
+    Args:
+        duration: 运行时长（秒）
+        update_period: 模拟设备上报周期（秒）
+        interval: 初始轮询间隔（秒）
+    """
+    from examples.temperature_humidity_stub import StubCloudServer
+
+    with StubCloudServer(groups=4, update_period=update_period) as stub:
+        with TemperatureHumidityAPI(stub.base_url) as api:
+            api.get_token(stub.login_name, stub.password)
+            poller = ChangePoller(api, interval=interval, min_interval=interval / 2,
+                                  deadband={"温度": 0.1, "湿度": 0.5}, thresholds={"温度": [24.0]})
+            poller.subscribe(print_changes, registers=["温度"])
+            print(f"模拟设备每 {update_period} 秒上报一次，初始轮询间隔 {interval} 秒，运行 {duration} 秒")
+            poller.run(duration)
+            print()
+            poller.report()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python temperature_humidity_poller.py run [初始间隔秒]  # 轮询云平台，只打印变化")
+        print("  python temperature_humidity_poller.py sim [秒数] [上报周期秒]  # 无需网络：在本地模拟服务上运行")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "run":
+        interval = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+        api = TemperatureHumidityAPI()
+        api.get_token("h251225krt", "h251225krt")
+        poller = ChangePoller(api, interval=interval)
+        poller.subscribe(print_changes)
+        print("开始轮询，按 Ctrl+C 停止")
+        try:
+            poller.run()
+        except KeyboardInterrupt:
+            pass
+        print()
+        poller.report()
+        api.close()
+    elif command == "sim":
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else 60.0
+        update_period = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+        simulate(duration, update_period)
+    else:
+        print(f"未知命令: {command}")
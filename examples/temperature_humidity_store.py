@@ -0,0 +1,554 @@
+"""
+温湿度历史数据存储
+把 get_real_time_data() 返回的 设备 → dataItem → registerItem 嵌套结构展开为列式数组
+(时间戳, 设备地址, 节点, 寄存器, 数值)，按序列（设备 + 寄存器）和日期分块追加到磁盘，
+按时间范围查询和降采样时只读取涉及的日期文件，用 NumPy 向量化计算
+"""
+import calendar
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 每条记录 12 字节：毫秒时间戳 + 数值
+RECORD = np.dtype([("t", "<i8"), ("v", "<f4")])
+DAY_MS = 86400 * 1000
+COLUMNS = ("timestamp", "device", "node", "register", "value")
+# 降采样使用的每分钟汇总
+ROLLUP = np.dtype([("t", "<i8"), ("sum", "<f8"), ("min", "<f4"), ("max", "<f4"), ("count", "<i4")])
+ROLLUP_MS = 60 * 1000
+
+
+def flatten(real_time_data) -> Tuple[Dict[str, np.ndarray], Dict[Tuple[int, int, int], Tuple[str, str]]]:
+    """
+    把一次实时数据查询的结果展开为列式数组
+
+    Args:
+        real_time_data: get_real_time_data() 的返回值
+
+    Returns:
+        (columns, names)
+        columns: {"timestamp": int64 毫秒, "device": int64, "node": int16, "register": int16, "value": float32}
+        names: {(设备地址, 节点, 寄存器): (寄存器名称, 单位)}
+    """
+    rows = []
+    names = {}
+    for device in real_time_data:
+        addr = int(device["deviceAddr"])
+        timestamp = int(device.get("timeStamp") or time.time() * 1000)
+        for node in device.get("dataItem") or []:
+            node_id = int(node["nodeId"])
+            for register in node.get("registerItem") or []:
+                value = register.get("value")
+                if value is None:
+                    continue
+                register_id = int(register["registerId"])
+                rows.append((timestamp, addr, node_id, register_id, value))
+                names[(addr, node_id, register_id)] = (register.get("registerName", ""), register.get("unit", ""))
+    if rows:
+        t, d, n, r, v = zip(*rows)
+    else:
+        t = d = n = r = v = ()
+    columns = {
+        "timestamp": np.array(t, dtype=np.int64),
+        "device": np.array(d, dtype=np.int64),
+        "node": np.array(n, dtype=np.int16),
+        "register": np.array(r, dtype=np.int16),
+        "value": np.array(v, dtype=np.float32),
+    }
+    return columns, names
+
+
+def _aggregate(t, v, bucket_ms):
+    """把按时间排序的原始读数汇总到时间桶"""
+    if len(t) == 0:
+        return np.empty(0, dtype=ROLLUP)
+    index = t // bucket_ms
+    starts = np.concatenate(([0], np.flatnonzero(index[1:] != index[:-1]) + 1))
+    result = np.empty(len(starts), dtype=ROLLUP)
+    result["t"] = index[starts] * bucket_ms
+    result["sum"] = np.add.reduceat(v, starts, dtype=np.float64)
+    result["min"] = np.minimum.reduceat(v, starts)
+    result["max"] = np.maximum.reduceat(v, starts)
+    result["count"] = np.diff(np.concatenate((starts, [len(t)])))
+    return result
+
+
+def _combine(rollup, bucket_ms):
+    """把细粒度的汇总合并到更长的时间桶"""
+    if len(rollup) == 0:
+        return rollup
+    index = rollup["t"] // bucket_ms
+    starts = np.concatenate(([0], np.flatnonzero(index[1:] != index[:-1]) + 1))
+    result = np.empty(len(starts), dtype=ROLLUP)
+    result["t"] = index[starts] * bucket_ms
+    result["sum"] = np.add.reduceat(rollup["sum"], starts)
+    result["min"] = np.minimum.reduceat(rollup["min"], starts)
+    result["max"] = np.maximum.reduceat(rollup["max"], starts)
+    result["count"] = np.add.reduceat(rollup["count"], starts)
+    return result
+
+
+def _day_name(day):
+    return time.strftime("%Y%m%d", time.gmtime(day * 86400))
+
+
+class TimeSeriesStore:
+    """
+    列式温湿度时间序列存储
+
+    目录结构为 {root}/{设备地址}/{节点}-{寄存器}/{YYYYMMDD}.bin（UTC 日期），
+    每个文件是按时间排序的 (t, v) 定长记录，只追加不改写；序列的名称和单位记录在 {root}/catalog.json。
+    写入先进入内存缓冲区，累计到一定行数或时间后批量追加。
+    云平台在设备没有上报新数据时返回相同的时间戳，这类重复读数不会重复写入
+    """
+
+    def __init__(self, root, flush_rows=4096, flush_interval=10.0):
+        """
+        Args:
+            root: 存储目录
+            flush_rows: 缓冲区累计多少行后写盘
+            flush_interval: 距上次写盘多少秒后写盘
+        """
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.catalog_file = os.path.join(root, "catalog.json")
+        os.makedirs(root, exist_ok=True)
+        self.catalog = self._load_catalog()
+        self._buffer: List[Dict[str, np.ndarray]] = []
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        # 每个序列最后写入的时间戳，用于去重
+        self._last: Dict[Tuple[int, str], int] = {}
+        self._checked_files = set()
+        self.written = 0
+        self.duplicates = 0
+
+    def _load_catalog(self):
+        if not os.path.exists(self.catalog_file):
+            return {}
+        with open(self.catalog_file, encoding="utf-8") as f:
+            return json.load(f)["series"]
+
+    def _save_catalog(self):
+        tmp = self.catalog_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"series": self.catalog}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.catalog_file)
+
+    def _series_dir(self, device, key):
+        return os.path.join(self.root, str(device), key)
+
+    def _days(self, device, key):
+        """序列已有的日期文件（按日期排序）"""
+        directory = self._series_dir(device, key)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if name.endswith(".bin"))
+
+    def _read(self, path):
+        # 写入中断时文件末尾可能有不完整的记录，只读取完整部分
+        count = os.path.getsize(path) // RECORD.itemsize
+        return np.fromfile(path, dtype=RECORD, count=count)
+
+    def _last_timestamp(self, device, key):
+        if (device, key) not in self._last:
+            days = self._days(device, key)
+            last = -1
+            if days:
+                records = self._read(os.path.join(self._series_dir(device, key), days[-1]))
+                if len(records):
+                    last = int(records["t"][-1])
+            self._last[(device, key)] = last
+        return self._last[(device, key)]
+
+    def ingest(self, real_time_data):
+        """
+        写入一次实时数据查询的结果
+
+        Args:
+            real_time_data: get_real_time_data() 的返回值
+        """
+        columns, names = flatten(real_time_data)
+        changed = False
+        for (device, node, register), (name, unit) in names.items():
+            series = f"{device}/{node}-{register}"
+            if self.catalog.get(series) != {"name": name, "unit": unit}:
+                self.catalog[series] = {"name": name, "unit": unit}
+                changed = True
+        if changed:
+            self._save_catalog()
+        self.append(columns)
+
+    def append(self, columns):
+        """
+        追加列式数据
+
+        Args:
+            columns: flatten() 返回的列，各列长度相同
+        """
+        if len(columns["timestamp"]) == 0:
+            return
+        self._buffer.append(columns)
+        self._buffered += len(columns["timestamp"])
+        if (self._buffered >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的数据按序列和日期批量追加到文件"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        merged = {name: np.concatenate([c[name] for c in self._buffer]) for name in COLUMNS}
+        self._buffer = []
+        self._buffered = 0
+
+        # 按 (设备, 节点, 寄存器, 时间) 排序后，每个序列、每天的数据是连续的一段
+        order = np.lexsort((merged["timestamp"], merged["register"], merged["node"], merged["device"]))
+        t = merged["timestamp"][order]
+        device = merged["device"][order]
+        node = merged["node"][order]
+        register = merged["register"][order]
+        value = merged["value"][order]
+        day = t // DAY_MS
+        boundary = ((device[1:] != device[:-1]) | (node[1:] != node[:-1])
+                    | (register[1:] != register[:-1]) | (day[1:] != day[:-1]))
+        starts = np.concatenate(([0], np.flatnonzero(boundary) + 1, [len(t)]))
+
+        for begin, end in zip(starts[:-1], starts[1:]):
+            dev = int(device[begin])
+            key = f"{int(node[begin])}-{int(register[begin])}"
+            ts = t[begin:end]
+            # 只保留比已写入数据更新的读数，同一时间戳只写一次
+            last = self._last_timestamp(dev, key)
+            keep = ts > np.maximum.accumulate(np.concatenate(([last], ts[:-1])))
+            self.duplicates += int(len(ts) - keep.sum())
+            if not keep.any():
+                continue
+            records = np.empty(int(keep.sum()), dtype=RECORD)
+            records["t"] = ts[keep]
+            records["v"] = value[begin:end][keep]
+            self._write(dev, key, _day_name(int(day[begin])), records)
+            self._last[(dev, key)] = int(records["t"][-1])
+            self.written += len(records)
+
+    def _write(self, device, key, day_name, records):
+        directory = self._series_dir(device, key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, day_name + ".bin")
+        if path not in self._checked_files:
+            # 上次写入中断留下的不完整记录先截掉，保证记录对齐
+            if os.path.exists(path):
+                size = os.path.getsize(path)
+                if size % RECORD.itemsize:
+                    with open(path, "r+b") as f:
+                        f.truncate(size - size % RECORD.itemsize)
+            self._checked_files.add(path)
+        with open(path, "ab") as f:
+            f.write(records.tobytes())
+
+    def series(self):
+        """
+        所有序列
+
+        Returns:
+            [(设备地址, "节点-寄存器", 名称, 单位), ...]
+        """
+        result = []
+        for series, info in sorted(self.catalog.items()):
+            device, key = series.split("/")
+            result.append((int(device), key, info["name"], info["unit"]))
+        return result
+
+    def _resolve(self, device, register):
+        """寄存器可以是 "节点-寄存器" 或名称（如 "温度"）"""
+        register = str(register)
+        if "-" in register:
+            return register
+        for dev, key, name, _ in self.series():
+            if dev == int(device) and name == register:
+                return key
+        raise LookupError(f"设备 {device} 没有名为 '{register}' 的寄存器")
+
+    def _files(self, device, key, start_ms, end_ms):
+        """
+        与时间范围相交的日期文件
+
+        Yields:
+            (文件路径, 当天起始毫秒时间戳, 是否已写完)；序列只追加更新的读数，
+            一旦出现更晚日期的文件，之前的文件就不会再变化
+        """
+        directory = self._series_dir(device, key)
+        days = self._days(device, key)
+        first = None if start_ms is None else _day_name(start_ms // DAY_MS)
+        last = None if end_ms is None else _day_name((end_ms - 1) // DAY_MS)
+        for i, name in enumerate(days):
+            day = name[:-4]
+            if (first is not None and day < first) or (last is not None and day > last):
+                continue
+            day_start = calendar.timegm(time.strptime(day, "%Y%m%d"))
+            yield os.path.join(directory, name), day_start * 1000, i < len(days) - 1
+
+    def _slice(self, path, start_ms, end_ms):
+        records = self._read(path)
+        t = records["t"]
+        lo = 0 if start_ms is None else np.searchsorted(t, start_ms, side="left")
+        hi = len(t) if end_ms is None else np.searchsorted(t, end_ms, side="left")
+        return records[lo:hi]
+
+    def _rollup(self, path):
+        """已写完的日期文件的每分钟汇总，第一次使用时计算并缓存到 .rollup 文件"""
+        cache = path[:-4] + ".rollup"
+        if os.path.exists(cache):
+            return np.fromfile(cache, dtype=ROLLUP)
+        records = self._read(path)
+        rollup = _aggregate(records["t"], records["v"], ROLLUP_MS)
+        tmp = cache + ".tmp"
+        rollup.tofile(tmp)
+        os.replace(tmp, cache)
+        return rollup
+
+    def query(self, device, register, start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        查询时间范围内的原始读数，尚未写盘的缓冲数据不包括在内
+
+        Args:
+            device: 设备地址
+            register: "节点-寄存器" 或寄存器名称
+            start: 起始时间（Unix 时间戳，秒，含），None 表示最早
+            end: 结束时间（Unix 时间戳，秒，不含），None 表示最新
+
+        Returns:
+            (毫秒时间戳 int64 数组, 数值 float32 数组)
+        """
+        device = int(device)
+        key = self._resolve(device, register)
+        start_ms = None if start is None else int(start * 1000)
+        end_ms = None if end is None else int(end * 1000)
+        chunks = [self._slice(path, start_ms, end_ms) for path, _, _ in self._files(device, key, start_ms, end_ms)]
+        if not chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return (np.concatenate([c["t"] for c in chunks]),
+                np.concatenate([c["v"] for c in chunks]))
+
+    def downsample(self, device, register, bucket, start=None, end=None) -> Dict[str, np.ndarray]:
+        """
+        按固定时间桶降采样
+
+        桶长度是整分钟时，已写完且完整落在范围内的日期直接使用每分钟汇总，
+        查询几个月的数据也只需读取十几万条汇总
+
+        Args:
+            device: 设备地址
+            register: "节点-寄存器" 或寄存器名称
+            bucket: 时间桶长度（秒），桶边界与 Unix 时间对齐
+            start: 起始时间（Unix 时间戳，秒）
+            end: 结束时间（Unix 时间戳，秒）
+
+        Returns:
+            {"t": 桶起始毫秒时间戳, "mean", "min", "max", "count"}，只包含有数据的桶
+        """
+        device = int(device)
+        key = self._resolve(device, register)
+        bucket_ms = int(bucket * 1000)
+        start_ms = None if start is None else int(start * 1000)
+        end_ms = None if end is None else int(end * 1000)
+
+        parts = []
+        for path, day_start, closed in self._files(device, key, start_ms, end_ms):
+            covered = ((start_ms is None or start_ms <= day_start)
+                       and (end_ms is None or end_ms >= day_start + DAY_MS))
+            if bucket_ms % ROLLUP_MS == 0 and closed and covered:
+                parts.append(self._rollup(path))
+            else:
+                records = self._slice(path, start_ms, end_ms)
+                step = ROLLUP_MS if bucket_ms % ROLLUP_MS == 0 else bucket_ms
+                parts.append(_aggregate(records["t"], records["v"], step))
+        result = _combine(np.concatenate(parts) if parts else np.empty(0, dtype=ROLLUP), bucket_ms)
+        return {
+            "t": result["t"],
+            "mean": result["sum"] / np.maximum(result["count"], 1),
+            "min": result["min"],
+            "max": result["max"],
+            "count": result["count"].astype(np.int64),
+        }
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def record(store_dir="th_history", interval=5.0, login_name="h251225krt", password="h251225krt",
+           base_url="https://www.0531yun.com/"):
+    """
+    定时查询云平台实时数据并写入历史存储，按 Ctrl+C 停止
+
+    Args:
+        store_dir: 存储目录
+        interval: 查询间隔（秒）
+        login_name: 用户名
+        password: 密码
+        base_url: API 基础地址
+    """
+    from examples.temperature_humidity_api import TemperatureHumidityAPI
+
+    with TemperatureHumidityAPI(base_url) as api, TimeSeriesStore(store_dir) as store:
+        api.get_token(login_name, password)
+        print(f"每 {interval} 秒查询一次，写入 {store_dir}，按 Ctrl+C 停止")
+        next_time = time.monotonic()
+        try:
+            while True:
+                try:
+                    store.ingest(api.get_real_time_data())
+                except Exception as e:
+                    print(f"查询失败: {e}")
+                print(f"\r已写入 {store.written} 条，重复读数 {store.duplicates} 条", end="", flush=True)
+                next_time += interval
+                time.sleep(max(0.0, next_time - time.monotonic()))
+        except KeyboardInterrupt:
+            print()
+
+
+def _synthetic_poll(devices, t):
+    """生成一次查询结果，格式与 get_real_time_data() 相同"""
+    from examples.temperature_humidity_stub import _device
+
+    return [_device(addr, "bench", t) for addr in devices]
+
+
+def benchmark(days=90, interval=5.0, devices=4, store_dir=None):
+    """
+    生成若干天的模拟数据，测量写入吞吐、磁盘占用和查询耗时
+
+    第一天的数据逐次经过 ingest()（展开嵌套结构 + 去重 + 批量写入），
+    其余天数直接按列追加，以便在几十秒内生成几个月的数据
+
+    Args:
+        days: 模拟天数
+        interval: 查询间隔（秒）
+        devices: 设备数量（每个设备温度、湿度两个序列）
+        store_dir: 存储目录，None 表示使用临时目录并在结束后删除
+    """
+    import shutil
+    import tempfile
+
+    cleanup = store_dir is None
+    store_dir = store_dir or tempfile.mkdtemp(prefix="th_store_")
+    addrs = [10106742 + i for i in range(devices)]
+    end = (int(time.time()) // 86400) * 86400
+    start = end - days * 86400
+    polls_per_day = int(86400 / interval)
+
+    try:
+        with TimeSeriesStore(store_dir) as store:
+            t0 = time.perf_counter()
+            for i in range(polls_per_day):
+                store.ingest(_synthetic_poll(addrs, start + i * interval))
+            store.flush()
+            elapsed = time.perf_counter() - t0
+            rows = store.written
+            print(f"逐次写入: {polls_per_day} 次查询（{rows} 条读数）耗时 {elapsed:.2f} 秒，"
+                  f"平均每次 {elapsed / polls_per_day * 1e6:.0f} µs")
+
+            t0 = time.perf_counter()
+            rng = np.random.default_rng(0)
+            offsets = np.arange(polls_per_day, dtype=np.int64) * int(interval * 1000)
+            n = len(addrs) * polls_per_day
+            for day in range(1, days):
+                t = (start + day * 86400) * 1000 + offsets
+                for register, base in ((1, 22.0), (2, 40.0)):
+                    store.append({
+                        "timestamp": np.tile(t, len(addrs)),
+                        "device": np.repeat(np.array(addrs, dtype=np.int64), polls_per_day),
+                        "node": np.ones(n, dtype=np.int16),
+                        "register": np.full(n, register, dtype=np.int16),
+                        "value": (base + rng.normal(0, 1, n)).astype(np.float32),
+                    })
+            store.flush()
+            print(f"按列追加其余 {days - 1} 天: {time.perf_counter() - t0:.1f} 秒")
+
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(store_dir) for f in files)
+        total = store.written
+        print(f"共 {total} 条读数，{len(store.series())} 个序列，磁盘占用 {size / 1e6:.1f} MB"
+              f"（每条 {size / total:.1f} 字节）")
+
+        # 新建实例查询，模拟另一个进程读取历史数据
+        store = TimeSeriesStore(store_dir)
+        device = addrs[0]
+        cases = [
+            ("原始数据 最近 1 小时", lambda: store.query(device, "温度", end - 3600, end)),
+            ("原始数据 最近 1 天", lambda: store.query(device, "温度", end - 86400, end)),
+            ("降采样 1 天 / 1 分钟", lambda: store.downsample(device, "温度", 60, end - 86400, end)),
+            (f"降采样 {min(days, 30)} 天 / 1 小时",
+             lambda: store.downsample(device, "温度", 3600, end - min(days, 30) * 86400, end)),
+            (f"降采样 {days} 天 / 1 小时", lambda: store.downsample(device, "温度", 3600, start, end)),
+            (f"降采样 {days} 天 / 1 天", lambda: store.downsample(device, "湿度", 86400, start, end)),
+        ]
+        for label, func in cases:
+            func()
+            times = []
+            for _ in range(5):
+                t0 = time.perf_counter()
+                result = func()
+                times.append((time.perf_counter() - t0) * 1000)
+            points = len(result[0]) if isinstance(result, tuple) else len(result["t"])
+            print(f"  {label}: {np.median(times):.1f} ms（{points} 个点）")
+    finally:
+        if cleanup:
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python temperature_humidity_store.py record [间隔秒] [目录]  # 定时查询云平台并保存历史数据")
+        print("  python temperature_humidity_store.py list [目录]  # 列出已保存的序列")
+        print("  python temperature_humidity_store.py query <设备地址> <寄存器> [最近小时数] [桶秒] [目录]"
+              "  # 查询历史数据，给出桶长度时降采样")
+        print("  python temperature_humidity_store.py bench [天数]  # 无需网络：模拟数据测量写入和查询耗时")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "record":
+        interval = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+        store_dir = sys.argv[3] if len(sys.argv) > 3 else "th_history"
+        record(store_dir, interval)
+    elif command == "list":
+        store = TimeSeriesStore(sys.argv[2] if len(sys.argv) > 2 else "th_history")
+        for device, key, name, unit in store.series():
+            print(f"设备 {device}  寄存器 {key}  {name}（{unit}）")
+    elif command == "query":
+        device, register = sys.argv[2], sys.argv[3]
+        hours = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+        bucket = float(sys.argv[5]) if len(sys.argv) > 5 else None
+        store = TimeSeriesStore(sys.argv[6] if len(sys.argv) > 6 else "th_history")
+        end = time.time()
+        if bucket:
+            result = store.downsample(device, register, bucket, end - hours * 3600, end)
+            for t, mean, lo, hi, count in zip(result["t"], result["mean"], result["min"],
+                                              result["max"], result["count"]):
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t / 1000))}  "
+                      f"平均 {mean:.2f}  最小 {lo:.2f}  最大 {hi:.2f}  ({count} 条)")
+        else:
+            for t, v in zip(*store.query(device, register, end - hours * 3600, end)):
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t / 1000))}  {v:.2f}")
+    elif command == "bench":
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+        benchmark(days)
+    else:
+        print(f"未知命令: {command}")
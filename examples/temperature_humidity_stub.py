@@ -0,0 +1,250 @@
+"""
+温湿度云平台本地模拟服务
+按 docs/温湿度云平台接口.postman_collection.json 中的接口和响应格式实现，
+用于在没有网络和账号的情况下测试客户端：Token 有效期可调，可模拟 Token 失效和网络延迟，
+并统计连接数和请求数，便于检查客户端是否复用了连接
+"""
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 云平台约定的成功状态码
+CODE_OK = 1000
+# Token 无效或过期时模拟服务返回的状态码（Postman 集合中未给出，按常见约定取值）
+CODE_TOKEN_INVALID = 1001
+CODE_LOGIN_FAILED = 1002
+
+
+def _device(addr, group_id, t):
+    """生成一个设备的实时数据，格式与 Postman 集合中的示例响应一致"""
+    temperature = round(20.0 + 5.0 * ((addr * 7 + int(t)) % 100) / 100.0, 1)
+    humidity = round(30.0 + 20.0 * ((addr * 13 + int(t)) % 100) / 100.0, 1)
+    relays = [{"relayNo": i, "relayStatus": 0} for i in range(1, 17)]
+    return {
+        "systemCode": "iot",
+        "deviceAddr": addr,
+        "deviceName": str(addr),
+        "groupId": group_id,
+        "lat": 0,
+        "lng": 0,
+        "deviceStatus": "normal",
+        "relayStatus": json.dumps(relays, separators=(",", ":")),
+        "relayStatusItems": relays,
+        "dataItem": [{
+            "nodeId": 1,
+            "registerItem": [
+                {"registerId": 1, "data": f"{temperature}", "value": temperature, "alarmLevel": 0,
+                 "alarmColor": "ff0000", "alarmInfo": "", "unit": "℃", "registerName": "温度"},
+                {"registerId": 2, "data": f"{humidity}", "value": humidity, "alarmLevel": 0,
+                 "alarmColor": "ff0000", "alarmInfo": "", "unit": "%", "registerName": "湿度"},
+            ],
+        }],
+        "timeStamp": int(t * 1000),
+    }
+
+
+class StubCloudServer:
+    """
+    温湿度云平台模拟服务
+
+    实现 /api/getToken/、/api/device/getGroupList 和 /api/data/getRealTimeData 三个接口，
+    使用 HTTP/1.1 长连接，可在后台线程中运行
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, login_name="h251225krt", password="h251225krt",
+                 token_ttl=7200.0, groups=4, devices_per_group=2, latency=0.0, certfile=None,
+                 update_period=0.0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            login_name: 用户名
+            password: 密码
+            token_ttl: Token 有效期（秒）
+            groups: 分组数量
+            devices_per_group: 每个分组的设备数量
+            latency: 每个请求的模拟处理延迟（秒）
+            certfile: 证书和私钥的 PEM 文件，给出时使用 HTTPS
+            update_period: 设备上报周期（秒），两次上报之间查询得到相同的数据和时间戳；0 表示每次都是新数据
+        """
+        self.login_name = login_name
+        self.password = password
+        self.token_ttl = token_ttl
+        self.latency = latency
+        self.update_period = update_period
+        self.groups = [{"groupId": uuid.UUID(int=i + 1).hex, "parentId": "0", "groupName": f"分组 {i + 1}"}
+                       for i in range(groups)]
+        self.devices = {g["groupId"]: [10106742 + i * devices_per_group + j for j in range(devices_per_group)]
+                        for i, g in enumerate(self.groups)}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.logins = 0
+        self.rejected = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，长连接下不关闭 Nagle 会与对端的延迟确认叠加出约 40 ms 的停顿
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                if stub.certfile:
+                    # TLS 握手放在处理线程中完成，不阻塞接受新连接的主线程
+                    self.request.do_handshake()
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+                status, body = stub.handle(url.path.rstrip("/"), query, self.headers.get("Authorization"))
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+        self.certfile = certfile
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True,
+                                                      do_handshake_on_connect=False)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        scheme = "https" if self.certfile else "http"
+        return f"{scheme}://{host}:{port}/"
+
+    def handle(self, path, query, token):
+        """
+        处理一个请求
+
+        Returns:
+            (HTTP 状态码, 响应 JSON)
+        """
+        now = time.time()
+        if path == "/api/getToken":
+            if query.get("loginName") != self.login_name or query.get("password") != self.password:
+                return 200, {"code": CODE_LOGIN_FAILED, "message": "用户名或密码错误", "data": None}
+            token = uuid.uuid4().hex
+            expiration = int(now + self.token_ttl)
+            with self._lock:
+                self._tokens[token] = expiration
+                self.logins += 1
+            return 200, {"code": CODE_OK, "message": "获取成功",
+                         "data": {"token": token, "expiration": expiration}}
+
+        if path not in ("/api/device/getGroupList", "/api/data/getRealTimeData"):
+            return 404, {"code": 404, "message": "接口不存在", "data": None}
+        with self._lock:
+            expiration = self._tokens.get(token)
+            if expiration is None or expiration <= now:
+                self.rejected += 1
+                return 200, {"code": CODE_TOKEN_INVALID, "message": "token 无效或已过期", "data": None}
+
+        if path == "/api/device/getGroupList":
+            return 200, {"code": CODE_OK, "message": "获取成功", "data": self.groups}
+        group_id = query.get("groupId")
+        if group_id:
+            addrs = [(group_id, a) for a in self.devices.get(group_id, [])]
+        else:
+            addrs = [(g, a) for g, group in self.devices.items() for a in group]
+        if self.update_period:
+            now = now // self.update_period * self.update_period
+        return 200, {"code": CODE_OK, "message": "获取成功", "data": [_device(a, g, now) for g, a in addrs]}
+
+    def revoke_tokens(self):
+        """使已发放的 Token 全部失效，模拟服务端重启或 Token 被提前收回"""
+        with self._lock:
+            self._tokens.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.connections = self.requests = self.logins = self.rejected = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def make_self_signed_cert(directory=None):
+    """
+    用 openssl 命令生成 127.0.0.1 的自签名证书，用于测试 HTTPS
+
+    Returns:
+        包含证书和私钥的 PEM 文件路径，客户端可将其作为 verify 参数
+    """
+    directory = directory or tempfile.mkdtemp(prefix="stub_cert_")
+    certfile = os.path.join(directory, "stub.pem")
+    keyfile = os.path.join(directory, "stub.key")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", keyfile, "-out", certfile],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(keyfile) as f:
+        key = f.read()
+    with open(certfile, "a") as f:
+        f.write(key)
+    return certfile
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python temperature_humidity_stub.py serve [端口] [Token有效期秒]  # 启动模拟服务")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
+        token_ttl = float(sys.argv[3]) if len(sys.argv) > 3 else 7200.0
+        server = StubCloudServer(port=port, token_ttl=token_ttl)
+        print(f"模拟服务已启动: {server.base_url}（Token 有效期 {token_ttl:.0f} 秒），按 Ctrl+C 停止")
+        try:
+            server._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server._server.server_close()
+    else:
+        print(f"未知命令: {command}")
@@ -0,0 +1,328 @@
+"""
+热成像温度分析
+从热成像 RTSP 流的伪彩色画面反查温度，逐帧统计最高、最低、平均温度，
+检测超过阈值的连通热点区域，输出紧凑的逐帧事件记录（JSON Lines）而不是整幅图像
+
+RTSP 流中是按调色板渲染后的图像，不含原始辐射测温数据：先按调色板把颜色还原为
+0-255 的灰度等级，再按相机设置的色标温度范围线性换算为摄氏度。
+相机需使用固定的色标范围（关闭自动调节），否则温度只有相对意义。
+"""
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+import cv2
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.frame_sources import open_source
+
+# 调色板反查表每个颜色通道保留的位数，5 位时查找表 32768 项，还原误差最多 3 个灰度等级
+PALETTE_BITS = 5
+
+
+@lru_cache(maxsize=8)
+def build_palette_lut(palette):
+    """
+    构建调色板反查表：量化后的 BGR 颜色 -> 最接近的调色板灰度等级
+
+    Args:
+        palette: OpenCV 调色板名称，如 "inferno"、"jet"、"hot"
+
+    Returns:
+        长度为 2**(3*PALETTE_BITS) 的只读 uint8 数组
+    """
+    colormap = getattr(cv2, f"COLORMAP_{palette.upper()}")
+    colors = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(-1, 1), colormap)
+    colors = colors.reshape(256, 3).astype(np.float32)
+
+    # 每个量化格取中心颜色，分块求最近的调色板颜色
+    shift = 8 - PALETTE_BITS
+    centers = np.arange(1 << PALETTE_BITS, dtype=np.float32) * (1 << shift) + (1 << shift) / 2
+    b, g, r = np.meshgrid(centers, centers, centers, indexing="ij")
+    queries = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1)
+    lut = np.empty(len(queries), dtype=np.uint8)
+    for i in range(0, len(queries), 4096):
+        chunk = queries[i:i + 4096]
+        distances = ((chunk[:, None, :] - colors[None, :, :]) ** 2).sum(axis=2)
+        lut[i:i + 4096] = distances.argmin(axis=1)
+    lut.setflags(write=False)
+    return lut
+
+
+@dataclass
+class Hotspot:
+    """热点区域（坐标为原始分辨率像素）"""
+    x: int
+    y: int
+    w: int
+    h: int
+    peak: float
+    peak_x: int
+    peak_y: int
+    area: int
+
+
+@dataclass
+class ThermalEvent:
+    """单帧分析结果"""
+    timestamp: float
+    frame: int
+    t_min: float
+    t_max: float
+    t_mean: float
+    hotspots: List[Hotspot] = field(default_factory=list)
+
+    def to_json(self):
+        record = asdict(self)
+        for key in ("t_min", "t_max", "t_mean"):
+            record[key] = round(record[key], 1)
+        record["timestamp"] = round(record["timestamp"], 3)
+        for spot in record["hotspots"]:
+            spot["peak"] = round(spot["peak"], 1)
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class ThermalAnalyzer:
+    """
+    热成像帧分析
+
+    处理分三层金字塔:
+        原始分辨率  只在热点包围框内还原，求精确的峰值温度、位置和面积
+        抽取层      每隔 decimation 个像素取一个点还原温度，统计最高、最低、平均温度
+        检测层      抽取层再做 levels 次 2x2 最大值池化，阈值分割 + 连通域找热点；
+                    最大值池化保证小热点不会在缩小时被平均掉
+    """
+
+    def __init__(self, temp_range=(20.0, 120.0), threshold=80.0, palette="inferno",
+                 decimation=2, levels=2, min_area=1):
+        """
+        Args:
+            temp_range: 色标最低、最高温度（摄氏度），与相机设置一致
+            threshold: 热点温度阈值（摄氏度）
+            palette: 相机使用的调色板，"gray"（白热）或 OpenCV 调色板名称如 "inferno"、"jet"
+            decimation: 统计温度时的抽取步长
+            levels: 检测层相对抽取层的 2x2 最大值池化次数
+            min_area: 热点在检测层的最小面积（格数）
+        """
+        self.t_low, self.t_high = temp_range
+        self.threshold = threshold
+        self.palette = palette
+        self.decimation = decimation
+        self.levels = levels
+        self.min_area = min_area
+        self._scale = (self.t_high - self.t_low) / 255.0
+        # 阈值换算为灰度等级，分割在 uint8 上进行
+        self.threshold_level = int(np.clip(np.ceil((threshold - self.t_low) / self._scale), 0, 255))
+        self._lut = None if palette == "gray" else build_palette_lut(palette)
+        self._index = None
+        self._level = None
+        self.frame_count = 0
+
+    def to_celsius(self, level):
+        """灰度等级 -> 摄氏度"""
+        return self.t_low + float(level) * self._scale
+
+    def decode(self, image):
+        """
+        伪彩色 BGR 图像（可以是跨步视图）-> 灰度等级
+
+        Args:
+            image: BGR 图像
+
+        Returns:
+            uint8 灰度等级图；非 ROI 调用时写入复用的缓冲区
+        """
+        if self._lut is None:
+            return cv2.cvtColor(np.ascontiguousarray(image), cv2.COLOR_BGR2GRAY)
+
+        shift = 8 - PALETTE_BITS
+        shape = image.shape[:2]
+        if self._index is None or self._index.shape != shape:
+            self._index = np.empty(shape, dtype=np.uint16)
+            self._level = np.empty(shape, dtype=np.uint8)
+        index = self._index
+        np.right_shift(image[..., 0], shift, out=index, casting="unsafe")
+        index <<= PALETTE_BITS
+        index |= image[..., 1] >> shift
+        index <<= PALETTE_BITS
+        index |= image[..., 2] >> shift
+        return np.take(self._lut, index, out=self._level)
+
+    def _decode_roi(self, roi):
+        if self._lut is None:
+            return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        shift = 8 - PALETTE_BITS
+        index = (roi[..., 0] >> shift).astype(np.uint16) << (2 * PALETTE_BITS)
+        index |= (roi[..., 1] >> shift).astype(np.uint16) << PALETTE_BITS
+        index |= roi[..., 2] >> shift
+        return self._lut[index]
+
+    def _max_pool(self, level):
+        for _ in range(self.levels):
+            h, w = level.shape[0] // 2 * 2, level.shape[1] // 2 * 2
+            level = level[:h, :w].reshape(h // 2, 2, w // 2, 2).max(axis=(1, 3))
+        return level
+
+    def analyze(self, image, timestamp=0.0):
+        """
+        分析一帧
+
+        Args:
+            image: 热成像伪彩色 BGR 图像
+            timestamp: 帧时间戳
+
+        Returns:
+            ThermalEvent
+        """
+        step = self.decimation
+        level = self.decode(image[::step, ::step])
+        lo, hi, _, _ = cv2.minMaxLoc(level)
+        mean = cv2.mean(level)[0]
+        event = ThermalEvent(timestamp, self.frame_count, self.to_celsius(lo),
+                             self.to_celsius(hi), self.to_celsius(mean))
+        self.frame_count += 1
+
+        if hi < self.threshold_level:
+            return event
+
+        coarse = self._max_pool(level)
+        mask = (coarse >= self.threshold_level).view(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        scale = step << self.levels
+        height, width = image.shape[:2]
+        for x, y, w, h, area in stats[1:]:
+            if area < self.min_area:
+                continue
+            # 检测层包围框映射回原始分辨率，在框内精确求峰值
+            x0, y0 = x * scale, y * scale
+            x1, y1 = min((x + w) * scale, width), min((y + h) * scale, height)
+            roi = self._decode_roi(image[y0:y1, x0:x1])
+            _, peak, _, (px, py) = cv2.minMaxLoc(roi)
+            hot_area = int(np.count_nonzero(roi >= self.threshold_level))
+            event.hotspots.append(Hotspot(int(x0), int(y0), int(x1 - x0), int(y1 - y0),
+                                          self.to_celsius(peak), int(x0 + px), int(y0 + py), hot_area))
+        if event.hotspots:
+            event.t_max = max(event.t_max, max(s.peak for s in event.hotspots))
+        return event
+
+    __call__ = analyze
+
+
+def analyze_stream(source, output_file="thermal_events.jsonl", duration=None,
+                   analyzer=None, hotspots_only=False):
+    """
+    持续分析帧源，逐帧写入事件记录
+
+    Args:
+        source: 帧源（FrameSource 或 open_source 支持的描述）
+        output_file: 事件记录文件（JSON Lines，每行一帧）
+        duration: 分析时长（秒），None 表示直到帧源结束或按 Ctrl+C
+        analyzer: ThermalAnalyzer，默认使用默认参数
+        hotspots_only: 为 True 时只记录检测到热点的帧
+
+    Returns:
+        写入的记录数
+    """
+    analyzer = analyzer or ThermalAnalyzer()
+    source = open_source(source)
+    source.start()
+    written = 0
+    alarms = 0
+    start_time = time.monotonic()
+
+    print(f"开始分析，热点阈值 {analyzer.threshold:.1f} °C，记录写入 {output_file}")
+    try:
+        with open(output_file, "w", encoding="utf-8") as f:
+            while duration is None or time.monotonic() - start_time < duration:
+                try:
+                    frame = source.read()
+                except EOFError:
+                    break
+                if frame is None:
+                    continue
+                event = analyzer.analyze(frame.color, frame.timestamp)
+                if event.hotspots:
+                    alarms += 1
+                if event.hotspots or not hotspots_only:
+                    f.write(event.to_json() + "\n")
+                    written += 1
+    except KeyboardInterrupt:
+        print("\n分析被中断")
+    finally:
+        source.stop()
+
+    print(f"分析 {analyzer.frame_count} 帧，其中 {alarms} 帧检测到热点，写入 {written} 条记录")
+    return written
+
+
+def benchmark(spec="synthetic:thermal", frames=500):
+    """
+    单核测速：不限速读取帧并分析，统计每帧耗时
+
+    Args:
+        spec: 帧源描述，合成帧源或录制的热成像视频
+        frames: 分析帧数
+    """
+    cv2.setNumThreads(1)
+    source = open_source(spec, realtime=False, loop=True)
+    source.start()
+    images = []
+    try:
+        # 先把帧读入内存，只测分析耗时，不含视频解码
+        for _ in range(min(frames, 100)):
+            frame = source.read()
+            if frame is not None:
+                images.append(frame.color)
+    finally:
+        source.stop()
+
+    t0 = time.perf_counter()
+    analyzer = ThermalAnalyzer()
+    print(f"构建调色板反查表: {(time.perf_counter() - t0) * 1000:.0f} ms（按调色板缓存，只在首次构建）")
+    height, width = images[0].shape[:2]
+    print(f"帧源: {spec}，{width}x{height}，单线程分析 {frames} 帧")
+
+    times = []
+    hotspot_count = 0
+    for i in range(frames):
+        t0 = time.perf_counter()
+        event = analyzer.analyze(images[i % len(images)], i / 25.0)
+        times.append(time.perf_counter() - t0)
+        hotspot_count += len(event.hotspots)
+    times = np.array(times) * 1000
+    print(f"  每帧 平均 {times.mean():.2f} ms，P95 {np.percentile(times, 95):.2f} ms，"
+          f"最大 {times.max():.2f} ms，约 {1000 / times.mean():.0f} fps（目标 25 fps）")
+    print(f"  平均每帧 {hotspot_count / frames:.1f} 个热点，示例记录:")
+    print(f"  {event.to_json()}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python thermal_analytics.py analyze <帧源> [记录文件] [阈值°C] [时长]  # 逐帧分析并写入事件记录")
+        print("  python thermal_analytics.py bench [帧源] [帧数]  # 单核测速")
+        print("  帧源可以是 RTSP 地址、录制的热成像视频或 synthetic:thermal")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "analyze":
+        spec = sys.argv[2]
+        output_file = sys.argv[3] if len(sys.argv) > 3 else "thermal_events.jsonl"
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 80.0
+        duration = float(sys.argv[5]) if len(sys.argv) > 5 else None
+        analyze_stream(spec, output_file, duration, ThermalAnalyzer(threshold=threshold))
+    elif command == "bench":
+        spec = sys.argv[2] if len(sys.argv) > 2 else "synthetic:thermal"
+        frames = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+        benchmark(spec, frames)
+    else:
+        print(f"未知命令: {command}")
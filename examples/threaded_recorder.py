@@ -0,0 +1,245 @@
+"""
+多线程录制流水线
+采集线程把帧放入有界队列，彩色和深度各自由独立的编码线程写入视频，
+编码卡顿时只丢帧并计数，不会阻塞采集
+"""
+import os
+import sys
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from examples.depth_colormap import DepthColorizer
+from examples.frame_sources import RealSenseSource, SyntheticDepthSource, open_source
+from examples.video_encoder import get_encoder
+
+
+@dataclass
+class StreamStats:
+    """单路编码统计"""
+    written: int = 0
+    dropped: int = 0
+    late: int = 0
+    max_latency: float = 0.0
+
+
+@dataclass
+class RecordingStats:
+    """录制统计"""
+    captured: int = 0
+    elapsed: float = 0.0
+    streams: Dict[str, StreamStats] = field(default_factory=dict)
+
+    @property
+    def capture_fps(self) -> float:
+        return self.captured / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self):
+        """打印录制统计"""
+        print(f"采集 {self.captured} 帧，用时 {self.elapsed:.2f} 秒，平均 {self.capture_fps:.1f} fps")
+        for name, s in self.streams.items():
+            fps = s.written / self.elapsed if self.elapsed > 0 else 0.0
+            print(f"  [{name}] 写入 {s.written} 帧 ({fps:.1f} fps), "
+                  f"丢弃 {s.dropped} 帧, 延迟 {s.late} 帧, "
+                  f"最大延迟 {s.max_latency * 1000:.1f} ms")
+
+
+class _EncodeWorker(threading.Thread):
+    """编码线程：从自己的有界队列取帧、转换并写入视频"""
+
+    def __init__(self, name, writer, transform, stats, late_threshold, queue_size):
+        super().__init__(name=f"encode-{name}", daemon=True)
+        self.writer = writer
+        self.transform = transform
+        self.stats = stats
+        self.late_threshold = late_threshold
+        self.queue = queue.Queue(maxsize=queue_size)
+
+    def submit(self, timestamp, image):
+        """非阻塞地提交一帧，队列已满时丢弃并计数"""
+        try:
+            self.queue.put_nowait((timestamp, image))
+        except queue.Full:
+            self.stats.dropped += 1
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            timestamp, image = item
+            if self.transform is not None:
+                image = self.transform(image)
+            self.writer.write(image)
+            latency = time.monotonic() - timestamp
+            self.stats.written += 1
+            self.stats.max_latency = max(self.stats.max_latency, latency)
+            if latency > self.late_threshold:
+                self.stats.late += 1
+
+
+class ThreadedRecorder:
+    """
+    生产者/消费者录制器
+
+    采集线程从帧源读帧，分发到彩色和深度两个编码线程的有界队列。
+    队列满时丢弃该帧（记为 dropped），写入时距采集超过阈值的帧记为 late。
+    """
+
+    def __init__(self, source, color_file="color_video.mp4", depth_file="depth_video.mp4",
+                 queue_size=32, late_threshold=None,
+                 depth_transform: Optional[Callable] = None, encoder="auto"):
+        """
+        Args:
+            source: 含深度的帧源（FrameSource），如 RealSenseSource、DepthContainerSource
+            color_file: 彩色视频输出文件
+            depth_file: 深度视频输出文件
+            queue_size: 每路编码队列的最大长度
+            late_threshold: 判定为延迟帧的时延（秒），默认按帧源启动后的帧率取 2 个帧间隔
+            depth_transform: 深度帧写入前的转换函数，默认用 DepthColorizer 转为伪彩色
+            encoder: 视频编码描述（见 video_encoder），默认自动选择
+        """
+        self.source = source
+        self.color_file = color_file
+        self.depth_file = depth_file
+        self.queue_size = queue_size
+        self.late_threshold = late_threshold
+        self.depth_transform = depth_transform or DepthColorizer()
+        self.encoder = get_encoder(encoder)
+        self.stats = RecordingStats()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """请求提前停止录制"""
+        self._stop_event.set()
+
+    def _capture_loop(self, workers, duration):
+        start_time = time.monotonic()
+        while not self._stop_event.is_set() and time.monotonic() - start_time < duration:
+            try:
+                frame = self.source.read()
+            except EOFError:
+                # 回放帧源数据结束
+                break
+            if frame is None:
+                continue
+            timestamp, color_image, depth_image = frame
+            self.stats.captured += 1
+            workers["color"].submit(timestamp, color_image)
+            workers["depth"].submit(timestamp, depth_image)
+
+    def record(self, duration=10) -> RecordingStats:
+        """
+        录制指定时长
+
+        Args:
+            duration: 录制时长（秒）
+
+        Returns:
+            RecordingStats 录制统计
+        """
+        # 回放、RTSP 和帧总线等帧源启动后才知道图像尺寸和帧率，必须先启动再创建视频文件
+        self.source.start()
+        size = (self.source.width, self.source.height)
+        writers = []
+        try:
+            for filename in (self.color_file, self.depth_file):
+                writer = self.encoder.open(filename, self.source.fps, size)
+                writers.append(writer)
+                if not writer.isOpened():
+                    raise IOError(f"无法创建视频文件: {filename}（{size[0]}x{size[1]}）")
+        except Exception:
+            for writer in writers:
+                writer.release()
+            self.source.stop()
+            raise
+        color_writer, depth_writer = writers
+        late_threshold = self.late_threshold or 2.0 / self.source.fps
+
+        self.stats = RecordingStats()
+        workers = {}
+        for name, writer, transform in (
+            ("color", color_writer, None),
+            ("depth", depth_writer, self.depth_transform),
+        ):
+            self.stats.streams[name] = StreamStats()
+            workers[name] = _EncodeWorker(name, writer, transform, self.stats.streams[name],
+                                          late_threshold, self.queue_size)
+            workers[name].start()
+
+        self._stop_event.clear()
+        start_time = time.monotonic()
+        capture_thread = threading.Thread(
+            target=self._capture_loop, args=(workers, duration), name="capture", daemon=True
+        )
+        try:
+            capture_thread.start()
+            capture_thread.join()
+        except KeyboardInterrupt:
+            print("\n录制被中断")
+            self.stop()
+            capture_thread.join()
+        finally:
+            self.stats.elapsed = time.monotonic() - start_time
+            self.source.stop()
+            # 等待编码线程写完队列中剩余的帧
+            for worker in workers.values():
+                worker.queue.put(None)
+            for worker in workers.values():
+                worker.join()
+            color_writer.release()
+            depth_writer.release()
+
+        return self.stats
+
+
+def benchmark(duration=10, width=640, height=480, fps=30, realtime=True, queue_size=32):
+    """
+    使用合成帧源测量多线程录制的持续帧率
+
+    Args:
+        duration: 测试时长（秒）
+        width: 图像宽度
+        height: 图像高度
+        fps: 合成帧源帧率
+        realtime: False 时帧源不限速，用于测量流水线最大吞吐
+        queue_size: 编码队列长度
+    """
+    source = SyntheticDepthSource(width, height, fps, realtime=realtime)
+    recorder = ThreadedRecorder(source, "bench_color.mp4", "bench_depth.mp4", queue_size=queue_size)
+    print(f"合成帧源测试: {width}x{height}, {fps} fps, {'限速' if realtime else '不限速'}, {duration} 秒")
+    stats = recorder.record(duration)
+    stats.report()
+    for path in ("bench_color.mp4", "bench_depth.mp4"):
+        if os.path.exists(path):
+            os.remove(path)
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python threaded_recorder.py record [时长] [帧源]  # 多线程录制，默认10秒、RealSense")
+        print("  python threaded_recorder.py bench [时长] [max]  # 合成帧源测速，max 表示不限速")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    if command == "record":
+        recorder = ThreadedRecorder(open_source(sys.argv[3]) if len(sys.argv) > 3 else RealSenseSource())
+        print(f"开始录制 {duration} 秒...")
+        recorder.record(duration).report()
+        print("彩色视频已保存: color_video.mp4")
+        print("深度视频已保存: depth_video.mp4")
+    elif command == "bench":
+        realtime = not (len(sys.argv) > 3 and sys.argv[3] == "max")
+        benchmark(duration, realtime=realtime)
+    else:
+        print(f"未知命令: {command}")
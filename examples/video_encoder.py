@@ -0,0 +1,375 @@
+"""
+视频编码后端
+录制统一通过 open_writer() 创建写入器，按编码描述选择后端：
+  - opencv:<fourcc>  cv2.VideoWriter，如 opencv:mp4v、opencv:avc1
+  - ffmpeg[:参数]    把原始 BGR 帧通过管道写入 ffmpeg 子进程，用 libx264 等编码，
+                     如 ffmpeg:preset=veryfast,crf=28,threads=2
+  - auto             启动后第一次使用时逐个试编码几帧，选第一个可用的后端：
+                     ffmpeg（H.264）→ opencv:avc1 → opencv:mp4v
+mp4v（MPEG-4 Part 2）压缩率低，同样画质下 H.264 文件通常只有其几分之一；
+ffmpeg 在独立进程中编码，不占用录制进程的 GIL，还可以限制编码线程数给采集留出 CPU
+"""
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from functools import lru_cache
+
+if __package__ in (None, ""):
+    # 以脚本方式运行时，把项目根目录加入搜索路径以便导入 examples 包
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# auto 依次尝试的后端
+AUTO_ORDER = ("ffmpeg", "opencv:avc1", "opencv:mp4v")
+
+
+@contextlib.contextmanager
+def _quiet_stderr():
+    """暂时把文件描述符 2 重定向到 /dev/null，屏蔽 OpenCV / FFmpeg 库试编码失败时直接打印的错误"""
+    sys.stderr.flush()
+    saved = os.dup(2)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 2)
+        yield
+    finally:
+        os.dup2(saved, 2)
+        os.close(saved)
+        os.close(devnull)
+
+
+class FFmpegWriter:
+    """
+    ffmpeg 管道写入器，接口与 cv2.VideoWriter 相同（write / release / isOpened）
+
+    帧以 rawvideo bgr24 写入子进程的标准输入，编码在子进程中完成；
+    子进程来不及编码时管道写满，write() 阻塞，与 cv2.VideoWriter 的行为一致
+    """
+
+    def __init__(self, filename, fps, size, codec="libx264", preset="veryfast", crf=23,
+                 threads=2, bitrate=None, ffmpeg="ffmpeg"):
+        """
+        Args:
+            filename: 输出文件
+            fps: 帧率
+            size: (宽, 高)
+            codec: ffmpeg 编码器，如 libx264、libx265、h264_v4l2m2m（硬件编码）
+            preset: x264 / x265 预设，越快压缩率越低
+            crf: x264 / x265 质量参数，越大文件越小（18 近似无损，28 明显压缩）
+            threads: 编码线程数，0 表示由 ffmpeg 决定
+            bitrate: 码率（如 "2M"），硬件编码器不支持 crf 时使用
+            ffmpeg: ffmpeg 可执行文件
+        """
+        self.filename = filename
+        self.size = tuple(size)
+        self.frames = 0
+        width, height = self.size
+        command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                   "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+                   "-r", str(fps), "-i", "-", "-c:v", codec]
+        if codec.startswith(("libx264", "libx265")):
+            command += ["-preset", preset, "-crf", str(crf)]
+        if bitrate:
+            command += ["-b:v", str(bitrate)]
+        if threads:
+            command += ["-threads", str(threads)]
+        if width % 2 or height % 2:
+            # yuv420p 要求宽高为偶数
+            command += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        command += ["-pix_fmt", "yuv420p", filename]
+        try:
+            # 独立的会话：终端的 Ctrl+C 只发给录制进程，由 release() 正常结束编码，
+            # 否则 ffmpeg 同时收到 SIGINT 提前退出，MP4 缺少文件尾无法播放
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                             stderr=subprocess.PIPE, start_new_session=True)
+        except FileNotFoundError:
+            self._process = None
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, image):
+        if self._process is None:
+            return
+        if image.shape[1::-1] != self.size:
+            raise ValueError(f"帧尺寸 {image.shape[1]}x{image.shape[0]} 与写入器 {self.size[0]}x{self.size[1]} 不一致")
+        try:
+            # 帧缓冲区直接写入管道，不做额外复制（非连续数组由 tobytes 复制）
+            self._process.stdin.write(image.data if image.flags.c_contiguous else image.tobytes())
+        except BrokenPipeError:
+            raise IOError(f"ffmpeg 编码进程已退出: {self._error()}") from None
+        self.frames += 1
+
+    def _error(self):
+        self._process.wait()
+        message = self._process.stderr.read().decode(errors="replace").strip()
+        return message.splitlines()[-1] if message else f"退出码 {self._process.returncode}"
+
+    def release(self):
+        """结束输入并等待 ffmpeg 写完文件"""
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.frames == 0:
+            # 没有写入任何帧（如分段录制预先打开但未使用的分段），ffmpeg 会报错，直接结束
+            process.wait()
+            process.stderr.close()
+            return
+        process.wait()
+        message = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+        if process.returncode != 0:
+            raise IOError(f"ffmpeg 编码失败（{self.filename}）: {message or f'退出码 {process.returncode}'}")
+
+
+class VideoEncoder:
+    """编码后端描述，open() 创建写入器"""
+
+    def __init__(self, backend="opencv", **options):
+        """
+        Args:
+            backend: "opencv" 或 "ffmpeg"
+            options: opencv 为 fourcc；ffmpeg 为 FFmpegWriter 的参数（codec、preset、crf、threads、bitrate）
+        """
+        if backend not in ("opencv", "ffmpeg"):
+            raise ValueError(f"未知的编码后端: {backend}")
+        self.backend = backend
+        self.options = options
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        解析编码描述
+
+        Args:
+            spec: "opencv:mp4v"、"ffmpeg"、"ffmpeg:preset=veryfast,crf=28,threads=2,codec=libx264"
+        """
+        backend, _, params = spec.partition(":")
+        backend = backend.strip().lower()
+        if backend == "opencv":
+            return cls("opencv", fourcc=params.strip() or "mp4v")
+        options = {}
+        for item in filter(None, (p.strip() for p in params.split(","))):
+            key, _, value = item.partition("=")
+            if key in ("crf", "threads"):
+                options[key] = int(value)
+            elif key in ("codec", "preset", "bitrate", "ffmpeg"):
+                options[key] = value
+            else:
+                raise ValueError(f"未知的 ffmpeg 参数: {key}")
+        return cls(backend, **options)
+
+    def __str__(self):
+        if self.backend == "opencv":
+            return f"opencv:{self.options.get('fourcc', 'mp4v')}"
+        params = ",".join(f"{k}={v}" for k, v in self.options.items())
+        return f"ffmpeg:{params}" if params else "ffmpeg"
+
+    def open(self, filename, fps, size):
+        """
+        创建写入器
+
+        Args:
+            filename: 输出文件
+            fps: 帧率
+            size: (宽, 高)
+
+        Returns:
+            cv2.VideoWriter 或 FFmpegWriter
+        """
+        if self.backend == "ffmpeg":
+            return FFmpegWriter(filename, fps, size, **self.options)
+        import cv2
+
+        fourcc = cv2.VideoWriter_fourcc(*self.options.get("fourcc", "mp4v"))
+        return cv2.VideoWriter(filename, fourcc, float(fps), tuple(size))
+
+    def available(self):
+        """试编码几帧小图像，确认后端在本机可用（编码器存在且能打开）"""
+        if self.backend == "ffmpeg" and shutil.which(self.options.get("ffmpeg", "ffmpeg")) is None:
+            return False
+        import numpy as np
+
+        image = np.zeros((64, 64, 3), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "probe.mp4")
+            try:
+                with _quiet_stderr():
+                    writer = self.open(filename, 25, (64, 64))
+                    if not writer.isOpened():
+                        return False
+                    for _ in range(3):
+                        writer.write(image)
+                    writer.release()
+            except (IOError, OSError, ValueError):
+                return False
+            return os.path.exists(filename) and os.path.getsize(filename) > 0
+
+
+@lru_cache(maxsize=None)
+def probe():
+    """
+    按 AUTO_ORDER 探测第一个可用的后端，结果在进程内缓存
+
+    Returns:
+        VideoEncoder
+    """
+    for spec in AUTO_ORDER:
+        encoder = VideoEncoder.from_spec(spec)
+        if encoder.available():
+            print(f"视频编码: {encoder}")
+            return encoder
+    # mp4v 是 OpenCV 自带的编码器，探测失败时（如临时目录不可写）仍然使用它
+    return VideoEncoder.from_spec("opencv:mp4v")
+
+
+def get_encoder(encoder="auto"):
+    """encoder 为编码描述、VideoEncoder 或 None（等同 auto）"""
+    if isinstance(encoder, VideoEncoder):
+        return encoder
+    if encoder is None or encoder == "auto":
+        return probe()
+    return VideoEncoder.from_spec(encoder)
+
+
+def open_writer(filename, fps, size, encoder="auto"):
+    """
+    按编码描述创建视频写入器
+
+    Args:
+        filename: 输出文件
+        fps: 帧率
+        size: (宽, 高)
+        encoder: 编码描述（见模块说明）或 VideoEncoder，默认自动选择
+
+    Returns:
+        cv2.VideoWriter 或 FFmpegWriter，接口相同
+    """
+    return get_encoder(encoder).open(filename, fps, size)
+
+
+def _cpu_seconds():
+    """本进程与已结束子进程的 CPU 时间（用户态 + 内核态）"""
+    import resource
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def load_clip(spec, frames=150):
+    """
+    从帧源读取前 frames 帧到内存，编码测试时不受解码和采集速度影响
+
+    Args:
+        spec: open_source 支持的帧源描述，如录制的 color_video.mp4、depth_raw.rdz、synthetic:thermal
+        frames: 帧数
+
+    Returns:
+        ({"彩色": 图像列表, "深度伪彩色": 图像列表（帧源含深度时）}, 帧率)
+    """
+    from examples.depth_colormap import DepthColorizer
+    from examples.frame_sources import open_source
+
+    source = open_source(spec, realtime=False)
+    source.start()
+    streams = {"彩色": [], "深度伪彩色": []}
+    colorizer = DepthColorizer()
+    try:
+        while len(streams["彩色"]) < frames:
+            try:
+                frame = source.read()
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            streams["彩色"].append(frame.color.copy())
+            if frame.depth is not None:
+                # 与录制时写入 depth_video.mp4 的内容相同
+                streams["深度伪彩色"].append(colorizer.apply(frame.depth).copy())
+    finally:
+        source.stop()
+    return {name: images for name, images in streams.items() if images}, getattr(source, "fps", 30) or 30
+
+
+def _bench_clip(label, images, fps, candidates, tmp):
+    """用每个编码后端编码同一组图像，打印编码帧率、CPU 占用和文件大小"""
+    height, width = images[0].shape[:2]
+    print(f"\n{label}: {width}x{height}，{len(images)} 帧，{fps:g} fps")
+    print(f"  {'编码后端':<34}{'编码帧率':>8}{'CPU':>8}{'文件大小':>10}{'每秒码率':>12}")
+    for encoder in candidates:
+        filename = os.path.join(tmp, "bench.mp4")
+        cpu_start, start = _cpu_seconds(), time.perf_counter()
+        writer = encoder.open(filename, fps, (width, height))
+        for image in images:
+            writer.write(image)
+        writer.release()
+        elapsed = time.perf_counter() - start
+        cpu = _cpu_seconds() - cpu_start
+        size = os.path.getsize(filename)
+        os.remove(filename)
+        bitrate = size * 8 / (len(images) / fps) / 1e6
+        print(f"  {str(encoder):<38}{len(images) / elapsed:8.1f}{cpu / elapsed:8.0%}"
+              f"{size / 1e6:9.2f}MB{bitrate:9.2f}Mbps")
+
+
+def benchmark(clips=("synthetic:thermal", "synthetic"), encoders=None, frames=150):
+    """
+    在样例片段上比较各编码后端的编码帧率、CPU 占用和文件大小
+
+    CPU 占用为编码期间本进程和 ffmpeg 子进程的 CPU 时间之和除以墙钟时间，
+    100% 相当于占满一个核心
+
+    Args:
+        clips: 帧源描述列表，建议使用机器人实际录制的片段；合成深度帧源的彩色图像是随机噪声，
+            任何编码器都无法压缩，只代表最坏情况
+        encoders: 编码描述列表，None 表示 mp4v、avc1 和 ffmpeg 的几组预设
+        frames: 每个片段使用的帧数
+    """
+    encoders = encoders or ["opencv:mp4v", "opencv:avc1", "ffmpeg:preset=ultrafast,crf=23",
+                            "ffmpeg:preset=veryfast,crf=23", "ffmpeg:preset=veryfast,crf=28"]
+    candidates = []
+    for spec in encoders:
+        encoder = VideoEncoder.from_spec(spec)
+        if encoder.available():
+            candidates.append(encoder)
+        else:
+            print(f"跳过不可用的编码后端: {spec}")
+    probe()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for clip in clips:
+            streams, fps = load_clip(clip, frames)
+            if not streams:
+                print(f"{clip}: 没有读到帧")
+            for name, images in streams.items():
+                _bench_clip(f"{clip} {name}", images, fps, candidates, tmp)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python video_encoder.py probe  # 显示各后端是否可用及自动选择的结果")
+        print("  python video_encoder.py bench [片段 ...]  # 比较编码帧率、CPU 占用和文件大小")
+        print("  片段为帧源描述，如 color_video.mp4、depth_raw.rdz、synthetic:thermal")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "probe":
+        for spec in AUTO_ORDER:
+            status = "可用" if VideoEncoder.from_spec(spec).available() else "不可用"
+            print(f"  {spec:<16}{status}")
+        probe()
+    elif command == "bench":
+        clips = sys.argv[2:] or ("synthetic:thermal", "synthetic")
+        benchmark(clips)
+    else:
+        print(f"未知命令: {command}")
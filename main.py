@@ -5,20 +5,47 @@
 import sys
 import argparse
 
+# 各组件示例只在选中时才导入，启动时不加载 numpy、cv2、pyrealsense2、pyaudio、requests
+from examples.lazy_imports import as_missing_dependency, missing
+
+# 各组件需要的第三方库，菜单中标出未安装的
+REQUIREMENTS = {
+    'depth': ('numpy', 'cv2', 'pyrealsense2'),
+    'audio': ('numpy', 'pyaudio'),
+    'thermal': ('numpy', 'cv2'),
+    'temp': ('requests',),
+}
+
+
+def _status(component):
+    absent = missing(*REQUIREMENTS[component])
+    return f"  [未安装 {', '.join(absent)}]" if absent else ""
+
 
 def show_menu():
     """显示主菜单"""
     print("\n" + "=" * 60)
     print("山猫 M20 pro 组件测试菜单")
     print("=" * 60)
-    print("1. 深度相机 (Depth Camera)")
-    print("2. 麦克风扬声器 (Audio)")
-    print("3. 红外热成像 (Thermal Camera)")
-    print("4. 温湿度模块 (Temperature & Humidity)")
+    print("1. 深度相机 (Depth Camera)" + _status('depth'))
+    print("2. 麦克风扬声器 (Audio)" + _status('audio'))
+    print("3. 红外热成像 (Thermal Camera)" + _status('thermal'))
+    print("4. 温湿度模块 (Temperature & Humidity)" + _status('temp'))
     print("0. 退出")
     print("=" * 60)
 
 
+def run_component(func):
+    """运行一个组件示例，缺少依赖时提示后返回，不影响其他组件"""
+    try:
+        func()
+    except ModuleNotFoundError as e:
+        error = as_missing_dependency(e)
+        if error is None:
+            raise
+        print(f"\n{error}")
+
+
 def run_depth_camera():
     """运行深度相机示例"""
     print("\n深度相机示例")
@@ -188,25 +215,36 @@ def main():
         choices=['depth', 'audio', 'thermal', 'temp', 'all'],
         help='直接运行指定组件测试（depth/audio/thermal/temp/all）'
     )
+    parser.add_argument(
+        '--config',
+        type=str,
+        help='无界面运行：按配置文件启动各传感器采集任务并自动重启（见 examples/headless_config.json）'
+    )
     
     args = parser.parse_args()
     
+    # 无界面运行，不进入交互菜单
+    if args.config:
+        from examples.headless_runner import run_config
+        run_config(args.config)
+        return
+    
     # 如果指定了组件，直接运行
     if args.component:
         if args.component == 'depth':
-            run_depth_camera()
+            run_component(run_depth_camera)
         elif args.component == 'audio':
-            run_audio()
+            run_component(run_audio)
         elif args.component == 'thermal':
-            run_thermal_camera()
+            run_component(run_thermal_camera)
         elif args.component == 'temp':
-            run_temperature_humidity()
+            run_component(run_temperature_humidity)
         elif args.component == 'all':
             print("运行所有组件测试...")
-            run_depth_camera()
-            run_audio()
-            run_thermal_camera()
-            run_temperature_humidity()
+            run_component(run_depth_camera)
+            run_component(run_audio)
+            run_component(run_thermal_camera)
+            run_component(run_temperature_humidity)
         return
     
     # 交互式菜单
@@ -218,13 +256,13 @@ def main():
             print("\n退出程序")
             break
         elif choice == '1':
-            run_depth_camera()
+            run_component(run_depth_camera)
         elif choice == '2':
-            run_audio()
+            run_component(run_audio)
         elif choice == '3':
-            run_thermal_camera()
+            run_component(run_thermal_camera)
         elif choice == '4':
-            run_temperature_humidity()
+            run_component(run_temperature_humidity)
         else:
             print("\n无效选择，请重新输入")
         